@@ -0,0 +1,63 @@
+import argparse
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.bench_rollups import seed
+from benchmarks.common import benchmark_database, create_benchmark_app
+from sandstock import db
+from sandstock.analytics import load_product_report
+from sandstock.models import Order
+
+
+def orm_loop():
+    # What the reports did before: hydrate every order, then loop over the objects.
+    cost, received, stock, sold, revenue = (defaultdict(float) for _ in range(5))
+    for order in Order.query.all():
+        stock[order.product_id] += order.quantity
+        if order.quantity > 0:
+            if order.currency == "USD":
+                cost[order.product_id] += order.quantity * order.unit_price
+                received[order.product_id] += order.quantity
+        else:
+            sold[order.product_id] -= order.quantity
+            if order.currency == "USD":
+                revenue[order.product_id] -= order.quantity * order.unit_price
+    return sorted(revenue.items(), key=lambda item: -item[1])[:10]
+
+
+def database():
+    return load_product_report("USD", top=10)
+
+
+def measure(function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    db.session.expunge_all()
+    # Traced separately, tracemalloc slows allocations down a lot.
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.expunge_all()
+    return {"seconds": round(elapsed, 3), "peak_mb": round(peak / 2**20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the product report in SQL with a loop over ORM orders.")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=500000)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    with benchmark_database(app):
+        seed(args.rows, products=50, days=730)
+        results = {"orm_loop": measure(orm_loop), "database": measure(database)}
+    results["rows"] = args.rows
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
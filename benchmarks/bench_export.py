@@ -0,0 +1,93 @@
+import argparse
+import csv
+import io
+import json
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from benchmarks.common import benchmark_database, create_benchmark_app
+from sandstock import db
+from sandstock.exports import export_orders, order_export_statement
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
+
+
+def seed(rows, batch_size=10000):
+    db.session.add(Contact(email="bench@example.com", modified_by="bench"))
+    db.session.add(
+        Address(street_address="bench", city="bench", state="bench", postal_code="0", country="bench", modified_by="b")
+    )
+    db.session.flush()
+    db.session.add_all(
+        [
+            Product(name="bench", category_label="bench", description="bench", quantity_available=0, modified_by="b"),
+            Partner(name="bench", contact_id=1, address_id=1, modified_by="bench"),
+            Warehouse(name="bench", contact_id=1, address_id=1, modified_by="bench"),
+        ]
+    )
+    db.session.commit()
+    for start in range(0, rows, batch_size):
+        db.session.execute(
+            insert(Order),
+            [
+                {
+                    "category": "TRANSACTION",
+                    "product_id": 1,
+                    "partner_id": 1,
+                    "warehouse_id": 1,
+                    "quantity": index % 100,
+                    "unit_price": 9.99,
+                    "currency": "EUR",
+                    "modified_by": "bench",
+                }
+                for index in range(start, min(start + batch_size, rows))
+            ],
+        )
+    db.session.commit()
+
+
+def buffered(format):
+    # What a naive export does: load every row, then serialize.
+    rows = db.session.execute(order_export_statement()).all()
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return [buffer.getvalue().encode()]
+
+
+def streamed(format):
+    return export_orders(format)
+
+
+def measure(export, format):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in export(format))
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return {"seconds": round(duration, 3), "peak_mb": round(peak / 2**20, 2), "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare peak memory of the streaming order export with a buffered one."
+    )
+    parser.add_argument("--database-url", default="sqlite:////tmp/sandstock_bench_export.db")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson"])
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    with benchmark_database(app):
+        seed(args.rows)
+        results = {"buffered_csv": measure(buffered, "csv")}
+        for format in args.formats:
+            results[f"streamed_{format}"] = measure(streamed, format)
+    results["rows"] = args.rows
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
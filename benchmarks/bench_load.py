@@ -0,0 +1,167 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmarks.bench_search import WORDS, seed
+from benchmarks.common import create_benchmark_app
+from sandstock import db
+
+ROOT = Path(__file__).resolve().parent.parent
+# `{word}` and `{n}` are filled for each request, so that most requests miss the
+# dimension cache and reach the database.
+PATHS = ["/product/get?query={word}+{n}", "/product/get?limit=50", "/"]
+
+
+def server_app():
+    return create_benchmark_app(os.environ["LOAD_DATABASE_URL"])
+
+
+def free_port():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        return listener.getsockname()[1]
+
+
+def wait_until_ready(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited before accepting connections.")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time.")
+
+
+def serve(database_url, rows, worker_class, workers, threads):
+    app = create_benchmark_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(rows)
+        db.session.remove()
+        db.engine.dispose()
+    return start_server(database_url, worker_class, workers, threads)
+
+
+def start_server(database_url, worker_class, workers, threads):
+    port = free_port()
+    environment = {
+        **os.environ,
+        "LOAD_DATABASE_URL": database_url,
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "GUNICORN_WORKER_CLASS": worker_class,
+        "GUNICORN_ACCESS_LOG": "",
+        "PYTHONPATH": str(ROOT),
+    }
+    if workers:
+        environment["GUNICORN_WORKERS"] = str(workers)
+    if threads:
+        environment["GUNICORN_THREADS"] = str(threads)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "benchmarks.bench_load:server_app()"],
+        cwd=ROOT,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_until_ready("127.0.0.1", port, process)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def client(url, paths, deadline, latencies, errors):
+    target = urlsplit(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+    while time.monotonic() < deadline:
+        path = random.choice(paths).format(word=random.choice(WORDS), n=random.randint(0, 10000))
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(type(error).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    connection.close()
+
+
+def run(url, paths, clients, duration):
+    latencies: list[float] = []
+    errors: list = []
+    deadline = time.monotonic() + duration
+    workers = [threading.Thread(target=client, args=(url, paths, deadline, latencies, errors)) for _ in range(clients)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_kinds": sorted(set(map(str, errors))),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[max(int(len(ordered) * 0.99) - 1, 0)], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure requests/sec and p99 latency of the app served by gunicorn at rising concurrency."
+    )
+    parser.add_argument("--url", help="Load an already running server instead of starting one.")
+    parser.add_argument("--database-url", help="Database of the started server, a temporary SQLite file by default.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--workers", type=int, help="Defaults to gunicorn.conf.py, derived from the CPU count.")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load at each concurrency level.")
+    parser.add_argument("--path", action="append", dest="paths", help=f"Defaults to {' '.join(PATHS)}.")
+    args = parser.parse_args()
+
+    paths = args.paths or PATHS
+    process = None
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if url is None:
+            database_url = args.database_url or f"sqlite:///{directory}/load.db"
+            process, url = serve(database_url, args.rows, args.worker_class, args.workers, args.threads)
+        try:
+            run(url, paths, 1, 1)
+            results = {str(clients): run(url, paths, clients, args.duration) for clients in args.clients}
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    results["server"] = {
+        "url": url,
+        "worker_class": args.worker_class,
+        "workers": args.workers,
+        "threads": args.threads,
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
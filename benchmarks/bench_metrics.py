@@ -0,0 +1,43 @@
+import argparse
+import json
+import tempfile
+import time
+
+from sandstock.metrics import FileStore, LocalStore, Metrics
+
+
+def record_request(metrics, index):
+    # What init_metrics records for every request.
+    endpoint = ("endpoint", f"view_{index % 20}")
+    metrics.inc("sandstock_requests_total", (endpoint, ("method", "GET"), ("status", 200)))
+    metrics.observe("sandstock_request_duration_seconds", (endpoint, ("method", "GET")), (index % 100) / 1000)
+    metrics.observe("sandstock_request_db_seconds", (endpoint,), (index % 50) / 1000)
+
+
+def measure(metrics, requests):
+    start = time.perf_counter()
+    for index in range(requests):
+        record_request(metrics, index)
+    recorded = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics.render()
+    rendered = time.perf_counter() - start
+    return {"us_per_request": round(recorded / requests * 1e6, 3), "render_ms": round(rendered * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of recording request metrics.")
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "local": measure(Metrics(LocalStore()), args.requests),
+            "file": measure(Metrics(FileStore(directory)), args.requests),
+        }
+    results["requests"] = args.requests
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import benchmark_database, create_benchmark_app, summary, timed
+from sandstock import db
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
+from sandstock.rollups import order_day, order_rollups, refresh_rollups
+
+START = datetime(2022, 1, 1)
+
+
+def seed(rows, products, days, batch_size=10000):
+    db.session.add(Contact(email="bench@example.com", modified_by="bench"))
+    db.session.add(
+        Address(street_address="bench", city="bench", state="bench", postal_code="0", country="bench", modified_by="b")
+    )
+    db.session.flush()
+    db.session.add_all(
+        [
+            Product(name=f"bench {index}", category_label="b", description="b", quantity_available=0, modified_by="b")
+            for index in range(products)
+        ]
+        + [Partner(name=f"bench {index}", contact_id=1, address_id=1, modified_by="bench") for index in range(10)]
+        + [Warehouse(name=f"bench {index}", contact_id=1, address_id=1, modified_by="bench") for index in range(5)]
+    )
+    db.session.commit()
+    for start in range(0, rows, batch_size):
+        db.session.execute(
+            insert(Order),
+            [
+                {
+                    "category": "TRANSACTION",
+                    "product_id": random.randint(1, products),
+                    "partner_id": random.randint(1, 10),
+                    "warehouse_id": random.randint(1, 5),
+                    "quantity": random.randint(1, 100),
+                    "unit_price": 9.99,
+                    "currency": random.choice(["EUR", "USD"]),
+                    "created_at": START + timedelta(days=days * index / rows),
+                    "modified_by": "bench",
+                }
+                for index in range(start, min(start + batch_size, rows))
+            ],
+        )
+    db.session.commit()
+
+
+def live(product_id, date_from):
+    # The same dashboard query computed over fact_order.
+    day = order_day(Order.created_at)
+    return db.session.execute(
+        select(day, Order.currency, func.count(), func.sum(Order.quantity), func.sum(Order.quantity * Order.unit_price))
+        .where(Order.product_id == product_id, Order.created_at >= date_from)
+        .group_by(day, Order.currency)
+        .order_by(day, Order.currency)
+    ).all()
+
+
+def rollup(product_id, date_from):
+    return order_rollups("day", by="product", entity_id=product_id, date_from=date_from)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the order rollups with the same aggregates computed live.")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    with benchmark_database(app):
+        seed(args.rows, args.products, args.days)
+        start = time.perf_counter()
+        refresh_rollups()
+        refreshed = time.perf_counter() - start
+        # The last 90 days of one product, as a dashboard would show.
+        date_from = date(2022, 1, 1) + timedelta(days=args.days - 90)
+        products = [random.randint(1, args.products) for _ in range(args.queries)]
+        results = {
+            "live": summary(timed(lambda product_id: live(product_id, date_from), products)),
+            "rollup": summary(timed(lambda product_id: rollup(product_id, date_from), products)),
+            "full_refresh_s": round(refreshed, 3),
+        }
+    results["rows"] = args.rows
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
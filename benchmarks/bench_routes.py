@@ -0,0 +1,355 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlencode, urlsplit
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.bench_load import start_server
+from benchmarks.bench_search import WORDS
+from benchmarks.common import create_benchmark_app
+from sandstock import db
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
+from sandstock.search import SEARCHABLE, NgramSearchBackend
+
+START = datetime(2022, 1, 1)
+HEADERS = {"X-MS-CLIENT-PRINCIPAL-NAME": "bench@example.com"}
+
+
+def bulk_insert(model, rows, row, batch_size):
+    for start in range(0, rows, batch_size):
+        db.session.execute(insert(model), [row(index) for index in range(start, min(start + batch_size, rows))])
+    db.session.commit()
+
+
+def seed(orders, products, partners, warehouses, days=730, batch_size=10000):
+    places = partners + warehouses
+    bulk_insert(
+        Contact,
+        places,
+        lambda index: {"email": f"bench{index}@example.com", "phone_number": "0", "modified_by": "bench"},
+        batch_size,
+    )
+    bulk_insert(
+        Address,
+        places,
+        lambda index: {
+            "street_address": f"{index} bench street",
+            "city": "bench",
+            "state": "bench",
+            "postal_code": "0",
+            "country": "bench",
+            "modified_by": "bench",
+        },
+        batch_size,
+    )
+    bulk_insert(
+        Partner,
+        partners,
+        lambda index: {
+            "name": f"{random.choice(WORDS)} partner {index}",
+            "contact_id": index + 1,
+            "address_id": index + 1,
+            "modified_by": "bench",
+        },
+        batch_size,
+    )
+    bulk_insert(
+        Warehouse,
+        warehouses,
+        lambda index: {
+            "name": f"{random.choice(WORDS)} warehouse {index}",
+            "contact_id": partners + index + 1,
+            "address_id": partners + index + 1,
+            "modified_by": "bench",
+        },
+        batch_size,
+    )
+    bulk_insert(
+        Product,
+        products,
+        lambda index: {
+            "name": f"{' '.join(random.sample(WORDS, 3))} {index}",
+            "category_label": "bench",
+            "description": "bench",
+            "quantity_available": 0,
+            "modified_by": "bench",
+        },
+        batch_size,
+    )
+    bulk_insert(
+        Order,
+        orders,
+        lambda index: {
+            "category": "TRANSACTION",
+            "product_id": random.randint(1, products),
+            "partner_id": random.randint(1, partners),
+            "warehouse_id": random.randint(1, warehouses),
+            "quantity": random.randint(1, 100),
+            "unit_price": 9.99,
+            "currency": random.choice(["EUR", "USD"]),
+            "created_at": START + timedelta(days=days * index / orders),
+            "modified_by": "bench",
+        },
+        batch_size,
+    )
+    # Core inserts skip the search index the ORM keeps up to date.
+    for model in SEARCHABLE:
+        NgramSearchBackend().reindex(model)
+
+
+def dataset():
+    # Sizes of the seeded tables, recorded with the results: runs are only comparable on the same data.
+    return {
+        name: db.session.scalar(select(func.count()).select_from(model))
+        for name, model in (("orders", Order), ("products", Product), ("partners", Partner), ("warehouses", Warehouse))
+    }
+
+
+def order_form(sizes):
+    return {
+        "category": "TRANSACTION",
+        "product_id": random.randint(1, sizes["products"]),
+        "partner_id": random.randint(1, sizes["partners"]),
+        "warehouse_id": random.randint(1, sizes["warehouses"]),
+        "quantity": random.randint(1, 100),
+        "unit_price": 9.99,
+        "currency": "USD",
+    }
+
+
+def product_form(sizes):
+    return {"name": f"{' '.join(random.sample(WORDS, 3))} edited", "category_label": "bench", "description": "bench"}
+
+
+# Name: method, path and the form posted. Ids and limits are drawn from the seeded sizes
+# for every request, so that pages are not all served from the same cache entry.
+SCENARIOS = {
+    "home": ("GET", "/", None),
+    "get_products": ("GET", "/product/get?limit={limit}", None),
+    "get_partners": ("GET", "/partner/get?limit={limit}", None),
+    "get_warehouses": ("GET", "/warehouse/get?limit={limit}", None),
+    "get_orders": ("GET", "/order/get?limit={limit}", None),
+    "search_products": ("GET", "/product/get?query={words}&limit={limit}", None),
+    "search_partners": ("GET", "/partner/get?query={word}&limit={limit}", None),
+    "search_warehouses": ("GET", "/warehouse/get?query={word}&limit={limit}", None),
+    "product_choices": ("GET", "/product/choices?query={words}&limit={limit}", None),
+    "partner_choices": ("GET", "/partner/choices?query={word}&limit={limit}", None),
+    "warehouse_choices": ("GET", "/warehouse/choices?query={word}&limit={limit}", None),
+    "add_order": ("GET", "/order/add", None),
+    "add_order_submit": ("POST", "/order/add", order_form),
+    "edit_product": ("GET", "/product/{product}/edit", None),
+    "edit_product_submit": ("POST", "/product/{product}/edit", product_form),
+    "edit_partner": ("GET", "/partner/{partner}/edit", None),
+    "edit_warehouse": ("GET", "/warehouse/{warehouse}/edit", None),
+    "edit_order": ("GET", "/order/{order}/edit", None),
+}
+
+
+def build_request(scenario, sizes):
+    method, path, form = SCENARIOS[scenario]
+    path = path.format(
+        limit=random.randint(10, 100),
+        # Product names hold three of the words, partner and warehouse names one.
+        word=random.choice(WORDS),
+        words=quote(" ".join(random.sample(WORDS, random.randint(1, 2)))),
+        product=random.randint(1, sizes["products"]),
+        partner=random.randint(1, sizes["partners"]),
+        warehouse=random.randint(1, sizes["warehouses"]),
+        order=random.randint(1, sizes["orders"]),
+    )
+    if form is None:
+        return method, path, None, HEADERS
+    return method, path, urlencode(form(sizes)), {**HEADERS, "Content-Type": "application/x-www-form-urlencoded"}
+
+
+def client(url, scenario, sizes, deadline, latencies, errors):
+    target = urlsplit(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+    while time.monotonic() < deadline:
+        method, path, body, headers = build_request(scenario, sizes)
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(type(error).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+            continue
+        # Submitted forms redirect, anything from 400 up means the scenario is not measuring what it should.
+        if response.status >= 400:
+            errors.append(response.status)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    connection.close()
+
+
+def percentile(ordered, fraction):
+    return round(ordered[max(int(len(ordered) * fraction) - 1, 0)], 3)
+
+
+def run_scenario(url, scenario, sizes, clients, duration):
+    latencies: list[float] = []
+    errors: list = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client, args=(url, scenario, sizes, deadline, latencies, errors))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_kinds": sorted(set(map(str, errors))),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": percentile(ordered, 0.5),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    # A scenario regresses when its p95 grows by more than `threshold` of the baseline,
+    # and by at least `min_delta_ms`: sub-millisecond pages are too noisy for a ratio alone.
+    regressions = []
+    lines = [f"{'scenario':<22} {'baseline p95':>13} {'current p95':>12} {'change':>8}"]
+    for scenario, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            lines.append(f"{scenario:<22} {'-':>13} {result['p95_ms']:>12.3f} {'new':>8}")
+            continue
+        delta = result["p95_ms"] - before["p95_ms"]
+        change = delta / before["p95_ms"] if before["p95_ms"] else 0.0
+        # Failing requests are not timed, a page that breaks must not pass for a faster one.
+        regressed = (change > threshold and delta >= min_delta_ms) or result["errors"] > before["errors"]
+        if regressed:
+            regressions.append(scenario)
+        lines.append(
+            f"{scenario:<22} {before['p95_ms']:>13.3f} {result['p95_ms']:>12.3f} {change:>+8.1%}"
+            + (f"  REGRESSED, {result['errors']} errors" if regressed else "")
+        )
+    if baseline.get("dataset") != current.get("dataset"):
+        lines.append(f"Warning: datasets differ, {baseline.get('dataset')} and {current.get('dataset')}.")
+    return regressions, lines
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def check(baseline, current, threshold, min_delta_ms):
+    regressions, lines = compare(baseline, current, threshold, min_delta_ms)
+    print("\n".join(lines), file=sys.stderr)
+    if regressions:
+        print(
+            f"p95 regressed by more than {threshold:.0%} or errors appeared: {', '.join(regressions)}", file=sys.stderr
+        )
+        return 1
+    return 0
+
+
+def run(args):
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = sorted(set(scenarios) - set(SCENARIOS))
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}.")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite:///{directory}/routes.db"
+        app = create_benchmark_app(database_url)
+        with app.app_context():
+            if not args.reuse_database:
+                db.drop_all()
+                db.create_all()
+                seed(args.orders, args.products, args.partners, args.warehouses)
+            sizes = dataset()
+            db.session.remove()
+            db.engine.dispose()
+
+        # Workers recycled mid-scenario would reset connections and restart with cold caches.
+        os.environ.setdefault("GUNICORN_MAX_REQUESTS", "0")
+        process, url = start_server(database_url, args.worker_class, args.workers, args.threads)
+        try:
+            results = {}
+            for scenario in scenarios:
+                run_scenario(url, scenario, sizes, 1, args.warmup)
+                results[scenario] = run_scenario(url, scenario, sizes, args.clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "dataset": sizes,
+        "clients": args.clients,
+        "duration": args.duration,
+        "server": {"worker_class": args.worker_class, "workers": args.workers, "threads": args.threads},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+    if args.baseline:
+        return check(load_results(args.baseline), report, args.threshold, args.min_delta_ms)
+    return 0
+
+
+def add_threshold_arguments(parser):
+    parser.add_argument("--threshold", type=float, default=0.1, help="Fail when p95 grows by more, 0.1 for 10%%.")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 changes smaller than this.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure latency and throughput of the pages served by the app.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed a dataset, serve it with gunicorn and load every scenario.")
+    run_parser.add_argument("--database-url", help="A temporary SQLite file by default.")
+    run_parser.add_argument("--reuse-database", action="store_true", help="Keep the data already in --database-url.")
+    run_parser.add_argument("--orders", type=int, default=1000000)
+    run_parser.add_argument("--products", type=int, default=100000)
+    run_parser.add_argument("--partners", type=int, default=1000)
+    run_parser.add_argument("--warehouses", type=int, default=50)
+    run_parser.add_argument("--worker-class", default="gthread")
+    run_parser.add_argument("--workers", type=int, help="Defaults to gunicorn.conf.py, derived from the CPU count.")
+    run_parser.add_argument("--threads", type=int)
+    run_parser.add_argument("--clients", type=int, default=8, help="Concurrent clients in each scenario.")
+    run_parser.add_argument("--duration", type=float, default=10, help="Seconds of load in each scenario.")
+    run_parser.add_argument("--warmup", type=float, default=1, help="Seconds of a single client before each scenario.")
+    run_parser.add_argument("--scenario", action="append", dest="scenarios", help=f"Defaults to {' '.join(SCENARIOS)}.")
+    run_parser.add_argument("--output", help="Also write the results to this JSON file.")
+    run_parser.add_argument("--baseline", help="Compare with the results in this file, as the compare command does.")
+    add_threshold_arguments(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="Fail when p95 latencies regressed from a baseline.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    add_threshold_arguments(compare_parser)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        return check(load_results(args.baseline), load_results(args.current), args.threshold, args.min_delta_ms)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
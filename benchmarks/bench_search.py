@@ -0,0 +1,75 @@
+import argparse
+import json
+import random
+
+from sqlalchemy import insert
+
+from benchmarks.common import benchmark_database, create_benchmark_app, summary, timed
+from sandstock import db
+from sandstock.models import Product
+from sandstock.search import NgramSearchBackend, search
+
+WORDS = ["steel", "bolt", "widget", "copper", "pipe", "valve", "gasket", "flange", "bracket", "hinge", "washer", "nut"]
+
+
+def seed(rows, batch_size=10000):
+    for start in range(0, rows, batch_size):
+        db.session.execute(
+            insert(Product),
+            [
+                {
+                    "name": f"{' '.join(random.sample(WORDS, 3))} {index}",
+                    "category_label": "bench",
+                    "description": "bench",
+                    "quantity_available": 0,
+                    "modified_by": "bench",
+                }
+                for index in range(start, min(start + batch_size, rows))
+            ],
+        )
+    db.session.commit()
+    NgramSearchBackend().reindex(Product)
+
+
+def ilike(query):
+    return (
+        db.session.query(Product)
+        .filter(Product.name.ilike(f"%{query}%"), Product.deleted == False)  # type: ignore # noqa: E712
+        .order_by(Product.id)
+        .limit(10)
+        .all()
+    )
+
+
+def ngram(query):
+    return search(Product, query, limit=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the n-gram search index with the ILIKE scan.")
+    parser.add_argument("--database-url", default="sqlite://")
+    # A single word is in a quarter of the names: its latency stays flat as the table grows.
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.rows:
+        app = create_benchmark_app(args.database_url)
+        with benchmark_database(app):
+            seed(rows)
+            workloads = {
+                "word": [random.choice(WORDS) for _ in range(args.queries)],
+                "common": [" ".join(random.sample(WORDS, 2)) for _ in range(args.queries)],
+                "selective": [f"{random.choice(WORDS)} {random.randint(0, rows)}" for _ in range(args.queries)],
+                "missing": [f"{random.choice(WORDS)}x{random.randint(0, rows)}" for _ in range(args.queries)],
+            }
+            results[rows] = {
+                name: {"ilike": summary(timed(ilike, queries)), "ngram": summary(timed(ngram, queries))}
+                for name, queries in workloads.items()
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from benchmarks.bench_rollups import seed
+from benchmarks.common import benchmark_database, create_benchmark_app
+from sandstock import db
+from sandstock.models import Order
+from sandstock.pagination import MAX_PAGE_SIZE, paginate
+from sandstock.serializers import ORDER_SUMMARY, serialize_page
+
+
+def orm_pages(cursor):
+    # What /order/get did before: hydrate the orders, then copy them attribute by attribute.
+    page = paginate(select(Order), [Order.id], cursor=cursor, limit=MAX_PAGE_SIZE)
+    orders = [
+        {
+            "id": order.id,
+            "category": order.category,
+            "product_id": order.product_id,
+            "partner_id": order.partner_id,
+            "warehouse_id": order.warehouse_id,
+            "quantity": order.quantity,
+            "unit_price": order.unit_price,
+            "currency": order.currency,
+            "created_at": order.created_at,
+        }
+        for order in page.items
+    ]
+    db.session.expunge_all()
+    return orders, page.next_cursor
+
+
+def schema_pages(cursor):
+    page = serialize_page(ORDER_SUMMARY, select(Order), [Order.id], cursor=cursor, limit=MAX_PAGE_SIZE)
+    return page.items, page.next_cursor
+
+
+def measure(load, dumps):
+    # Every page of fact_order, as clients paging through /order/get would fetch them.
+    rows = 0
+    cursor = None
+    start = time.perf_counter()
+    while True:
+        items, cursor = load(cursor)
+        dumps(items)
+        rows += len(items)
+        if cursor is None:
+            break
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare order serialization from ORM objects and from schema rows.")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    default_json = DefaultJSONProvider(app)
+    with benchmark_database(app):
+        seed(args.rows, products=50, days=730)
+        results = {
+            "orm_default_json": measure(orm_pages, default_json.dumps),
+            "schema_default_json": measure(schema_pages, default_json.dumps),
+            "schema_orjson": measure(schema_pages, app.json.dumps),
+        }
+    results["rows"] = args.rows
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import summary
+
+SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from sandstock import create_app
+from sandstock.config import Config, engine_options
+
+imported = time.perf_counter()
+options = {"SQLALCHEMY_DATABASE_URI": sys.argv[1], "SQLALCHEMY_ENGINE_OPTIONS": engine_options(sys.argv[1])}
+create_app(type("StartupConfig", (Config,), options))
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_app_ms": (created - imported) * 1000}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of a fresh process creating the app.")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    runs = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", SCRIPT, args.database_url],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(args.runs)
+    ]
+    results = {name: summary([run[name] for run in runs]) for name in ("import_ms", "create_app_ms")}
+    results["runs"] = args.runs
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
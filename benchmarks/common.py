@@ -0,0 +1,47 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from sandstock import create_app, db
+from sandstock.config import TestingConfig, engine_options, resolve_test_database
+
+
+def create_benchmark_app(database_url):
+    # A URL, or one of the TEST_DATABASE profiles such as "mssql" or "sqlite".
+    database_url = resolve_test_database(database_url)
+    config = type(
+        "BenchmarkConfig",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": database_url, "SQLALCHEMY_ENGINE_OPTIONS": engine_options(database_url)},
+    )
+    return create_app(config)
+
+
+@contextmanager
+def benchmark_database(app):
+    with app.app_context():
+        db.create_all()
+        try:
+            yield
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def timed(function, arguments):
+    durations = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def summary(durations):
+    ordered = sorted(durations)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
@@ -0,0 +1,56 @@
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Concurrency profile
+#
+# Requests spend most of their time waiting on Azure SQL. pyodbc releases the GIL
+# for the whole round trip, so threads of one worker wait on the database in
+# parallel while another thread renders. gevent cannot make pyodbc cooperative, a
+# query in a C extension would block every greenlet of the worker: the gthread
+# worker is the supported high-concurrency mode.
+#
+# Threads give the concurrency, workers only the CPU parallelism: one worker per
+# CPU, not the 2 * CPUs + 1 of sync workers, which would multiply the connections
+# and split each worker's local cache further for nothing.
+#
+# Each worker serves `threads` requests at once with its own SQLAlchemy pool, sized
+# to `threads` so that a request never waits on a connection, and a small overflow
+# for the connections held outside a request. The database sees at most
+# workers * (threads + DB_MAX_OVERFLOW) connections, keep it below the session
+# limit of the Azure SQL tier when raising GUNICORN_WORKERS or GUNICORN_THREADS.
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Restart workers now and then so that a slow leak never takes an instance down,
+# with jitter so that they do not all restart at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+# An empty GUNICORN_ACCESS_LOG turns the access log off.
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+# Read by sandstock.config when the workers import the app.
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+os.environ.setdefault("DB_MAX_OVERFLOW", "2")
+
+# Workers record metrics in their own file under METRICS_DIR and /metrics sums the
+# files, see sandstock.metrics. Counts start from zero with the server and survive
+# worker restarts.
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="sandstock-metrics-"))
+
+
+def on_starting(server):
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from sandstock.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid, os.environ["METRICS_DIR"])
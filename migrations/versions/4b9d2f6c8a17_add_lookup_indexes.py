@@ -0,0 +1,54 @@
+"""Add lookup indexes
+
+Revision ID: 4b9d2f6c8a17
+Revises: 1e243a73e6ef
+Create Date: 2026-10-18 09:12:41.517302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9d2f6c8a17'
+down_revision = '1e243a73e6ef'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text('deleted = 0')
+
+
+def upgrade():
+    # In a batch, so that SQLite, which cannot alter a column, copies the table instead.
+    with op.batch_alter_table('dim_partner') as batch_op:
+        batch_op.alter_column('name',
+               existing_type=sa.Text(),
+               type_=sa.String(length=200),
+               existing_nullable=False)
+
+    for table in ('dim_partner', 'dim_warehouse', 'dim_product'):
+        op.create_index(f'ix_{table}_deleted_name', table, ['deleted', 'name'], unique=False)
+        op.create_index(f'ix_{table}_active', table, ['id'], unique=False,
+                        mssql_where=ACTIVE, sqlite_where=ACTIVE, postgresql_where=sa.text('deleted = false'))
+
+    op.create_index('ix_fact_order_product_id', 'fact_order', ['product_id'], unique=False)
+    op.create_index('ix_fact_order_partner_id', 'fact_order', ['partner_id'], unique=False)
+    op.create_index('ix_fact_order_warehouse_id', 'fact_order', ['warehouse_id'], unique=False)
+    op.create_index('ix_fact_order_created_at', 'fact_order', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_fact_order_created_at', table_name='fact_order')
+    op.drop_index('ix_fact_order_warehouse_id', table_name='fact_order')
+    op.drop_index('ix_fact_order_partner_id', table_name='fact_order')
+    op.drop_index('ix_fact_order_product_id', table_name='fact_order')
+
+    for table in ('dim_product', 'dim_warehouse', 'dim_partner'):
+        op.drop_index(f'ix_{table}_active', table_name=table)
+        op.drop_index(f'ix_{table}_deleted_name', table_name=table)
+
+    with op.batch_alter_table('dim_partner') as batch_op:
+        batch_op.alter_column('name',
+               existing_type=sa.String(length=200),
+               type_=sa.Text(),
+               existing_nullable=False)
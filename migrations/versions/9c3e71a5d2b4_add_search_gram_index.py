@@ -0,0 +1,49 @@
+"""Add search gram index
+
+Revision ID: 9c3e71a5d2b4
+Revises: 4b9d2f6c8a17
+Create Date: 2026-10-18 10:03:27.880145
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e71a5d2b4'
+down_revision = '4b9d2f6c8a17'
+branch_labels = None
+depends_on = None
+
+
+def ngrams(value):
+    value = ' '.join(value.lower().split())
+    return {value[start:start + 3] for start in range(len(value) - 2)}
+
+
+def upgrade():
+    search_gram = op.create_table('idx_search_gram',
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('gram', sa.String(length=3), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity', 'gram', 'entity_id')
+    )
+    op.create_index('ix_idx_search_gram_entity_id', 'idx_search_gram', ['entity', 'entity_id'], unique=False)
+
+    connection = op.get_bind()
+    for table in ('dim_partner', 'dim_warehouse', 'dim_product'):
+        rows = connection.execute(
+            sa.text(f'SELECT id, name FROM {table} WHERE deleted = :deleted').bindparams(deleted=False)
+        ).all()
+        grams = [
+            {'entity': table, 'gram': gram, 'entity_id': entity_id}
+            for entity_id, name in rows
+            for gram in ngrams(name)
+        ]
+        if grams:
+            op.bulk_insert(search_gram, grams)
+
+
+def downgrade():
+    op.drop_index('ix_idx_search_gram_entity_id', table_name='idx_search_gram')
+    op.drop_table('idx_search_gram')
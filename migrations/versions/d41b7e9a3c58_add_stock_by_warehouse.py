@@ -0,0 +1,39 @@
+"""Add stock by warehouse aggregate
+
+Revision ID: d41b7e9a3c58
+Revises: 9c3e71a5d2b4
+Create Date: 2026-10-18 16:42:05.214873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41b7e9a3c58'
+down_revision = '9c3e71a5d2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('agg_stock_by_warehouse',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('last_order_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['dim_product.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['dim_warehouse.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'warehouse_id')
+    )
+    op.create_index('ix_agg_stock_by_warehouse_warehouse_id', 'agg_stock_by_warehouse', ['warehouse_id', 'product_id'], unique=False)
+
+    op.execute(
+        'INSERT INTO agg_stock_by_warehouse (product_id, warehouse_id, quantity, last_order_id) '
+        'SELECT product_id, warehouse_id, SUM(quantity), MAX(id) FROM fact_order GROUP BY product_id, warehouse_id'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_agg_stock_by_warehouse_warehouse_id', table_name='agg_stock_by_warehouse')
+    op.drop_table('agg_stock_by_warehouse')
@@ -0,0 +1,51 @@
+"""Add order rollups
+
+Revision ID: e7a2c4f91b36
+Revises: d41b7e9a3c58
+Create Date: 2026-10-18 17:25:48.603112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2c4f91b36'
+down_revision = 'd41b7e9a3c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('agg_order_rollup',
+    sa.Column('grain', sa.String(length=5), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('partner_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['partner_id'], ['dim_partner.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['dim_product.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['dim_warehouse.id'], ),
+    sa.PrimaryKeyConstraint('grain', 'bucket', 'product_id', 'partner_id', 'warehouse_id', 'currency')
+    )
+    op.create_index('ix_agg_order_rollup_partner', 'agg_order_rollup', ['grain', 'partner_id', 'bucket'], unique=False)
+    op.create_index('ix_agg_order_rollup_product', 'agg_order_rollup', ['grain', 'product_id', 'bucket'], unique=False)
+    op.create_index('ix_agg_order_rollup_warehouse', 'agg_order_rollup', ['grain', 'warehouse_id', 'bucket'], unique=False)
+    op.create_table('agg_rollup_watermark',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_order_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Filled by the first `flask rollups refresh`.
+
+
+def downgrade():
+    op.drop_table('agg_rollup_watermark')
+    op.drop_index('ix_agg_order_rollup_warehouse', table_name='agg_order_rollup')
+    op.drop_index('ix_agg_order_rollup_product', table_name='agg_order_rollup')
+    op.drop_index('ix_agg_order_rollup_partner', table_name='agg_order_rollup')
+    op.drop_table('agg_order_rollup')
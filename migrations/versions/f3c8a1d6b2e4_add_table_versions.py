@@ -0,0 +1,36 @@
+"""Add table versions
+
+Revision ID: f3c8a1d6b2e4
+Revises: e7a2c4f91b36
+Create Date: 2026-10-18 19:02:11.284519
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d6b2e4'
+down_revision = 'e7a2c4f91b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    meta_table_version = op.create_table('meta_table_version',
+    sa.Column('name', sa.String(length=128), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.now(timezone.utc)
+    op.bulk_insert(meta_table_version, [
+        {'name': name, 'version': 0, 'changed_at': now}
+        for name in ('dim_partner', 'dim_product', 'dim_warehouse', 'fact_order')
+    ])
+
+
+def downgrade():
+    op.drop_table('meta_table_version')
@@ -3,19 +3,37 @@ import logging
 from flask import Flask
 from flask_migrate import Migrate
 
+from sandstock.api import api
+from sandstock.cache import init_cache
+from sandstock.commands import register_commands
+from sandstock.conditional import init_conditional_requests
 from sandstock.config import Config
+from sandstock.credentials import init_secrets
 from sandstock.extensions import db
+from sandstock.instrumentation import init_instrumentation
+from sandstock.metrics import init_metrics
+from sandstock.pool import init_pool
 from sandstock.routes import register_routes
+from sandstock.serializers import OrjsonProvider
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = OrjsonProvider(app)
 
     db.init_app(app)
+    init_metrics(app)
+    init_secrets(app)
+    init_pool(app)
     Migrate(app, db)
+    init_instrumentation(app)
+    init_cache(app)
+    init_conditional_requests(app)
 
     register_routes(app)
+    app.register_blueprint(api)
+    register_commands(app)
 
     if not app.debug:
         logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,87 @@
+from datetime import datetime, time
+
+from sqlalchemy import case, func, literal, select
+
+from sandstock.models import Order, db
+from sandstock.search import order_filters
+
+ABC_THRESHOLDS = (("A", 0.8), ("B", 0.95))
+
+
+def _turnover(units, opening_stock, closing_stock):
+    ratios = {}
+    for key, sold in units.items():
+        average = (opening_stock.get(key, 0) + closing_stock.get(key, 0)) / 2
+        ratios[key] = sold / average if average > 0 else None
+    return ratios
+
+
+def abc_classes(revenue):
+    # A: the products making the first 80% of revenue, B: the next 15%, C: the rest.
+    total = sum(revenue.values())
+    classes = {}
+    cumulative = 0.0
+    for product_id, value in sorted(revenue.items(), key=lambda item: (-item[1], item[0])):
+        share = cumulative / total if total else 1.0
+        classes[product_id] = next((label for label, threshold in ABC_THRESHOLDS if share < threshold), "C")
+        cumulative += value
+    return classes
+
+
+def load_product_report(currency, date_from=None, date_to=None, top=None):
+    # Stock valuation and ABC classes per product, summed by the database: one row per
+    # product comes back instead of the order history. Units count every order, costs
+    # and revenue only the orders priced in `currency`, amounts are never added across
+    # currencies.
+    since = datetime.combine(date_from, time.min) if date_from is not None else None
+    priced = Order.currency == currency
+    received = Order.quantity > 0
+    sold = Order.quantity < 0 if since is None else (Order.quantity < 0) & (Order.created_at >= since)
+    opening = literal(0) if since is None else case((Order.created_at < since, Order.quantity), else_=0)
+    statement = (
+        select(
+            Order.product_id,
+            func.sum(Order.quantity).label("on_hand"),
+            func.sum(case((received & priced, Order.quantity * Order.unit_price), else_=0.0)).label("cost"),
+            func.sum(case((received & priced, Order.quantity), else_=0)).label("received"),
+            func.count(case((sold, 1))).label("sales"),
+            func.sum(case((sold, -Order.quantity), else_=0)).label("units"),
+            func.sum(case((sold & priced, -Order.quantity * Order.unit_price), else_=0.0)).label("revenue"),
+            func.sum(opening).label("opening"),
+        )
+        .where(*order_filters(date_to=date_to))
+        .group_by(Order.product_id)
+    )
+    units, revenue, costs, stock, opening_stock = {}, {}, {}, {}, {}
+    for row in db.session.execute(statement):
+        stock[row.product_id] = row.on_hand
+        opening_stock[row.product_id] = row.opening
+        if row.received:
+            costs[row.product_id] = row.cost / row.received
+        if row.sales:
+            units[row.product_id] = row.units
+            revenue[row.product_id] = row.revenue
+    return _report(currency, units, revenue, costs, stock, _turnover(units, opening_stock, stock), top)
+
+
+def _report(currency, units, revenue, costs, stock, ratios, top):
+    classes = abc_classes(revenue)
+    ranked = sorted(stock.keys() | revenue.keys(), key=lambda product_id: (-revenue.get(product_id, 0.0), product_id))
+    report = []
+    for product_id in ranked[:top]:
+        average_cost = costs.get(product_id)
+        on_hand = stock.get(product_id, 0)
+        report.append(
+            {
+                "product_id": product_id,
+                "currency": currency,
+                "on_hand": on_hand,
+                "average_cost": average_cost,
+                "stock_value": on_hand * average_cost if average_cost is not None else None,
+                "units_sold": units.get(product_id, 0),
+                "revenue": revenue.get(product_id, 0.0),
+                "turnover": ratios.get(product_id),
+                "abc_class": classes.get(product_id, "C"),
+            }
+        )
+    return report
@@ -0,0 +1,136 @@
+from datetime import date
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+
+from sandstock.imports import BATCH_SIZE, create_rows
+from sandstock.models import Order, Partner, Product, Warehouse, db
+from sandstock.pagination import InvalidCursor, page_response, page_size
+from sandstock.search import search_orders
+from sandstock.serializers import RESOURCES, serialize_page
+
+MAX_BATCH_SIZE = 10000
+# SQL Server takes at most 2100 parameters per statement.
+MAX_IDS = 1000
+
+COLLECTIONS = {"products": Product, "partners": Partner, "warehouses": Warehouse, "orders": Order}
+ENTITIES = {"products": "product", "partners": "partner", "warehouses": "warehouse", "orders": "order"}
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+class InvalidRecords(Exception):
+
+    def __init__(self, failures):
+        super().__init__(f"{len(failures)} invalid records.")
+        self.failures = failures
+
+
+def _statement(model):
+    statement = select(model)
+    if model is not Order:
+        statement = statement.where(model.deleted == False)  # noqa: E712
+    return statement
+
+
+def _resources(model, statement):
+    schema = RESOURCES[model]
+    return schema.dump_all(db.session.execute(schema.select(statement)))
+
+
+def _ids(value):
+    try:
+        ids = sorted({int(part) for part in value.split(",") if part.strip()})
+    except ValueError:
+        raise InvalidRequest(f"Invalid ids: {value}")
+    if len(ids) > MAX_IDS:
+        raise InvalidRequest(f"At most {MAX_IDS} ids can be requested at once.")
+    return ids
+
+
+def _rows(payload):
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+        raise InvalidRequest("Expected a JSON object or a list of objects.")
+    if len(payload) > MAX_BATCH_SIZE:
+        raise InvalidRequest(f"At most {MAX_BATCH_SIZE} records can be created at once.")
+    return payload
+
+
+def _create(collection, rows):
+    user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
+    ids, failures = create_rows(ENTITIES[collection], rows, user_email, batch_size=BATCH_SIZE)
+    if failures:
+        raise InvalidRecords(failures)
+    return ids
+
+
+@api.errorhandler(InvalidRequest)
+@api.errorhandler(InvalidCursor)
+def bad_request(error):
+    return jsonify({"error": str(error)}), 400
+
+
+@api.errorhandler(InvalidRecords)
+def unprocessable(error):
+    return jsonify({"errors": [{"row": number, "errors": errors} for number, errors in error.failures]}), 422
+
+
+@api.route("/<any(products, partners, warehouses, orders):collection>", methods=["GET"])
+def list_resources(collection):
+    model = COLLECTIONS[collection]
+    if "ids" in request.args:
+        # One IN query for the whole batch.
+        statement = _statement(model).where(model.id.in_(_ids(request.args["ids"]))).order_by(model.id)
+        return jsonify(_resources(model, statement))
+
+    if model is Order:
+        statement, keys = search_orders(
+            partner_id=request.args.get("partner_id", type=int),
+            product_id=request.args.get("product_id", type=int),
+            warehouse_id=request.args.get("warehouse_id", type=int),
+            date_from=request.args.get("date_from", type=date.fromisoformat),
+            date_to=request.args.get("date_to", type=date.fromisoformat),
+        )
+    else:
+        statement, keys = _statement(model), [model.id]
+    page = serialize_page(
+        RESOURCES[model],
+        statement,
+        keys,
+        cursor=request.args.get("cursor"),
+        limit=page_size(request.args.get("limit", type=int)),
+    )
+    return page_response(page.items, page)
+
+
+@api.route("/<any(products, partners, warehouses, orders):collection>/<int:resource_id>", methods=["GET"])
+def get_resource(collection, resource_id):
+    model = COLLECTIONS[collection]
+    resources = _resources(model, _statement(model).where(model.id == resource_id))
+    if not resources:
+        return jsonify({"error": f"{collection[:-1].capitalize()} {resource_id} does not exist."}), 404
+    return jsonify(resources[0])
+
+
+@api.route("/<any(products, partners, warehouses, orders):collection>", methods=["POST"])
+def create_resource(collection):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise InvalidRequest("Expected a JSON object.")
+    [resource_id] = _create(collection, [payload])
+    model = COLLECTIONS[collection]
+    [resource] = _resources(model, _statement(model).where(model.id == resource_id))
+    return jsonify(resource), 201
+
+
+@api.route("/<any(products, partners, warehouses, orders):collection>:batch", methods=["POST"])
+def create_resources(collection):
+    # Every record is validated first and all are inserted in one transaction, or
+    # none when one of them is invalid.
+    return jsonify({"ids": _create(collection, _rows(request.get_json(silent=True)))}), 201
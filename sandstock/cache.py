@@ -0,0 +1,103 @@
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Flask, current_app
+
+from sandstock.conditional import table_version
+
+
+class LocalCache:
+    # In-process LRU with a TTL. The entry count is bounded, so is the memory.
+
+    def __init__(self, max_entries=10000, ttl=60, clock=time.monotonic, metrics=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.metrics = metrics
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                if self.metrics is not None:
+                    self.metrics.inc("sandstock_cache_evictions_total")
+
+
+class RedisCache:
+    # Shared between workers and instances. Memory is bounded by the server's
+    # maxmemory policy, entries all carry the TTL.
+
+    def __init__(self, url, ttl=60, prefix="sandstock:", metrics=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        if metrics is not None:
+            metrics.collectors.append(lambda: self.collect_evictions(metrics))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def collect_evictions(self, metrics):
+        # The server counts the keys its maxmemory policy evicted, read when the
+        # metrics are rendered.
+        metrics.advance("sandstock_cache_evictions_total", int(self.client.info("stats").get("evicted_keys", 0)))
+
+
+class DimensionCache:
+    # Listings and search pages are cached under the version the database holds for
+    # their table, see sandstock.conditional: a write in any worker moves it, and no
+    # worker serves the old pages again, whatever its own backend still holds.
+
+    def __init__(self, backend, metrics=None):
+        self.backend = backend
+        self.metrics = metrics
+
+    def _count(self, model, value):
+        if self.metrics is not None:
+            result = "miss" if value is None else "hit"
+            self.metrics.inc("sandstock_cache_requests_total", (("table", model.__tablename__), ("result", result)))
+
+    def fetch(self, model, key, loader):
+        key = f"{model.__tablename__}:v{table_version(model)}:{key!r}"
+        value = self.backend.get(key)
+        self._count(model, value)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value)
+        return value
+
+
+def init_cache(app: Flask):
+    metrics = app.extensions["sandstock_metrics"]
+    backend: LocalCache | RedisCache
+    if app.config["CACHE_BACKEND"] == "redis":
+        backend = RedisCache(app.config["CACHE_URL"], ttl=app.config["CACHE_TTL"], metrics=metrics)
+    else:
+        backend = LocalCache(max_entries=app.config["CACHE_MAX_ENTRIES"], ttl=app.config["CACHE_TTL"], metrics=metrics)
+    app.extensions["sandstock_cache"] = DimensionCache(backend, metrics)
+
+
+def get_cache() -> DimensionCache:
+    return current_app.extensions["sandstock_cache"]
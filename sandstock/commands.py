@@ -0,0 +1,114 @@
+import click
+from flask import Flask
+
+from sandstock.explain import expected_scan, explain_routes
+from sandstock.exports import CHUNK_SIZE
+from sandstock.exports import FORMATS as EXPORT_FORMATS
+from sandstock.exports import ExportFormatError, export_orders
+from sandstock.imports import BATCH_SIZE, FORMATS, IMPORTERS, ImportFormatError, file_format, import_file
+from sandstock.rollups import REFRESH_BATCH_SIZE, refresh_rollups
+from sandstock.search import SEARCHABLE, get_backend, setup_fulltext
+from sandstock.services import REBUILD_BATCH_SIZE, rebuild_warehouse_stock, reconcile_stock_balances
+
+
+def register_commands(app: Flask):
+
+    @app.cli.command("explain")
+    def explain_queries():
+        """Run EXPLAIN on every query issued by the routes and fail on unexpected table scans."""
+        failures = 0
+        for url, statement, plan, scans in explain_routes(app):
+            reason = expected_scan(url) if scans else None
+            status = "OK" if not scans else "EXPECTED SCAN" if reason else "SCAN"
+            click.echo(f"[{status}] {url}: {' '.join(statement.split())}")
+            if reason:
+                click.echo(f"    Expected: {reason}")
+            for line in plan:
+                click.echo(f"    {line}")
+            failures += bool(scans) and not reason
+        if failures:
+            raise click.ClickException(f"{failures} queries do a table scan.")
+
+    @app.cli.group("search")
+    def search_group():
+        """Manage the name search indexes."""
+
+    @search_group.command("reindex")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def search_reindex(batch_size):
+        """Rebuild the search index of partners, warehouses and products."""
+        backend = get_backend()
+        for model in SEARCHABLE:
+            backend.reindex(model, batch_size=batch_size)
+            click.echo(f"Reindexed {model.__tablename__}.")
+
+    @search_group.command("setup-fulltext")
+    def search_setup_fulltext():
+        """Create the SQL Server full-text catalog and indexes used by the fulltext backend."""
+        setup_fulltext()
+        click.echo("Full-text indexes created.")
+
+    @app.cli.group("stock")
+    def stock_group():
+        """Maintain product stock balances."""
+
+    @stock_group.command("reconcile")
+    def stock_reconcile():
+        """Recompute product balances from the order ledger and fix the ones that drifted."""
+        click.echo(f"Reconciled {reconcile_stock_balances()} product balances.")
+
+    @stock_group.command("rebuild-warehouses")
+    @click.option("--batch-size", default=REBUILD_BATCH_SIZE, show_default=True, help="Orders folded in per statement.")
+    def stock_rebuild_warehouses(batch_size):
+        """Recompute the stock of every product per warehouse from the order ledger."""
+        click.echo(f"Rebuilt {rebuild_warehouse_stock(batch_size=batch_size)} warehouse stock rows.")
+
+    @app.cli.group("rollups")
+    def rollups_group():
+        """Maintain the daily and weekly order rollups."""
+
+    @rollups_group.command("refresh")
+    @click.option("--batch-size", default=REFRESH_BATCH_SIZE, show_default=True, help="Orders folded in per batch.")
+    @click.option("--full", is_flag=True, help="Recompute the rollups from every order.")
+    def rollups_refresh(batch_size, full):
+        """Fold the orders placed since the last refresh into the rollups."""
+        click.echo(f"Rolled up {refresh_rollups(batch_size=batch_size, full=full)} orders.")
+
+    @app.cli.command("import")
+    @click.argument("entity", type=click.Choice(sorted(IMPORTERS)))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "format_", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+    @click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+    @click.option("--modified-by", default="import", show_default=True)
+    def import_command(entity, path, format_, batch_size, modified_by):
+        """Bulk import products, partners, warehouses or orders from a CSV or Parquet file."""
+        try:
+            with open(path, "rb") as stream:
+                report = import_file(entity, stream, format_ or file_format(path), modified_by, batch_size=batch_size)
+        except ImportFormatError as error:
+            raise click.ClickException(str(error))
+        for failure in report.errors:
+            click.echo(f"Row {failure['row']}: {failure['errors']}", err=True)
+        click.echo(f"Imported {report.imported} rows, {report.failed} failed.")
+        if report.failed:
+            raise click.exceptions.Exit(1)
+
+    @app.cli.command("export-orders")
+    @click.argument("output", type=click.File("wb"), default="-")
+    @click.option("--format", "format_", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv", show_default=True)
+    @click.option("--chunk-size", default=CHUNK_SIZE, show_default=True)
+    @click.option("--date-from", type=click.DateTime(["%Y-%m-%d"]))
+    @click.option("--date-to", type=click.DateTime(["%Y-%m-%d"]))
+    def export_orders_command(output, format_, chunk_size, date_from, date_to):
+        """Stream every order joined to its product, partner and warehouse to OUTPUT (stdout by default)."""
+        try:
+            chunks = export_orders(
+                format_,
+                chunk_size=chunk_size,
+                date_from=date_from and date_from.date(),
+                date_to=date_to and date_to.date(),
+            )
+        except ExportFormatError as error:
+            raise click.ClickException(str(error))
+        for chunk in chunks:
+            output.write(chunk)
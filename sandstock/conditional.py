@@ -0,0 +1,168 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+
+from flask import Flask, current_app, g, has_request_context, request
+from flask import session as user_session
+from sqlalchemy import event, insert, select, update
+
+from sandstock.models import Order, Partner, Product, TableVersion, Warehouse, db
+
+VERSIONED = (Product, Partner, Warehouse, Order)
+VERSIONED_TABLES = frozenset(model.__tablename__ for model in VERSIONED)
+
+
+def _record(session, tables):
+    tables = VERSIONED_TABLES.intersection(tables)
+    if tables:
+        session.info.setdefault("changed_tables", set()).update(tables)
+
+
+@event.listens_for(db.session, "after_flush")
+def _record_flush(session, flush_context):
+    _record(session, {instance.__tablename__ for instance in (*session.new, *session.dirty, *session.deleted)})
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _record_statement(orm_execute_state):
+    # Bulk inserts and updates skip the flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _record(orm_execute_state.session, {orm_execute_state.statement.table.name})
+
+
+@event.listens_for(db.session, "before_commit")
+def _bump_versions(session):
+    # In the transaction of the write itself: the versions move with the data or not at
+    # all, a failed bump fails the commit instead of leaving stale tags behind. The rows
+    # are locked from here to the commit only, one UPDATE per table in name order so two
+    # writers always take them in the same order.
+    if session.in_nested_transaction():
+        # A savepoint is being released, the transaction around it is still open.
+        return
+    # The last changes are flushed after this event, they have to be recorded first.
+    session.flush()
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        if has_request_context():
+            for name in tables:
+                g.get("table_versions", {}).pop(name, None)
+        connection = session.connection(bind_arguments={"mapper": TableVersion.__mapper__})
+        for name in sorted(tables):
+            connection.execute(
+                update(TableVersion)
+                .where(TableVersion.name == name)
+                .values(version=TableVersion.version + 1, changed_at=datetime.now(timezone.utc))
+            )
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_versions(target, connection, **kwargs):
+    now = datetime.now(timezone.utc)
+    connection.execute(
+        insert(target), [{"name": name, "version": 0, "changed_at": now} for name in sorted(VERSIONED_TABLES)]
+    )
+
+
+def _release(root):
+    # Pages change with the code too: tags from another release never match.
+    digest = hashlib.blake2b(digest_size=8)
+    for directory, directories, files in sorted(os.walk(root)):
+        directories[:] = sorted(name for name in directories if name != "__pycache__")
+        for name in sorted(files):
+            with open(os.path.join(directory, name), "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _tag(*parts):
+    return hashlib.blake2b(
+        repr((current_app.extensions["sandstock_release"], parts)).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _answer(tag):
+    g.etag = tag
+    if request.if_none_match.contains_weak(tag):
+        return current_app.response_class(status=304)
+    return None
+
+
+def _cacheable():
+    # A pending flash message is rendered once, the page it lands on cannot be reused.
+    return request.method == "GET" and "_flashes" not in user_session
+
+
+def table_versions(models):
+    names = sorted({model.__tablename__ for model in models})
+    rows = db.session.execute(
+        select(TableVersion.name, TableVersion.version, TableVersion.changed_at).where(TableVersion.name.in_(names))
+    ).all()
+    return rows if len(rows) == len(names) else None
+
+
+def not_modified(*models):
+    # Answers a conditional GET from the versions of the tables the page reads, with
+    # one query, before the view loads or renders anything. Returns the 304 response,
+    # or None when the view has to run; its response then carries the ETag.
+    if not _cacheable():
+        return None
+    versions = table_versions(models)
+    if versions is None:
+        return None
+    g.table_versions = {**g.get("table_versions", {}), **{row.name: row.version for row in versions}}
+    g.last_modified = max(row.changed_at for row in versions)
+    return _answer(_tag(*((row.name, row.version) for row in versions)))
+
+
+def table_version(model):
+    # The version the database holds for the table, read once per request. Cached
+    # pages are keyed with it, or another worker's cache could serve stale rows.
+    name = model.__tablename__
+    versions = g.setdefault("table_versions", {}) if has_request_context() else {}
+    if name not in versions:
+        versions[name] = db.session.scalar(select(TableVersion.version).where(TableVersion.name == name))
+    return versions[name]
+
+
+def form_not_modified(form):
+    # Edit pages have their rows loaded already: the tag is what the form shows, and
+    # the CSRF token it embeds. That token expires, so the tag changes every half of its
+    # time limit and a page reused from the browser cache has half its lifetime left.
+    if not _cacheable():
+        return None
+    fields = tuple((name, value) for name, value in form.data.items() if name != "csrf_token")
+    csrf = None
+    if current_app.config.get("WTF_CSRF_ENABLED", True):
+        time_limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+        csrf = (user_session.get("csrf_token"), int(time.time() // (time_limit / 2)) if time_limit else None)
+    return _answer(_tag(fields, csrf))
+
+
+def init_conditional_requests(app: Flask):
+    # Every GET is revalidated (no-cache): a 304 when its tag still matches. Views call
+    # `not_modified` or `form_not_modified` to answer before doing any work, other JSON
+    # responses are tagged with a digest of their body.
+    app.extensions["sandstock_release"] = _release(app.root_path)
+
+    @app.before_request
+    def reset_versions():
+        # g outlives the request when an app context was already pushed, as in tests.
+        g.pop("table_versions", None)
+
+    @app.after_request
+    def add_validators(response):
+        if request.method != "GET" or response.status_code not in (200, 304):
+            return response
+        if "etag" in g:
+            response.set_etag(g.pop("etag"), weak=True)
+            if "last_modified" in g:
+                response.last_modified = g.pop("last_modified")
+        elif response.mimetype == "application/json" and not response.is_streamed:
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+        else:
+            return response
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,115 @@
+import logging
+import os
+import time
+from pathlib import Path
+from threading import Lock
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from sandstock.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class SecretProvider:
+    # Values are fetched on first use and kept until `max_age` seconds have passed or
+    # `margin` seconds before the secret expires, whichever comes first. A failed
+    # refresh keeps serving the previous value while it has not expired.
+
+    def __init__(self, max_age=3600, margin=300, clock=time.time):
+        self.max_age = max_age
+        self.margin = margin
+        self.clock = clock
+        self.values = {}
+        self.lock = Lock()
+
+    def fetch(self, name):
+        raise NotImplementedError
+
+    def get(self, name):
+        with self.lock:
+            cached = self.values.get(name)
+            now = self.clock()
+            if cached and now < cached[1]:
+                return cached[0]
+            try:
+                value, expires_at = self.fetch(name)
+            except Exception:
+                if cached and (cached[2] is None or now < cached[2]):
+                    logger.warning("Could not refresh secret %s, keeping the cached value.", name, exc_info=True)
+                    return cached[0]
+                raise
+            refresh_at = now + self.max_age
+            if expires_at is not None:
+                refresh_at = min(refresh_at, expires_at - self.margin)
+            self.values[name] = (value, refresh_at, expires_at)
+            return value
+
+
+class KeyVaultSecretProvider(SecretProvider):
+
+    def __init__(self, vault_url, **kwargs):
+        super().__init__(**kwargs)
+        self.vault_url = vault_url
+        self.client = None
+
+    def fetch(self, name):
+        if self.client is None:
+            from azure.identity import DefaultAzureCredential
+            from azure.keyvault.secrets import SecretClient
+
+            self.client = SecretClient(vault_url=self.vault_url, credential=DefaultAzureCredential())
+        secret = self.client.get_secret(name)
+        expires_on = secret.properties.expires_on
+        return secret.value or "", expires_on.timestamp() if expires_on else None
+
+
+class LocalSecretProvider(SecretProvider):
+    # Stand-in for development and CI: `my-db-password` is read from the
+    # MY_DB_PASSWORD environment variable, or from a file named after the secret.
+
+    def __init__(self, directory=None, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def fetch(self, name):
+        variable = name.upper().replace("-", "_")
+        if variable in os.environ:
+            return os.environ[variable], None
+        if self.directory and (Path(self.directory) / name).is_file():
+            return (Path(self.directory) / name).read_text().strip(), None
+        raise KeyError(f"Secret {name} is not set: define {variable} or add it to {self.directory or 'a directory'}.")
+
+
+def create_secret_provider(config):
+    if config["SECRET_PROVIDER"] == "keyvault":
+        return KeyVaultSecretProvider(config["KEY_VAULT_URL"], max_age=config["SECRET_MAX_AGE"])
+    return LocalSecretProvider(config["SECRET_DIRECTORY"], max_age=config["SECRET_MAX_AGE"])
+
+
+def _odbc_value(value):
+    return "{" + value.replace("}", "}}") + "}"
+
+
+def init_secrets(app: Flask):
+    # The database password is only looked up when the pool opens a connection, so
+    # creating the app or running a CLI command that does not touch the database
+    # never waits on Key Vault, and rotated passwords are picked up on reconnect.
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if not url.username or url.password is not None:
+        return
+    provider = create_secret_provider(app.config)
+    app.extensions["sandstock_secrets"] = provider
+    secret = app.config["DATABASE_PASSWORD_SECRET"]
+
+    def do_connect(dialect, connection_record, cargs, cparams):
+        password = provider.get(secret)
+        if dialect.driver == "pyodbc":
+            cargs[0] = f"{cargs[0]};PWD={_odbc_value(password)}"
+        else:
+            cparams["password"] = password
+
+    with app.app_context():
+        event.listen(db.engine, "do_connect", do_connect)
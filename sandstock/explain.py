@@ -0,0 +1,113 @@
+import re
+from contextlib import contextmanager
+from itertools import product
+from urllib.parse import urlsplit
+
+from flask import Flask, url_for
+from sqlalchemy import event
+
+from sandstock.extensions import db
+from sandstock.search import GRAM_SIZE
+
+TABLE_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"^SCAN (?:TABLE )?(?!anon_)\w+$"),
+    "mssql": re.compile(r"^(?:Table Scan|Clustered Index Scan)\b"),
+    "postgresql": re.compile(r"\bSeq Scan on \w+"),
+}
+
+INDEX_SEEK_PATTERNS = {
+    "sqlite": re.compile(r"^SEARCH \w+ USING "),
+    "mssql": re.compile(r"^(?:Clustered )?Index Seek\b"),
+    "postgresql": re.compile(r"\b(?:Index Scan|Index Only Scan|Bitmap Index Scan) "),
+}
+
+# Searches are probed with an id prefix, and with a query long enough to be split into
+# grams: shorter ones only match name prefixes.
+PROBE_QUERIES = ("1", "a" * GRAM_SIZE)
+
+# Routes that read a whole table by design, with the reason. Their scans are reported
+# by `flask explain` without failing it.
+EXPECTED_SCANS: dict[str, str] = {
+    "/order/export": "Streams every order joined to its dimensions, a full read is the point.",
+    "/analytics/products": "Sums the order history per product up to date_to, one row per product comes back.",
+    "/api/v1/orders": "Without filters the first page reads fact_order in id order and stops after `limit` rows.",
+}
+
+
+@contextmanager
+def capture_statements(engine, selects_only=True):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not selects_only or statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(connection, statement, parameters):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        return [row[-1] for row in rows]
+    if dialect == "postgresql":
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+        return [row[0].strip() for row in rows]
+    if dialect == "mssql":
+        connection.exec_driver_sql("SET SHOWPLAN_ALL ON")
+        try:
+            rows = connection.exec_driver_sql(statement, parameters).mappings().all()
+        finally:
+            connection.exec_driver_sql("SET SHOWPLAN_ALL OFF")
+        return [f"{row['PhysicalOp']} {row['Argument'] or ''}".strip() for row in rows if row["PhysicalOp"]]
+    raise NotImplementedError(f"EXPLAIN is not supported for dialect {dialect}")
+
+
+def table_scans(dialect, plan):
+    pattern = TABLE_SCAN_PATTERNS[dialect]
+    return [line for line in plan if pattern.search(line)]
+
+
+def index_seeks(dialect, plan):
+    pattern = INDEX_SEEK_PATTERNS[dialect]
+    return [line for line in plan if pattern.search(line)]
+
+
+def expected_scan(url):
+    return EXPECTED_SCANS.get(urlsplit(url).path)
+
+
+def probe_urls(app: Flask):
+    urls = []
+    with app.test_request_context():
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint == "static" or "GET" not in (rule.methods or ()):
+                continue
+            # Integer arguments get id 1, `any` converters are probed with each of their values.
+            candidates = [
+                sorted(getattr(rule._converters[argument], "items", [1])) for argument in sorted(rule.arguments)
+            ]
+            for values in product(*candidates):
+                arguments = dict(zip(sorted(rule.arguments), values))
+                for query in PROBE_QUERIES:
+                    urls.append(url_for(rule.endpoint, query=query, **arguments))  # type: ignore[arg-type]
+    return urls
+
+
+def explain_routes(app: Flask):
+    client = app.test_client()
+    reports = []
+    with app.app_context():
+        engine = db.engine
+        for url in probe_urls(app):
+            with capture_statements(engine) as statements:
+                client.get(url)
+            with engine.connect() as connection:
+                for statement, parameters in statements:
+                    plan = explain(connection, statement, parameters)
+                    reports.append((url, statement, plan, table_scans(engine.dialect.name, plan)))
+    return reports
@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+from datetime import datetime
+from importlib.util import find_spec
+
+from sqlalchemy import select
+
+from sandstock.models import Order, Partner, Product, Warehouse, db
+from sandstock.search import order_filters
+
+CHUNK_SIZE = 10000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+def order_export_statement(**criteria):
+    return (
+        select(
+            Order.id.label("order_id"),
+            Order.created_at,
+            Order.category,
+            Order.quantity,
+            Order.unit_price,
+            Order.currency,
+            Order.modified_by,
+            Order.product_id,
+            Product.name.label("product_name"),
+            Product.category_label.label("product_category"),
+            Order.partner_id,
+            Partner.name.label("partner_name"),
+            Order.warehouse_id,
+            Warehouse.name.label("warehouse_name"),
+        )
+        .join(Product, Product.id == Order.product_id)
+        .join(Partner, Partner.id == Order.partner_id)
+        .join(Warehouse, Warehouse.id == Order.warehouse_id)
+        .where(*order_filters(**criteria))
+        .order_by(Order.id)
+    )
+
+
+def _csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_chunks(columns, partitions):
+    names = [column.name for column in columns]
+    for rows in partitions:
+        yield "".join(json.dumps(dict(zip(names, row)), default=_json_default) + "\n" for row in rows).encode()
+
+
+class _ParquetSink:
+    # Collects what the writer produced since the last drain while keeping track of
+    # the absolute position, which the parquet footer refers to.
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(columns):
+    import pyarrow as arrow
+
+    types = {int: arrow.int64(), float: arrow.float64(), str: arrow.string(), datetime: arrow.timestamp("us")}
+    return arrow.schema([(column.name, types[column.type.python_type]) for column in columns])
+
+
+def _parquet_chunks(columns, partitions):
+    import pyarrow as arrow
+    import pyarrow.parquet as parquet
+
+    # The schema comes from the statement, not from the first rows: an export without
+    # any is still a readable file.
+    schema = _parquet_schema(columns)
+    names = [column.name for column in columns]
+    sink = _ParquetSink()
+    writer = parquet.ParquetWriter(arrow.PythonFile(sink, mode="w"), schema)
+    for rows in partitions:
+        # One row group per chunk.
+        writer.write_table(arrow.Table.from_pylist([dict(zip(names, row)) for row in rows], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+WRITERS = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "parquet": _parquet_chunks}
+
+
+def _stream(writer, statement, chunk_size):
+    # yield_per streams the result with a server-side cursor, so only one chunk of
+    # rows is in memory at a time, whatever the size of the export.
+    result = db.session.execute(statement, execution_options={"yield_per": chunk_size})
+    try:
+        yield from writer(list(statement.selected_columns), result.partitions())
+    finally:
+        result.close()
+
+
+def export_orders(format="csv", chunk_size=CHUNK_SIZE, **criteria):
+    if format not in WRITERS:
+        raise ExportFormatError(f"Unsupported export format: {format}. Expected one of {', '.join(WRITERS)}.")
+    if format == "parquet" and find_spec("pyarrow") is None:
+        raise ExportFormatError("Parquet exports need pyarrow: pip install sandstock[parquet].")
+    return _stream(WRITERS[format], order_export_statement(**criteria), chunk_size)
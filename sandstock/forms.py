@@ -1,10 +1,13 @@
 from flask_wtf import FlaskForm
+from sqlalchemy import select
 from wtforms import PasswordField, StringField, SubmitField
 from wtforms.fields.choices import SelectField
-from wtforms.fields.datetime import DateTimeLocalField
+from wtforms.fields.datetime import DateTimeField, DateTimeLocalField
 from wtforms.fields.numeric import FloatField, IntegerField
 from wtforms.fields.simple import TextAreaField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError
+
+from sandstock.models import Partner, Product, Warehouse, db
 
 
 class LoginForm(FlaskForm):
@@ -112,18 +115,50 @@ class CreateOrderForm(FlaskForm):
     category = SelectField(
         "Category", choices=[("TRANSACTION", "TRANSACTION"), ("CORRECTION", "CORRECTION")], validators=[DataRequired()]
     )
-    product_name = SelectField("Product", coerce=str, validators=[DataRequired()])
-    partner_name = SelectField("Partner", coerce=str, validators=[DataRequired()])
-    warehouse_name = SelectField("Warehouse", coerce=str, validators=[DataRequired()])
+    # Options are fetched on demand from the /<entity>/choices endpoints, so the
+    # submitted ids are checked against the database instead of a choice list.
+    product_id = SelectField("Product", coerce=int, choices=[], validate_choice=False, validators=[DataRequired()])
+    partner_id = SelectField("Partner", coerce=int, choices=[], validate_choice=False, validators=[DataRequired()])
+    warehouse_id = SelectField("Warehouse", coerce=int, choices=[], validate_choice=False, validators=[DataRequired()])
     quantity = IntegerField("Quantity", validators=[DataRequired()])
     unit_price = FloatField("Unit Price")
     currency = SelectField("Currency", choices=[("USD", "USD"), ("EUR", "EUR")], validators=[DataRequired()])
     submit = SubmitField("Add Order")
 
     def validate_unit_price(self, field):
+        if field.data is None:
+            raise ValidationError("Price is required.")
         if field.data < 0.0:
             raise ValidationError("Price must be greater or equal than 0.")
 
+    def validate(self, extra_validators=None, check_references=True):
+        if not super().validate(extra_validators):
+            return False
+        return not check_references or self.validate_references()
+
+    def validate_references(self):
+        # One round trip for the three ids. Not cached: a reference deleted by another
+        # worker must be refused at once.
+        fields = ((self.product_id, Product), (self.partner_id, Partner), (self.warehouse_id, Warehouse))
+        lookups = [
+            select(model.name).where(model.id == field.data, model.deleted == False).scalar_subquery()  # noqa: E712
+            for field, model in fields
+        ]
+        valid = True
+        for (field, model), name in zip(fields, db.session.execute(select(*lookups)).one()):
+            if name is None:
+                field.errors.append(f"{field.label.text} {field.data} does not exist.")
+                valid = False
+            else:
+                field.choices = [(field.data, f"{name} ({field.data})")]
+        return valid
+
+
+class ImportOrderForm(CreateOrderForm):
+    created_at = DateTimeField(
+        "Created At", format=["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"], validators=[Optional()]
+    )
+
 
 class UpdateOrderForm(FlaskForm):
     id = IntegerField("ID", render_kw={"readonly": True})
@@ -0,0 +1,292 @@
+import csv
+import io
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import PurePath
+
+from flask_wtf import FlaskForm
+from sqlalchemy import insert, literal, select, union_all
+from werkzeug.datastructures import MultiDict
+
+from sandstock.forms import CreatePartnerForm, CreateProductForm, CreateWarehouseForm, ImportOrderForm
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse, db
+from sandstock.search import get_backend
+from sandstock.services import apply_stock_movements, apply_warehouse_movements, chunked
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "parquet")
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    def to_dict(self):
+        return {"imported": self.imported, "failed": self.failed, "errors": self.errors}
+
+
+def file_format(filename):
+    suffix = PurePath(filename or "").suffix.lstrip(".").lower()
+    if suffix not in FORMATS:
+        raise ImportFormatError(f"Unsupported file format: {filename}. Expected one of {', '.join(FORMATS)}.")
+    return suffix
+
+
+def read_rows(stream, format, batch_size=BATCH_SIZE):
+    # Rows are yielded one at a time so that only the current batch is ever held in memory.
+    if format == "csv":
+        yield from csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    elif format == "parquet":
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError as error:
+            raise ImportFormatError("Parquet imports need pyarrow: pip install sandstock[parquet].") from error
+        for batch in parquet.ParquetFile(stream).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ImportFormatError(f"Unsupported file format: {format}.")
+
+
+def _formdata(row):
+    return MultiDict({key: "" if value is None else str(value) for key, value in row.items()})
+
+
+def _contacts_and_addresses(forms, modified_by):
+    contacts = [
+        {"email": form.email.data, "phone_number": form.phone_number.data, "modified_by": modified_by} for form in forms
+    ]
+    addresses = [
+        {
+            "street_address": form.street_address.data,
+            "city": form.city.data,
+            "state": form.state.data,
+            "postal_code": form.postal_code.data,
+            "country": form.country.data,
+            "modified_by": modified_by,
+        }
+        for form in forms
+    ]
+    contact_ids = _insert(Contact, contacts)
+    address_ids = _insert(Address, addresses)
+    return contact_ids, address_ids
+
+
+def _insert(model, rows):
+    # Multi-row INSERT ... OUTPUT/RETURNING, ids come back in the order of the rows.
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return db.session.execute(statement, rows).scalars().all()
+
+
+def _index(model, ids, forms):
+    get_backend().add(db.session.connection(), model.__tablename__, zip(ids, (form.name.data for form in forms)))
+    return ids
+
+
+class Importer(ABC):
+    form: type[FlaskForm]
+
+    def validate(self, form):
+        return form.validate()
+
+    def check(self, rows):
+        return rows, []
+
+    @abstractmethod
+    def insert(self, forms, modified_by):
+        pass
+
+
+class ProductImporter(Importer):
+    form = CreateProductForm
+
+    def insert(self, forms, modified_by):
+        rows = [
+            {
+                "name": form.name.data,
+                "category_label": form.category_label.data,
+                "description": form.description.data,
+                "quantity_available": 0,
+                "modified_by": modified_by,
+            }
+            for form in forms
+        ]
+        return _index(Product, _insert(Product, rows), forms)
+
+
+class PartnerImporter(Importer):
+    form = CreatePartnerForm
+
+    def insert(self, forms, modified_by):
+        contact_ids, address_ids = _contacts_and_addresses(forms, modified_by)
+        rows = [
+            {
+                "name": form.name.data,
+                "contact_person": form.contact_person.data,
+                "contact_id": contact_id,
+                "address_id": address_id,
+                "modified_by": modified_by,
+            }
+            for form, contact_id, address_id in zip(forms, contact_ids, address_ids)
+        ]
+        return _index(Partner, _insert(Partner, rows), forms)
+
+
+class WarehouseImporter(Importer):
+    form = CreateWarehouseForm
+
+    def insert(self, forms, modified_by):
+        contact_ids, address_ids = _contacts_and_addresses(forms, modified_by)
+        rows = [
+            {"name": form.name.data, "contact_id": contact_id, "address_id": address_id, "modified_by": modified_by}
+            for form, contact_id, address_id in zip(forms, contact_ids, address_ids)
+        ]
+        return _index(Warehouse, _insert(Warehouse, rows), forms)
+
+
+class OrderImporter(Importer):
+    # Orders change the stock of their products.
+    form = ImportOrderForm
+    references = ((Product, "product_id"), (Partner, "partner_id"), (Warehouse, "warehouse_id"))
+
+    def validate(self, form):
+        # References are checked for the whole batch at once, see check().
+        return form.validate(check_references=False)
+
+    def check(self, rows):
+        # The ids of the three references share the IN lists of one statement, cut in
+        # chunks to stay under the parameter limit of SQL Server on large batches.
+        models = {field: model for model, field in self.references}
+        wanted = [
+            (field, entity_id)
+            for _, field in self.references
+            for entity_id in sorted({getattr(form, field).data for _, form in rows})
+        ]
+        existing = set()
+        for chunk in chunked(wanted):
+            ids = defaultdict(list)
+            for field, entity_id in chunk:
+                ids[field].append(entity_id)
+            lookups = [
+                select(literal(field), models[field].id).where(
+                    models[field].id.in_(entity_ids),
+                    models[field].deleted == False,  # noqa: E712
+                )
+                for field, entity_ids in ids.items()
+            ]
+            existing.update((field, entity_id) for field, entity_id in db.session.execute(union_all(*lookups)))
+
+        valid, errors = [], []
+        for number, form in rows:
+            missing = {
+                field: [f"{getattr(form, field).label.text} {getattr(form, field).data} does not exist."]
+                for _, field in self.references
+                if (field, getattr(form, field).data) not in existing
+            }
+            if missing:
+                errors.append((number, missing))
+            else:
+                valid.append((number, form))
+        return valid, errors
+
+    def insert(self, forms, modified_by):
+        rows = [
+            {
+                "category": form.category.data,
+                "product_id": form.product_id.data,
+                "partner_id": form.partner_id.data,
+                "warehouse_id": form.warehouse_id.data,
+                "quantity": form.quantity.data,
+                "unit_price": form.unit_price.data,
+                "currency": form.currency.data,
+                "created_at": form.created_at.data or datetime.now(timezone.utc),
+                "modified_by": modified_by,
+            }
+            for form in forms
+        ]
+        ids = _insert(Order, rows)
+
+        deltas = defaultdict(int)
+        movements = defaultdict(int)
+        for form in forms:
+            deltas[form.product_id.data] += form.quantity.data
+            movements[form.product_id.data, form.warehouse_id.data] += form.quantity.data
+        apply_stock_movements(deltas)
+        apply_warehouse_movements(movements, max(ids))
+        return ids
+
+
+IMPORTERS = {
+    "product": ProductImporter(),
+    "partner": PartnerImporter(),
+    "warehouse": WarehouseImporter(),
+    "order": OrderImporter(),
+}
+
+
+def _validate(importer, batch):
+    # Returns the valid forms and the errors of the other rows, both in row order.
+    forms, failures = [], []
+    for number, row in batch:
+        form = importer.form(formdata=_formdata(row), meta={"csrf": False})
+        if importer.validate(form):
+            forms.append((number, form))
+        else:
+            failures.append((number, form.errors))
+    if forms:
+        forms, errors = importer.check(forms)
+        failures.extend(errors)
+    return forms, sorted(failures, key=lambda failure: failure[0])
+
+
+def import_rows(entity, rows, modified_by, batch_size=BATCH_SIZE):
+    importer = IMPORTERS[entity]
+    report = ImportReport()
+    numbered = enumerate(rows, start=1)
+    while batch := list(islice(numbered, batch_size)):
+        forms, failures = _validate(importer, batch)
+        for number, errors in failures:
+            report.fail(number, errors)
+        if forms:
+            importer.insert([form for _, form in forms], modified_by)
+            db.session.commit()
+            report.imported += len(forms)
+    return report
+
+
+def import_file(entity, stream, format, modified_by, batch_size=BATCH_SIZE):
+    return import_rows(entity, read_rows(stream, format, batch_size), modified_by, batch_size=batch_size)
+
+
+def create_rows(entity, rows, modified_by, batch_size=BATCH_SIZE):
+    # All or nothing: every row is validated before any is inserted, and the inserts
+    # are committed together. Returns the new ids in row order, or the errors.
+    importer = IMPORTERS[entity]
+    numbered = enumerate(rows, start=1)
+    batches, failures = [], []
+    while batch := list(islice(numbered, batch_size)):
+        forms, errors = _validate(importer, batch)
+        batches.append([form for _, form in forms])
+        failures.extend(errors)
+    if failures:
+        return [], failures
+    ids = []
+    for forms in batches:
+        if forms:
+            ids.extend(importer.insert(forms, modified_by))
+    db.session.commit()
+    return ids, []
@@ -0,0 +1,137 @@
+import logging
+import time
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+
+from sandstock.extensions import db
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_STATEMENT = 2000
+
+
+class QueryStats:
+    # What a request asked of the database: every statement, the time spent in the
+    # driver and the rows its writes changed. Rows read are not counted: pyodbc, like
+    # sqlite3, reports a rowcount of -1 for SELECTs, the rows are only known once the
+    # caller fetched them, and results are streamed (yield_per) past any count.
+
+    def __init__(self):
+        self.statements = []
+        self.duration = 0.0
+        self.rows_written = 0
+        self.slowest = None
+        self.slowest_duration = 0.0
+
+    def add(self, statement, duration, rows_written):
+        self.statements.append(statement)
+        self.duration += duration
+        # -1 when the driver does not know, as for executemany on pyodbc.
+        self.rows_written += max(rows_written, 0)
+        if duration >= self.slowest_duration:
+            self.slowest, self.slowest_duration = statement, duration
+
+    def to_dict(self):
+        return {
+            "statements": len(self.statements),
+            "db_ms": round(self.duration * 1000, 3),
+            "rows_written": self.rows_written,
+            "slowest_ms": round(self.slowest_duration * 1000, 3),
+            "slowest": _compact(self.slowest) if self.slowest else None,
+        }
+
+
+def _compact(statement):
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= MAX_LOGGED_STATEMENT else statement[:MAX_LOGGED_STATEMENT] + "..."
+
+
+def parameter_shape(parameters, executemany=False):
+    # Types instead of values: enough to tell a plan apart, nothing sensitive logged.
+    if executemany:
+        parameters = list(parameters)
+        return f"{len(parameters)} x {parameter_shape(parameters[0])}" if parameters else "[]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+def server_timing(stats, total):
+    return ", ".join(
+        [
+            f'db;dur={stats.duration * 1000:.3f};desc="{len(stats.statements)} statements"',
+            f"db-slowest;dur={stats.slowest_duration * 1000:.3f}",
+            f"app;dur={total * 1000:.3f}",
+        ]
+    )
+
+
+def init_instrumentation(app: Flask):
+    # Every statement sent during a request is recorded on `g.queries`, so that views
+    # can be held to a query budget in tests. Requests report it in a Server-Timing
+    # header and a log line, statements slower than SLOW_QUERY_MS are logged wherever
+    # they run.
+    slow_query = app.config["SLOW_QUERY_MS"] / 1000
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.sandstock_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.sandstock_started
+        if has_request_context() and "queries" in g:
+            written = context.isinsert or context.isupdate or context.isdelete
+            g.queries.add(statement, duration, cursor.rowcount if written else 0)
+        if duration >= slow_query:
+            logger.warning(
+                "Slow query, %.1f ms: %s parameters=%s",
+                duration * 1000,
+                _compact(statement),
+                parameter_shape(parameters, executemany),
+                extra={
+                    "duration_ms": round(duration * 1000, 3),
+                    "endpoint": request.endpoint if has_request_context() else None,
+                },
+            )
+
+    @app.before_request
+    def reset_queries():
+        g.queries = QueryStats()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def report_queries(response):
+        if "queries" not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        response.headers["Server-Timing"] = server_timing(g.queries, total)
+        stats = g.queries.to_dict()
+        logger.info(
+            "%s %s %s statements=%d db_ms=%.1f rows_written=%d slowest_ms=%.1f app_ms=%.1f",
+            request.method,
+            request.path,
+            response.status_code,
+            stats["statements"],
+            stats["db_ms"],
+            stats["rows_written"],
+            stats["slowest_ms"],
+            total * 1000,
+            extra={
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "app_ms": round(total * 1000, 3),
+                **stats,
+            },
+        )
+        return response
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", after_cursor_execute)
+
+
+def query_count(kind=None):
+    statements = g.queries.statements if "queries" in g else []
+    return sum(1 for statement in statements if kind is None or statement.lstrip().upper().startswith(kind))
@@ -0,0 +1,241 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from flask import Flask, current_app, g, request
+
+# Seconds. Requests are mostly a few database round trips, imports and reports take longer.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+INITIAL_FILE_SIZE = 64 * 1024
+ARCHIVE = "archive.db"
+METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+
+METRICS = {
+    "sandstock_requests_total": ("counter", "Requests served, by endpoint, method and status."),
+    "sandstock_request_duration_seconds": ("histogram", "Time to serve a request, by endpoint and method."),
+    "sandstock_request_db_seconds": ("histogram", "Time a request spent in database calls, by endpoint."),
+    "sandstock_db_pool_checkout_seconds": (
+        "histogram",
+        "Time to get a connection from the pool: waiting for one to be returned, or opening one.",
+    ),
+    "sandstock_db_connections_opened_total": ("counter", "Physical database connections opened."),
+    "sandstock_db_connections_invalidated_total": ("counter", "Database connections discarded after an error."),
+    "sandstock_cache_requests_total": ("counter", "Dimension cache lookups, by table and result (hit or miss)."),
+    "sandstock_cache_evictions_total": ("counter", "Dimension cache entries evicted to make room for new ones."),
+    "sandstock_stock_update_conflicts_total": (
+        "counter",
+        "Concurrent stock updates that collided and were applied again, by kind.",
+    ),
+}
+
+
+class LocalStore:
+    # Values of the current process only: for the development server and tests.
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = Lock()
+
+    def add(self, key, amount):
+        with self.lock:
+            self.values[key] += amount
+
+    def collect(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def _read_entries(data):
+    # Entries are the JSON key, its length before it and its float64 value after it,
+    # aligned on 8 bytes. The first 8 bytes hold the used length, written last.
+    (used,) = struct.unpack_from("<Q", data, 0)
+    position = 8
+    while position < used:
+        (length,) = struct.unpack_from("<I", data, position)
+        start, stop = position + 4, position + 4 + length
+        key = json.loads(bytes(data[start:stop]))
+        value_position = stop + (-(4 + length) % 8)
+        (value,) = struct.unpack_from("<d", data, value_position)
+        yield (key[0], key[1], tuple(tuple(label) for label in key[2])), value, value_position
+        position = value_position + 8
+
+
+def read_file(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    return {key: value for key, value, _ in _read_entries(data)} if len(data) >= 8 else {}
+
+
+class FileStore:
+    # Gunicorn workers are separate processes: each one writes its values to its own
+    # memory-mapped file in a shared directory and whoever serves /metrics sums them.
+    # Writes stay in memory, they cost a dict lookup and an 8-byte store.
+
+    def __init__(self, directory, name=None):
+        self.directory = directory
+        self.path = os.path.join(directory, name or f"{os.getpid()}.db")
+        self.lock = Lock()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if os.fstat(self.fd).st_size < INITIAL_FILE_SIZE:
+            os.ftruncate(self.fd, INITIAL_FILE_SIZE)
+        self.map = mmap.mmap(self.fd, 0)
+        self.positions = {key: position for key, _, position in _read_entries(self.map)}
+        (self.used,) = struct.unpack_from("<Q", self.map, 0)
+        if not self.used:
+            self.used = 8
+            struct.pack_into("<Q", self.map, 0, self.used)
+
+    def _position(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            encoded = json.dumps(key).encode()
+            padded = len(encoded) + (-(4 + len(encoded)) % 8)
+            size = 4 + padded + 8
+            while self.used + size > len(self.map):
+                grown = len(self.map) * 2
+                self.map.close()
+                os.ftruncate(self.fd, grown)
+                self.map = mmap.mmap(self.fd, 0)
+            struct.pack_into(f"<I{padded}sd", self.map, self.used, len(encoded), encoded, 0.0)
+            position = self.used + 4 + padded
+            self.used += size
+            struct.pack_into("<Q", self.map, 0, self.used)
+            self.positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        with self.lock:
+            position = self._position(key)
+            (value,) = struct.unpack_from("<d", self.map, position)
+            struct.pack_into("<d", self.map, position, value + amount)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def collect(self):
+        values = defaultdict(float)
+        for path in glob.glob(os.path.join(self.directory, "*.db")):
+            for key, value in read_file(path).items():
+                values[key] += value
+        return dict(values)
+
+
+def mark_process_dead(pid, directory):
+    # Called by the gunicorn master when a worker exits: its counts move to the
+    # archive file, so totals never go down and files do not pile up with restarts.
+    path = os.path.join(directory, f"{pid}.db")
+    if not os.path.exists(path):
+        return
+    archive = FileStore(directory, ARCHIVE)
+    for key, value in read_file(path).items():
+        archive.add(key, value)
+    archive.close()
+    os.remove(path)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += "{" + ",".join(f'{label}="{_label_value(label_value)}"' for label, label_value in labels) + "}"
+    return f"{name} {value!r}"
+
+
+class Metrics:
+
+    def __init__(self, store):
+        self.store = store
+        # Called before rendering, for values counted outside of the application.
+        self.collectors = []
+
+    def inc(self, name, labels=(), amount=1.0):
+        self.store.add(("counter", name, labels), amount)
+
+    def advance(self, name, total, labels=()):
+        # Brings a counter kept elsewhere up to its total, summed over every worker. A
+        # total that went down (a restarted server) is left alone.
+        key = ("counter", name, labels)
+        self.inc(name, labels, max(total - self.store.collect().get(key, 0.0), 0.0))
+
+    def observe(self, name, labels, value):
+        # Counts are kept per bucket, made cumulative when rendered.
+        index = bisect_left(BUCKETS, value)
+        bucket = BUCKETS[index] if index < len(BUCKETS) else "+Inf"
+        self.store.add(("bucket", name, labels + (("le", bucket),)), 1.0)
+        self.store.add(("sum", name, labels), value)
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        counters = defaultdict(list)
+        buckets = defaultdict(float)
+        sums = defaultdict(dict)
+        for (kind, name, labels), value in self.store.collect().items():
+            if kind == "counter":
+                counters[name].append((labels, value))
+            elif kind == "bucket":
+                buckets[name, labels] += value
+            else:
+                sums[name][labels] = value
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            if kind == "counter":
+                lines += [_sample(name, labels, value) for labels, value in sorted(counters[name])]
+                continue
+            for labels, total in sorted(sums[name].items()):
+                cumulative = 0.0
+                for bucket in (*BUCKETS, "+Inf"):
+                    cumulative += buckets.get((name, labels + (("le", bucket),)), 0.0)
+                    lines.append(_sample(f"{name}_bucket", labels + (("le", bucket),), cumulative))
+                lines += [_sample(f"{name}_sum", labels, total), _sample(f"{name}_count", labels, cumulative)]
+        return "\n".join(lines) + "\n"
+
+
+def init_metrics(app: Flask):
+    # Requests are counted and timed per endpoint, unmatched URLs and unknown methods
+    # together so that scanners cannot blow up the number of series.
+    directory = app.config["METRICS_DIR"]
+    metrics = Metrics(FileStore(directory) if directory else LocalStore())
+    app.extensions["sandstock_metrics"] = metrics
+
+    if directory:
+
+        def reopen():
+            # A worker forked from a process that already recorded gets its own file.
+            metrics.store = FileStore(directory)
+
+        os.register_at_fork(after_in_child=reopen)
+
+    @app.after_request
+    def record_request(response):
+        # Timed from the start recorded by sandstock.instrumentation.
+        if "request_started" not in g:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        method = request.method if request.method in METHODS else "other"
+        metrics.inc(
+            "sandstock_requests_total", (("endpoint", endpoint), ("method", method), ("status", response.status_code))
+        )
+        metrics.observe(
+            "sandstock_request_duration_seconds",
+            (("endpoint", endpoint), ("method", method)),
+            time.perf_counter() - g.request_started,
+        )
+        if "queries" in g:
+            metrics.observe("sandstock_request_db_seconds", (("endpoint", endpoint),), g.queries.duration)
+        return response
+
+
+def get_metrics() -> Metrics:
+    return current_app.extensions["sandstock_metrics"]
@@ -3,6 +3,11 @@ from datetime import datetime, timezone
 from sandstock.extensions import db
 
 
+def _active_index(name, *columns, deleted):
+    where = deleted == False  # noqa: E712
+    return db.Index(name, *columns, mssql_where=where, postgresql_where=where, sqlite_where=where)
+
+
 class Contact(db.Model):  # type: ignore
     __tablename__ = "dim_contact"
 
@@ -38,7 +43,7 @@ class Partner(db.Model):  # type: ignore
     __tablename__ = "dim_partner"
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.Text, nullable=False)
+    name = db.Column(db.String(200), nullable=False)
     contact_person = db.Column(db.String(200), nullable=True)
     address_id = db.Column(db.Integer, db.ForeignKey("dim_address.id"), nullable=False)
     contact_id = db.Column(db.Integer, db.ForeignKey("dim_contact.id"), nullable=False)
@@ -49,6 +54,14 @@ class Partner(db.Model):  # type: ignore
     modified_by = db.Column(db.String(254), nullable=False)
     deleted = db.Column(db.Boolean, default=False, nullable=False)
 
+    contact = db.relationship(Contact)
+    address = db.relationship(Address)
+
+    __table_args__ = (
+        db.Index("ix_dim_partner_deleted_name", deleted, name),
+        _active_index("ix_dim_partner_active", id, deleted=deleted),
+    )
+
 
 class Warehouse(db.Model):  # type: ignore
     __tablename__ = "dim_warehouse"
@@ -64,6 +77,14 @@ class Warehouse(db.Model):  # type: ignore
     modified_by = db.Column(db.String(254), nullable=False)
     deleted = db.Column(db.Boolean, default=False, nullable=False)
 
+    contact = db.relationship(Contact)
+    address = db.relationship(Address)
+
+    __table_args__ = (
+        db.Index("ix_dim_warehouse_deleted_name", deleted, name),
+        _active_index("ix_dim_warehouse_active", id, deleted=deleted),
+    )
+
 
 class Product(db.Model):  # type: ignore
     __tablename__ = "dim_product"
@@ -80,17 +101,86 @@ class Product(db.Model):  # type: ignore
     modified_by = db.Column(db.String(254), nullable=False)
     deleted = db.Column(db.Boolean, default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_dim_product_deleted_name", deleted, name),
+        _active_index("ix_dim_product_active", id, deleted=deleted),
+    )
+
 
 class Order(db.Model):  # type: ignore
     __tablename__ = "fact_order"
 
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(200), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey("dim_product.id"), nullable=False)
-    partner_id = db.Column(db.Integer, db.ForeignKey("dim_partner.id"), nullable=False)
-    warehouse_id = db.Column(db.Integer, db.ForeignKey("dim_warehouse.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("dim_product.id"), nullable=False, index=True)
+    partner_id = db.Column(db.Integer, db.ForeignKey("dim_partner.id"), nullable=False, index=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("dim_warehouse.id"), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(3), nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
     modified_by = db.Column(db.String(254), nullable=False)
+
+    product = db.relationship(Product)
+    partner = db.relationship(Partner)
+    warehouse = db.relationship(Warehouse)
+
+
+class SearchGram(db.Model):  # type: ignore
+    __tablename__ = "idx_search_gram"
+
+    entity = db.Column(db.String(50), primary_key=True)
+    gram = db.Column(db.String(3), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+
+    __table_args__ = (db.Index("ix_idx_search_gram_entity_id", entity, entity_id),)
+
+
+class StockByWarehouse(db.Model):  # type: ignore
+    # Stock of each product per warehouse, kept up to date with every order, see
+    # sandstock.services. `last_order_id` is the newest order folded in.
+    __tablename__ = "agg_stock_by_warehouse"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("dim_product.id"), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("dim_warehouse.id"), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    last_order_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("ix_agg_stock_by_warehouse_warehouse_id", warehouse_id, product_id),)
+
+
+class OrderRollup(db.Model):  # type: ignore
+    # Orders summed per day and per week (starting on Monday), see sandstock.rollups.
+    __tablename__ = "agg_order_rollup"
+
+    grain = db.Column(db.String(5), primary_key=True)
+    bucket = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("dim_product.id"), primary_key=True)
+    partner_id = db.Column(db.Integer, db.ForeignKey("dim_partner.id"), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("dim_warehouse.id"), primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_agg_order_rollup_product", grain, product_id, bucket),
+        db.Index("ix_agg_order_rollup_partner", grain, partner_id, bucket),
+        db.Index("ix_agg_order_rollup_warehouse", grain, warehouse_id, bucket),
+    )
+
+
+class RollupWatermark(db.Model):  # type: ignore
+    __tablename__ = "agg_rollup_watermark"
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_order_id = db.Column(db.Integer, nullable=False)
+
+
+class TableVersion(db.Model):  # type: ignore
+    # Bumped by every transaction that writes to the table, see sandstock.conditional.
+    __tablename__ = "meta_table_version"
+
+    name = db.Column(db.String(128), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from flask import jsonify
+from sqlalchemy import and_, or_
+
+from sandstock.extensions import db
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page(NamedTuple):
+    items: list[Any]
+    next_cursor: str | None
+
+
+def _dump(value):
+    return {"dt": value.isoformat()} if isinstance(value, datetime) else value
+
+
+def _load(value):
+    return datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+
+
+def encode_cursor(values):
+    payload = json.dumps([_dump(value) for value in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return [_load(value) for value in values]
+    except (ValueError, TypeError, KeyError) as error:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from error
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    return max(1, min(value or default, MAX_PAGE_SIZE))
+
+
+def _after(keys, values, descending):
+    # (k1, k2, ..., id) > (v1, v2, ..., last_id), spelled out for backends without row values.
+    clauses = []
+    for position, (key, value) in enumerate(zip(keys, values)):
+        equal = [previous == previous_value for previous, previous_value in zip(keys[:position], values)]
+        clauses.append(and_(*equal, key < value if descending else key > value))
+    return or_(*clauses)
+
+
+def paginate(statement, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    # The last key has to be unique (the id) so that the cursor is a strict position.
+    # Items are the selected entity or column, or a tuple when several are selected.
+    width = len(statement.column_descriptions)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        statement = statement.where(_after(keys, values, descending))
+    ordering = [key.desc() if descending else key.asc() for key in keys]
+    statement = statement.add_columns(*keys).order_by(None).order_by(*ordering).limit(limit + 1)
+
+    rows = db.session.execute(statement).all()
+    next_cursor = encode_cursor(rows[limit - 1][width:]) if len(rows) > limit else None
+    return Page([row[0] if width == 1 else tuple(row[:width]) for row in rows[:limit]], next_cursor)
+
+
+def page_response(data, page):
+    response = jsonify(data)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return response
@@ -0,0 +1,73 @@
+import logging
+import time
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from sandstock.extensions import db
+from sandstock.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    # No pool event fires before a checkout starts waiting, the wait is timed here.
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if has_app_context():
+                get_metrics().observe("sandstock_db_pool_checkout_seconds", (), time.perf_counter() - start)
+
+
+def init_pool(app: Flask):
+    counters = {"connects": 0, "checkouts": 0, "invalidations": 0, "closes": 0}
+    app.extensions["sandstock_pool"] = counters
+    metrics = app.extensions["sandstock_metrics"]
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.driver == "pyodbc":
+        import pyodbc
+
+        pyodbc.pooling = app.config["ODBC_POOLING"]
+
+    # A new physical connection is what a request pays for after an idle period or
+    # when the pool is too small for the worker, so each one is logged with the
+    # state of the pool.
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        counters["connects"] += 1
+        metrics.inc("sandstock_db_connections_opened_total")
+        logger.info("Opened a database connection, %s", engine.pool.status())
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def invalidate(dbapi_connection, connection_record, exception):
+        counters["invalidations"] += 1
+        metrics.inc("sandstock_db_connections_invalidated_total")
+        logger.warning("Discarded a database connection: %s", exception)
+
+    @event.listens_for(engine, "close")
+    def close(dbapi_connection, connection_record):
+        counters["closes"] += 1
+
+
+def pool_stats():
+    pool = db.engine.pool
+    stats = {"pool": type(pool).__name__, **current_app.extensions["sandstock_pool"]}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    return stats
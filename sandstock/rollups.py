@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import Date, and_, case, delete, func, insert, or_, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from sandstock.models import Order, OrderRollup, RollupWatermark, db
+from sandstock.services import chunked
+
+GRAINS = ("day", "week")
+DIMENSIONS = {"product": "product_id", "partner": "partner_id", "warehouse": "warehouse_id"}
+KEY = ("grain", "bucket", "product_id", "partner_id", "warehouse_id", "currency")
+WATERMARK = "order_rollup"
+REFRESH_BATCH_SIZE = 50000
+# Orders committed up to this many ids behind the watermark are still folded in.
+SAFETY_WINDOW = 1000
+
+
+class RollupError(ValueError):
+    pass
+
+
+class order_day(FunctionElement):
+    type = Date()
+    name = "order_day"
+    inherit_cache = True
+
+
+@compiles(order_day)
+def _compile_order_day(element, compiler, **kw):
+    return f"CAST({compiler.process(element.clauses, **kw)} AS DATE)"
+
+
+@compiles(order_day, "sqlite")
+def _compile_order_day_sqlite(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+
+def _day_totals(days):
+    day = order_day(Order.created_at)
+    dimensions = (Order.product_id, Order.partner_id, Order.warehouse_id, Order.currency)
+    ranges = [
+        and_(
+            Order.created_at >= datetime.combine(bucket, time.min),
+            Order.created_at < datetime.combine(bucket + timedelta(days=1), time.min),
+        )
+        for bucket in days
+    ]
+    return db.session.execute(
+        select(
+            day.label("bucket"),
+            *dimensions,
+            func.count().label("orders"),
+            func.sum(Order.quantity).label("quantity"),
+            func.sum(Order.quantity * Order.unit_price).label("revenue"),
+        )
+        .where(or_(*ranges))
+        .group_by(day, *dimensions)
+    )
+
+
+def _recompute(days):
+    # Day rows are recomputed from the orders of their day, week rows from the day rows
+    # of their week, and both replace the rows they had.
+    table = OrderRollup.__table__
+    for chunk in chunked(days):
+        db.session.execute(delete(table).where(table.c.grain == "day", table.c.bucket.in_(chunk)))
+        rows = [{"grain": "day", **row._mapping} for row in _day_totals(chunk)]
+        if rows:
+            db.session.execute(insert(table), rows)
+
+    weeks = sorted({bucket - timedelta(days=bucket.weekday()) for bucket in days})
+    for chunk in chunked(weeks):
+        db.session.execute(delete(table).where(table.c.grain == "week", table.c.bucket.in_(chunk)))
+        totals: dict = defaultdict(lambda: [0, 0, 0.0])
+        for row in db.session.execute(
+            select(table).where(
+                table.c.grain == "day", or_(*(table.c.bucket.between(week, week + timedelta(days=6)) for week in chunk))
+            )
+        ):
+            week = row.bucket - timedelta(days=row.bucket.weekday())
+            total = totals[week, row.product_id, row.partner_id, row.warehouse_id, row.currency]
+            total[0] += row.orders
+            total[1] += row.quantity
+            total[2] += row.revenue
+        rows = [
+            {**dict(zip(KEY, ("week", *key))), "orders": orders, "quantity": quantity, "revenue": revenue}
+            for key, (orders, quantity, revenue) in totals.items()
+        ]
+        if rows:
+            db.session.execute(insert(table), rows)
+
+
+def refresh_rollups(batch_size=REFRESH_BATCH_SIZE, full=False):
+    # The orders past the watermark are folded in batch_size at a time. Ids are not
+    # committed in order, so the first batch goes back SAFETY_WINDOW ids behind the
+    # watermark to catch the orders committed late: the days the orders fall on are
+    # recomputed rather than added to, and an order seen twice is counted once. Each
+    # batch is committed with the watermark it reached, so an interrupted refresh
+    # resumes where it stopped, and the watermark row lock keeps two refreshes from
+    # running together. A full refresh starts over in a single transaction.
+    if full:
+        db.session.execute(delete(OrderRollup))
+        db.session.execute(delete(RollupWatermark).where(RollupWatermark.name == WATERMARK))
+    processed = 0
+    lower = None
+    while True:
+        watermark = db.session.scalars(
+            select(RollupWatermark).where(RollupWatermark.name == WATERMARK).with_for_update()
+        ).one_or_none()
+        if watermark is None:
+            watermark = RollupWatermark(name=WATERMARK, last_order_id=0)
+            db.session.add(watermark)
+        start = watermark.last_order_id
+        if lower is None:
+            lower = max(start - SAFETY_WINDOW, 0)
+        stop = (
+            db.session.scalar(
+                select(Order.id).where(Order.id > start).order_by(Order.id).offset(batch_size - 1).limit(1)
+            )
+            or db.session.scalar(select(func.max(Order.id)).where(Order.id > start))
+            or start
+        )
+        if stop == lower:
+            break
+
+        # The days of the orders in the batch, with the number of orders past the watermark.
+        day = order_day(Order.created_at)
+        rows = db.session.execute(
+            select(day, func.count(case((Order.id > start, 1)))).where(Order.id > lower, Order.id <= stop).group_by(day)
+        ).all()
+        _recompute(sorted(bucket for bucket, _ in rows))
+        processed += sum(count for _, count in rows)
+        watermark.last_order_id = lower = stop
+        if not full:
+            db.session.commit()
+    db.session.commit()
+    return processed
+
+
+def order_rollups(grain="day", by=None, entity_id=None, date_from=None, date_to=None):
+    # Buckets are selected by their first day. Without `by`, totals are summed over
+    # every product, partner and warehouse; per currency, always.
+    if grain not in GRAINS:
+        raise RollupError(f"Unsupported grain: {grain}. Expected one of {', '.join(GRAINS)}.")
+    if by is not None and by not in DIMENSIONS:
+        raise RollupError(f"Unsupported dimension: {by}. Expected one of {', '.join(DIMENSIONS)}.")
+    if entity_id is not None and by is None:
+        raise RollupError("An id needs a dimension to filter on.")
+
+    columns = [OrderRollup.bucket]
+    filters = [OrderRollup.grain == grain]
+    if by is not None:
+        dimension = getattr(OrderRollup, DIMENSIONS[by])
+        columns.append(dimension)
+        if entity_id is not None:
+            filters.append(dimension == entity_id)
+    columns.append(OrderRollup.currency)
+    if date_from is not None:
+        filters.append(OrderRollup.bucket >= date_from)
+    if date_to is not None:
+        filters.append(OrderRollup.bucket <= date_to)
+    return db.session.execute(
+        select(
+            *columns,
+            func.sum(OrderRollup.orders).label("orders"),
+            func.sum(OrderRollup.quantity).label("quantity"),
+            func.sum(OrderRollup.revenue).label("revenue"),
+        )
+        .where(*filters)
+        .group_by(*columns)
+        .order_by(*columns)
+    ).all()
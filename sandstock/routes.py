@@ -1,10 +1,16 @@
-import re
+from datetime import date
 from urllib.parse import urlencode
 
-from flask import Flask, flash, jsonify, redirect, render_template, request, url_for
-from sqlalchemy import String, cast
+from flask import Flask, Response, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, load_only
 
 from sandstock import Config
+from sandstock.analytics import load_product_report
+from sandstock.cache import get_cache
+from sandstock.conditional import form_not_modified, not_modified
+from sandstock.exports import FORMATS as EXPORT_FORMATS
+from sandstock.exports import ExportFormatError, export_orders
 from sandstock.forms import (
     CreateOrderForm,
     CreatePartnerForm,
@@ -15,7 +21,52 @@ from sandstock.forms import (
     UpdateProductForm,
     UpdateWarehouseForm,
 )
-from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse, db
+from sandstock.imports import ImportFormatError, file_format, import_file
+from sandstock.metrics import get_metrics
+from sandstock.models import Order, Partner, Product, Warehouse, db
+from sandstock.pagination import InvalidCursor, Page, page_response, page_size, paginate
+from sandstock.pool import pool_stats
+from sandstock.rollups import RollupError, order_rollups
+from sandstock.search import get_backend, search_orders
+from sandstock.serializers import SUMMARIES, serialize_page
+from sandstock.services import (
+    StockUpdateError,
+    create_order,
+    create_partner,
+    create_warehouse,
+    product_stock_by_warehouse,
+    warehouse_stock,
+)
+
+CHOICE_MODELS = {"product": Product, "partner": Partner, "warehouse": Warehouse}
+
+
+def active_page(model, cursor):
+    def load():
+        statement = select(model).where(model.deleted == False)  # noqa: E712
+        return serialize_page(SUMMARIES[model], statement, [model.id], cursor=cursor)
+
+    return get_cache().fetch(model, ("home", cursor), load)
+
+
+def active_statement(model, query):
+    if query:
+        return get_backend().statement(model, query)
+    return select(model).where(model.deleted == False), [model.id]  # noqa: E712
+
+
+def contact_fields(form):
+    return {"email": form.email.data, "phone_number": form.phone_number.data}
+
+
+def address_fields(form):
+    return {
+        "street_address": form.street_address.data,
+        "city": form.city.data,
+        "state": form.state.data,
+        "postal_code": form.postal_code.data,
+        "country": form.country.data,
+    }
 
 
 def register_routes(app: Flask):
@@ -28,13 +79,43 @@ def register_routes(app: Flask):
         }
         return redirect(f"{Config.LOGOUT_URL}?{urlencode(params)}")
 
+    @app.errorhandler(InvalidCursor)
+    @app.errorhandler(ImportFormatError)
+    @app.errorhandler(ExportFormatError)
+    @app.errorhandler(RollupError)
+    def bad_request(error):
+        return jsonify({"error": str(error)}), 400
+
     @app.route("/")
     def home():
-        orders = db.session.query(Order).limit(10).all()
-        partners = db.session.query(Partner).filter_by(deleted=False).limit(10).all()
-        warehouses = db.session.query(Warehouse).filter_by(deleted=False).limit(10).all()
-        products = db.session.query(Product).filter_by(deleted=False).limit(10).all()
-        return render_template("home.html", partners=partners, warehouses=warehouses, products=products, orders=orders)
+        response = not_modified(Order, Partner, Warehouse, Product)
+        if response is not None:
+            return response
+        pages = {
+            "orders": serialize_page(
+                SUMMARIES[Order],
+                select(Order),
+                [Order.created_at, Order.id],
+                cursor=request.args.get("orders_cursor"),
+                descending=True,
+            ),
+            "partners": active_page(Partner, request.args.get("partners_cursor")),
+            "warehouses": active_page(Warehouse, request.args.get("warehouses_cursor")),
+            "products": active_page(Product, request.args.get("products_cursor")),
+        }
+        next_urls = {
+            name: url_for("home", **{**request.args.to_dict(), f"{name}_cursor": page.next_cursor})
+            for name, page in pages.items()
+            if page.next_cursor
+        }
+        return render_template(
+            "home.html",
+            partners=pages["partners"].items,
+            warehouses=pages["warehouses"].items,
+            products=pages["products"].items,
+            orders=pages["orders"].items,
+            next_urls=next_urls,
+        )
 
     # Partner
 
@@ -43,30 +124,13 @@ def register_routes(app: Flask):
         user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
         form = CreatePartnerForm()
         if form.validate_on_submit():
-            contact = Contact(email=form.email.data, phone_number=form.phone_number.data, modified_by=user_email)
-            db.session.add(contact)
-
-            address = Address(
-                street_address=form.street_address.data,
-                city=form.city.data,
-                state=form.state.data,
-                postal_code=form.postal_code.data,
-                country=form.country.data,
-                modified_by=user_email,
-            )
-            db.session.add(address)
-            db.session.commit()
-
-            partner = Partner(
+            create_partner(
                 name=form.name.data,
                 contact_person=form.contact_person.data,
-                address_id=address.id,
-                contact_id=contact.id,
+                contact=contact_fields(form),
+                address=address_fields(form),
                 modified_by=user_email,
             )
-            db.session.add(partner)
-            db.session.commit()
-
             flash("Partner added successfully!", "success")
             return redirect(url_for("add_partner"))
 
@@ -76,13 +140,15 @@ def register_routes(app: Flask):
     def edit_partner(partner_id):
         user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
 
-        partner = db.session.get(Partner, partner_id)
+        partner = db.session.get(
+            Partner, partner_id, options=[joinedload(Partner.contact), joinedload(Partner.address)]
+        )
         if not partner:
             flash("Partner not found!", "error")
             return redirect(url_for("home"))
 
-        contact = db.session.get(Contact, partner.contact_id)
-        address = db.session.get(Address, partner.address_id)
+        contact = partner.contact
+        address = partner.address
 
         form = UpdatePartnerForm(
             name=partner.name,
@@ -99,6 +165,10 @@ def register_routes(app: Flask):
             modified_by=partner.modified_by,
         )
 
+        response = form_not_modified(form)
+        if response is not None:
+            return response
+
         if form.validate_on_submit():
             partner.name = form.name.data
             partner.contact_person = form.contact_person.data
@@ -139,27 +209,15 @@ def register_routes(app: Flask):
     @app.route("/partner/get", methods=["GET"])
     def get_partners():
         query = request.args.get("query", "")
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
 
-        results = (
-            db.session.query(Partner)
-            .filter(Partner.name.ilike(f"%{query}%"), Partner.deleted == False)  # type: ignore # noqa: E712
-            .limit(10)
-            .all()
-        )
-        partners = [
-            {
-                "id": partner.id,
-                "name": partner.name,
-                "contact_person": partner.contact_person,
-                "address_id": partner.address_id,
-                "contact_id": partner.contact_id,
-                "created_at": partner.created_at,
-                "updated_at": partner.updated_at,
-                "deleted": partner.deleted,
-            }
-            for partner in results
-        ]
-        return jsonify(partners)
+        def load():
+            statement, keys = active_statement(Partner, query)
+            return serialize_page(SUMMARIES[Partner], statement, keys, cursor=cursor, limit=limit)
+
+        page = get_cache().fetch(Partner, ("get", query, cursor, limit), load)
+        return page_response(page.items, page)
 
     # Warehouse
 
@@ -168,27 +226,12 @@ def register_routes(app: Flask):
         user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
         form = CreateWarehouseForm()
         if form.validate_on_submit():
-            contact = Contact(email=form.email.data, phone_number=form.phone_number.data, modified_by=user_email)
-            db.session.add(contact)
-            db.session.commit()
-
-            address = Address(
-                street_address=form.street_address.data,
-                city=form.city.data,
-                state=form.state.data,
-                postal_code=form.postal_code.data,
-                country=form.country.data,
+            create_warehouse(
+                name=form.name.data,
+                contact=contact_fields(form),
+                address=address_fields(form),
                 modified_by=user_email,
             )
-            db.session.add(address)
-            db.session.commit()
-
-            warehouse = Warehouse(
-                name=form.name.data, address_id=address.id, contact_id=contact.id, modified_by=user_email
-            )
-            db.session.add(warehouse)
-            db.session.commit()
-
             flash("Warehouse added successfully!", "success")
             return redirect(url_for("add_warehouse"))
 
@@ -198,13 +241,15 @@ def register_routes(app: Flask):
     def edit_warehouse(warehouse_id):
         user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
 
-        warehouse = db.session.get(Warehouse, warehouse_id)
+        warehouse = db.session.get(
+            Warehouse, warehouse_id, options=[joinedload(Warehouse.contact), joinedload(Warehouse.address)]
+        )
         if not warehouse:
             flash("Warehouse not found!", "error")
             return redirect(url_for("home"))
 
-        contact = db.session.get(Contact, warehouse.contact_id)
-        address = db.session.get(Address, warehouse.address_id)
+        contact = warehouse.contact
+        address = warehouse.address
 
         form = UpdateWarehouseForm(
             name=warehouse.name,
@@ -220,6 +265,10 @@ def register_routes(app: Flask):
             modified_by=warehouse.modified_by,
         )
 
+        response = form_not_modified(form)
+        if response is not None:
+            return response
+
         if form.validate_on_submit():
             warehouse.name = form.name.data
             warehouse.modified_by = user_email
@@ -259,25 +308,15 @@ def register_routes(app: Flask):
     @app.route("/warehouse/get", methods=["GET"])
     def get_warehouses():
         query = request.args.get("query", "")
-        results = (
-            db.session.query(Warehouse)
-            .filter(Warehouse.name.ilike(f"%{query}%"), Warehouse.deleted == False)  # type: ignore # noqa: E712
-            .limit(10)
-            .all()
-        )
-        warehouses = [
-            {
-                "id": warehouse.id,
-                "name": warehouse.name,
-                "address_id": warehouse.address_id,
-                "contact_id": warehouse.contact_id,
-                "created_at": warehouse.created_at,
-                "updated_at": warehouse.updated_at,
-                "deleted": warehouse.deleted,
-            }
-            for warehouse in results
-        ]
-        return jsonify(warehouses)
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+
+        def load():
+            statement, keys = active_statement(Warehouse, query)
+            return serialize_page(SUMMARIES[Warehouse], statement, keys, cursor=cursor, limit=limit)
+
+        page = get_cache().fetch(Warehouse, ("get", query, cursor, limit), load)
+        return page_response(page.items, page)
 
     # Product
 
@@ -318,6 +357,10 @@ def register_routes(app: Flask):
             modified_by=product.modified_by,
         )
 
+        response = form_not_modified(form)
+        if response is not None:
+            return response
+
         if form.validate_on_submit():
             product.name = form.name.data
             product.category_label = form.category_label.data
@@ -346,27 +389,33 @@ def register_routes(app: Flask):
     @app.route("/product/get", methods=["GET"])
     def get_products():
         query = request.args.get("query", "")
-
-        results = (
-            db.session.query(Product)
-            .filter(Product.name.ilike(f"%{query}%"), Product.deleted == False)  # type: ignore # noqa: E712
-            .limit(10)
-            .all()
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+
+        def load():
+            statement, keys = active_statement(Product, query)
+            return serialize_page(SUMMARIES[Product], statement, keys, cursor=cursor, limit=limit)
+
+        page = get_cache().fetch(Product, ("get", query, cursor, limit), load)
+        return page_response(page.items, page)
+
+    @app.route("/product/<int:product_id>/stock", methods=["GET"])
+    def get_product_stock(product_id):
+        warehouse_id = request.args.get("warehouse_id", type=int)
+        if warehouse_id is not None:
+            return jsonify(
+                {
+                    "product_id": product_id,
+                    "warehouse_id": warehouse_id,
+                    "quantity": warehouse_stock(product_id, warehouse_id),
+                }
+            )
+        return jsonify(
+            [
+                {"warehouse_id": stock.warehouse_id, "quantity": stock.quantity, "last_order_id": stock.last_order_id}
+                for stock in product_stock_by_warehouse(product_id)
+            ]
         )
-        products = [
-            {
-                "id": product.id,
-                "name": product.name,
-                "category_label": product.category_label,
-                "description": product.description,
-                "quantity_available": product.quantity_available,
-                "created_at": product.created_at,
-                "updated_at": product.updated_at,
-                "deleted": product.deleted,
-            }
-            for product in results
-        ]
-        return jsonify(products)
 
     # Order
 
@@ -374,75 +423,101 @@ def register_routes(app: Flask):
     def add_order():
         user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
         form = CreateOrderForm()
-        form.product_name.choices = [
-            f"{product.name} ({product.id})"
-            for product in db.session.query(Product).filter_by(deleted=False).limit(10).all()
-        ]
-        form.partner_name.choices = [
-            f"{partner.name} ({partner.id})"
-            for partner in db.session.query(Partner).filter_by(deleted=False).limit(10).all()
-        ]
-        form.warehouse_name.choices = [
-            f"{warehouse.name} ({warehouse.id})"
-            for warehouse in db.session.query(Warehouse).filter_by(deleted=False).limit(10).all()
-        ]
-
         if form.validate_on_submit():
-            regex = r"(.+?) \((\d+)\)$"
-            product_id = re.match(regex, form.product_name.data).group(2)
-            partner_id = re.match(regex, form.partner_name.data).group(2)
-            warehouse_id = re.match(regex, form.warehouse_name.data).group(2)
-
-            order = Order(
-                category=form.category.data,
-                product_id=product_id,
-                partner_id=partner_id,
-                warehouse_id=warehouse_id,
-                quantity=form.quantity.data,
-                unit_price=form.unit_price.data,
-                currency=form.currency.data,
-                modified_by=user_email,
-            )
-            product = db.session.get(Product, order.product_id)
-            product.quantity_available += order.quantity
-            db.session.add(order)
-            db.session.commit()
+            try:
+                create_order(
+                    category=form.category.data,
+                    product_id=form.product_id.data,
+                    partner_id=form.partner_id.data,
+                    warehouse_id=form.warehouse_id.data,
+                    quantity=form.quantity.data,
+                    unit_price=form.unit_price.data,
+                    currency=form.currency.data,
+                    modified_by=user_email,
+                )
+            except StockUpdateError as error:
+                flash(str(error), "error")
+                return render_template("add_order.html", form=form)
             flash("Order added successfully!", "success")
             return redirect(url_for("add_order"))
 
         return render_template("add_order.html", form=form)
 
+    @app.route("/<any(product, partner, warehouse, order):entity>/import", methods=["POST"])
+    def import_entities(entity):
+        user_email = request.headers.get("X-MS-CLIENT-PRINCIPAL-NAME", "unknown")
+        upload = request.files.get("file")
+        if upload is None:
+            return jsonify({"error": "Missing file."}), 400
+        report = import_file(entity, upload.stream, file_format(upload.filename), user_email)
+        return jsonify(report.to_dict())
+
+    @app.route("/<any(product, partner, warehouse):entity>/choices", methods=["GET"])
+    def get_choices(entity):
+        model = CHOICE_MODELS[entity]
+        query = request.args.get("query", "")
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+
+        def load():
+            statement, keys = active_statement(model, query)
+            page = paginate(statement.options(load_only(model.id, model.name)), keys, cursor=cursor, limit=limit)
+            return Page([(item.id, f"{item.name} ({item.id})") for item in page.items], page.next_cursor)
+
+        page = get_cache().fetch(model, ("choices", query, cursor, limit), load)
+        return page_response(page.items, page)
+
     @app.route("/order/get", methods=["GET"])
     def get_orders():
-        query = request.args.get("query", "")
-        results = db.session.query(Order).filter(cast(Order.id, String).ilike(f"%{query}%")).limit(10).all()
-        orders = [
-            {
-                "id": order.id,
-                "category": order.category,
-                "product_id": order.product_id,
-                "partner_id": order.partner_id,
-                "warehouse_id": order.warehouse_id,
-                "quantity": order.quantity,
-                "unit_price": order.unit_price,
-                "currency": order.currency,
-                "created_at": order.created_at,
-            }
-            for order in results
-        ]
-        return jsonify(orders)
+        statement, keys = search_orders(
+            request.args.get("query", "").strip(),
+            partner_id=request.args.get("partner_id", type=int),
+            product_id=request.args.get("product_id", type=int),
+            warehouse_id=request.args.get("warehouse_id", type=int),
+            date_from=request.args.get("date_from", type=date.fromisoformat),
+            date_to=request.args.get("date_to", type=date.fromisoformat),
+        )
+        page = serialize_page(
+            SUMMARIES[Order],
+            statement,
+            keys,
+            cursor=request.args.get("cursor"),
+            limit=page_size(request.args.get("limit", type=int)),
+        )
+        return page_response(page.items, page)
+
+    @app.route("/order/export", methods=["GET"])
+    def export_order_dump():
+        format = request.args.get("format", "csv")
+        chunks = export_orders(
+            format,
+            partner_id=request.args.get("partner_id", type=int),
+            product_id=request.args.get("product_id", type=int),
+            warehouse_id=request.args.get("warehouse_id", type=int),
+            date_from=request.args.get("date_from", type=date.fromisoformat),
+            date_to=request.args.get("date_to", type=date.fromisoformat),
+        )
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f"attachment; filename=orders.{format}"},
+        )
 
     @app.route("/order/<int:order_id>/edit", methods=["GET"])
     def edit_order(order_id):
 
-        order = db.session.get(Order, order_id)
+        order = db.session.get(
+            Order,
+            order_id,
+            options=[joinedload(Order.product), joinedload(Order.partner), joinedload(Order.warehouse)],
+        )
         if not order:
             flash("Order not found!", "error")
             return redirect(url_for("home"))
 
-        product = db.session.get(Product, order.product_id)
-        partner = db.session.get(Partner, order.partner_id)
-        warehouse = db.session.get(Warehouse, order.warehouse_id)
+        product = order.product
+        partner = order.partner
+        warehouse = order.warehouse
 
         form = UpdateOrderForm(
             id=order.id,
@@ -456,4 +531,41 @@ def register_routes(app: Flask):
             created_at=order.created_at,
             modified_by=order.modified_by,
         )
+        response = form_not_modified(form)
+        if response is not None:
+            return response
+
         return render_template("edit_order.html", form=form, order=order)
+
+    # Analytics
+
+    @app.route("/analytics/orders", methods=["GET"])
+    def get_order_rollups():
+        rows = order_rollups(
+            grain=request.args.get("grain", "day"),
+            by=request.args.get("by"),
+            entity_id=request.args.get("id", type=int),
+            date_from=request.args.get("date_from", type=date.fromisoformat),
+            date_to=request.args.get("date_to", type=date.fromisoformat),
+        )
+        return jsonify([{**row._asdict(), "bucket": row.bucket.isoformat()} for row in rows])
+
+    @app.route("/analytics/products", methods=["GET"])
+    def get_product_report():
+        response = not_modified(Order)
+        if response is not None:
+            return response
+        date_from = request.args.get("date_from", type=date.fromisoformat)
+        date_to = request.args.get("date_to", type=date.fromisoformat)
+        currency = request.args.get("currency", "USD")
+        return jsonify(load_product_report(currency, date_from, date_to, top=request.args.get("top", type=int)))
+
+    # Monitoring
+
+    @app.route("/metrics", methods=["GET"])
+    def get_prometheus_metrics():
+        return Response(get_metrics().render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.route("/pool/stats", methods=["GET"])
+    def get_pool_stats():
+        return jsonify(pool_stats())
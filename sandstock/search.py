@@ -0,0 +1,310 @@
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import (
+    Integer,
+    case,
+    delete,
+    event,
+    exists,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    union,
+    union_all,
+)
+from sqlalchemy.orm import aliased
+
+from sandstock.models import Order, Partner, Product, SearchGram, Warehouse, db
+from sandstock.pagination import DEFAULT_PAGE_SIZE, paginate
+
+GRAM_SIZE = 3
+MAX_QUERY_GRAMS = 8
+# Grams are counted up to this many postings, enough to tell the rarest one apart.
+FREQUENCY_CAP = 1000
+# Candidates taken per search from the name index, and postings from the rarest gram.
+CANDIDATE_WINDOW = 500
+SEARCHABLE = (Partner, Warehouse, Product)
+MAX_ID = 2**31 - 1
+
+
+def ngrams(value):
+    value = " ".join(value.lower().split())
+    return {value[start:stop] for start, stop in zip(range(len(value)), range(GRAM_SIZE, len(value) + 1))}
+
+
+def _query_grams(query):
+    # A match has to contain every gram of the query, so a handful spread over it
+    # are enough to narrow candidates; the ILIKE recheck does the rest.
+    grams = sorted(ngrams(query))
+    if len(grams) <= MAX_QUERY_GRAMS:
+        return grams
+    step = len(grams) / MAX_QUERY_GRAMS
+    return [grams[int(i * step)] for i in range(MAX_QUERY_GRAMS)]
+
+
+def _capped_frequency(entity, gram):
+    postings = (
+        select(SearchGram.entity_id)
+        .where(SearchGram.entity == entity, SearchGram.gram == gram)
+        .limit(FREQUENCY_CAP)
+        .subquery()
+    )
+    return select(func.count()).select_from(postings).scalar_subquery()
+
+
+def _gram_rows(entity, entries):
+    return [
+        {"entity": entity, "gram": gram, "entity_id": entity_id} for entity_id, name in entries for gram in ngrams(name)
+    ]
+
+
+def _prefixed(model, query):
+    # SQL Server seeks a LIKE prefix in the (deleted, name) index under its case-insensitive
+    # collation. SQLite only seeks ranges, case-sensitive under its binary collation: one
+    # per usual casing of the query, the other casings come from the grams.
+    if db.session.get_bind().dialect.name == "sqlite":
+        casings = sorted({query, query.lower(), query.upper(), query.capitalize()})
+        prefixes = [(model.name >= casing) & (model.name < casing + chr(0x10FFFF)) for casing in casings]
+    else:
+        prefixes = [model.name.startswith(query, autoescape=True)]
+    return [
+        select(model.id)
+        .where(model.deleted == False, prefix)  # noqa: E712
+        .order_by(model.name)
+        .limit(CANDIDATE_WINDOW)
+        .subquery()
+        for prefix in prefixes
+    ]
+
+
+def _rank(model, query):
+    name = func.lower(model.name)
+    query = query.lower()
+    return case((name == query, 0), (name.startswith(query, autoescape=True), 1), else_=2)
+
+
+class SearchBackend:
+
+    def index(self, connection, documents):
+        for document in documents:
+            if not document.deleted:
+                self.add(connection, document.__tablename__, [(document.id, document.name)])
+
+    def add(self, connection, entity, entries):
+        pass
+
+    def remove(self, connection, documents):
+        pass
+
+    def reindex(self, model, batch_size=1000):
+        pass
+
+    def statement(self, model, query):
+        raise NotImplementedError
+
+
+class NgramSearchBackend(SearchBackend):
+
+    def index(self, connection, documents):
+        rows = []
+        for document in documents:
+            if not document.deleted:
+                rows.extend(_gram_rows(document.__tablename__, [(document.id, document.name)]))
+        if rows:
+            connection.execute(insert(SearchGram), rows)
+
+    def add(self, connection, entity, entries):
+        rows = _gram_rows(entity, entries)
+        if rows:
+            connection.execute(insert(SearchGram), rows)
+
+    def remove(self, connection, documents):
+        for document in documents:
+            connection.execute(
+                delete(SearchGram).where(
+                    SearchGram.entity == document.__tablename__, SearchGram.entity_id == document.id
+                )
+            )
+
+    def reindex(self, model, batch_size=1000):
+        db.session.execute(delete(SearchGram).where(SearchGram.entity == model.__tablename__))
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                select(model.id, model.name)
+                .where(model.id > last_id, model.deleted == False)  # noqa: E712
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            self.add(db.session.connection(), model.__tablename__, batch)
+            last_id = batch[-1].id
+        db.session.commit()
+
+    def statement(self, model, query):
+        grams = _query_grams(query)
+        if not grams:
+            statement = select(model).where(
+                model.name.startswith(query, autoescape=True), model.deleted == False  # noqa: E712
+            )
+            return statement, [model.name, model.id]
+
+        entity = model.__tablename__
+        frequencies = db.session.execute(select(*(_capped_frequency(entity, gram) for gram in grams))).one()
+        _, driving_gram = min(zip(frequencies, grams))
+
+        # Exact and prefix matches come from the (deleted, name) index, the others from
+        # the first postings of the rarest gram, whose other grams are probed by primary
+        # key. Each source gives at most CANDIDATE_WINDOW ids: a common query ranks and
+        # rechecks the same number of rows on any table size.
+        postings = (
+            select(SearchGram.entity_id)
+            .where(SearchGram.entity == entity, SearchGram.gram == driving_gram)
+            .order_by(SearchGram.entity_id)
+            .limit(CANDIDATE_WINDOW)
+            .subquery()
+        )
+        filters = []
+        for gram in grams:
+            if gram != driving_gram:
+                other = aliased(SearchGram)
+                filters.append(
+                    exists().where(other.entity == entity, other.gram == gram, other.entity_id == postings.c.entity_id)
+                )
+        containing = select(postings.c.entity_id).where(*filters)
+        candidates = union(*(select(prefixed.c.id) for prefixed in _prefixed(model, query)), containing).subquery()
+        statement = (
+            select(model)
+            .join(candidates, candidates.c.id == model.id)
+            .where(model.name.ilike(f"%{query}%"), model.deleted == False)  # type: ignore # noqa: E712
+        )
+        return statement, [_rank(model, query), func.length(model.name), model.id]
+
+
+class FullTextSearchBackend(SearchBackend):
+    # SQL Server keeps full-text indexes up to date itself (CHANGE_TRACKING AUTO),
+    # see `flask search setup-fulltext`.
+
+    def statement(self, model, query):
+        term = '"' + query.replace('"', '""') + '*"'
+        matches = (
+            text(f"SELECT [KEY] AS entity_id, [RANK] AS score FROM CONTAINSTABLE({model.__tablename__}, name, :term)")
+            .bindparams(term=term)
+            .columns(entity_id=Integer, score=Integer)
+            .subquery()
+        )
+        statement = (
+            select(model).join(matches, matches.c.entity_id == model.id).where(model.deleted == False)  # noqa: E712
+        )
+        return statement, [_rank(model, query), -matches.c.score, model.id]
+
+
+BACKENDS = {"ngram": NgramSearchBackend, "fulltext": FullTextSearchBackend}
+
+
+def get_backend():
+    return BACKENDS[current_app.config["SEARCH_BACKEND"]]()
+
+
+def search(model, query, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    statement, keys = get_backend().statement(model, query)
+    return paginate(statement, keys, cursor=cursor, limit=limit)
+
+
+def id_prefix_ranges(prefix, max_id=MAX_ID):
+    # Ids starting with "12" are 12, 120-129, 1200-1299, ...: one primary key range
+    # per extra digit instead of a LIKE over the id cast to a string.
+    if not prefix.isdigit() or prefix.startswith("0"):
+        return []
+    ranges = []
+    start, stop = int(prefix), int(prefix) + 1
+    while start <= max_id:
+        ranges.append((start, min(stop, max_id + 1)))
+        start, stop = start * 10, stop * 10
+    return ranges
+
+
+def order_id_ranges(query):
+    low, separator, high = query.partition("-")
+    if not separator:
+        return id_prefix_ranges(query.strip())
+    if low.strip().isdigit() and high.strip().isdigit():
+        return [(int(low), int(high) + 1)]
+    return []
+
+
+def order_filters(partner_id=None, product_id=None, warehouse_id=None, date_from=None, date_to=None):
+    filters = []
+    if partner_id is not None:
+        filters.append(Order.partner_id == partner_id)
+    if product_id is not None:
+        filters.append(Order.product_id == product_id)
+    if warehouse_id is not None:
+        filters.append(Order.warehouse_id == warehouse_id)
+    if date_from is not None:
+        filters.append(Order.created_at >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        filters.append(Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return filters
+
+
+def search_orders(query="", **criteria):
+    filters = order_filters(**criteria)
+    if not query:
+        return select(Order).where(*filters), [Order.id]
+    ranges = order_id_ranges(query)
+    if not ranges:
+        # No id starts with the query: a key lookup that finds nothing (ids start at 1),
+        # plans show a constant false filter as a scan.
+        return select(Order).where(Order.id == 0), [Order.id]
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        return select(Order).where(Order.id >= start, Order.id < stop, *filters), [Order.id]
+
+    # One primary key seek per range, merged in id order, rather than an OR that
+    # planners tend to turn back into an ordered scan.
+    matches = union_all(*(select(Order).where(Order.id >= start, Order.id < stop, *filters) for start, stop in ranges))
+    order = aliased(Order, matches.subquery())
+    return select(order), [order.id]
+
+
+@event.listens_for(db.session, "after_flush")
+def _update_index(session, flush_context):
+    new = [document for document in session.new if isinstance(document, SEARCHABLE)]
+    changed = [
+        document for document in session.dirty if isinstance(document, SEARCHABLE) and _indexed_fields_changed(document)
+    ]
+    if new or changed:
+        backend = get_backend()
+        backend.remove(session.connection(), changed)
+        backend.index(session.connection(), new + changed)
+
+
+def _indexed_fields_changed(document):
+    state = inspect(document)
+    return state.attrs.name.history.has_changes() or state.attrs.deleted.history.has_changes()
+
+
+def setup_fulltext():
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql(
+            "IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'sandstock_catalog') "
+            "CREATE FULLTEXT CATALOG sandstock_catalog"
+        )
+        for model in SEARCHABLE:
+            table = model.__tablename__
+            connection.exec_driver_sql(
+                f"IF NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('{table}')) "
+                f"CREATE FULLTEXT INDEX ON {table} (name) KEY INDEX {_primary_key_name(connection, table)} "
+                "ON sandstock_catalog WITH CHANGE_TRACKING AUTO"
+            )
+
+
+def _primary_key_name(connection, table):
+    return connection.exec_driver_sql(
+        "SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND is_primary_key = 1", (table,)
+    ).scalar_one()
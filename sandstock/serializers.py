@@ -0,0 +1,110 @@
+from datetime import date
+from decimal import Decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+from sqlalchemy import inspect
+from werkzeug.http import http_date
+
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
+from sandstock.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+
+
+class Schema:
+    # The fields a model is serialized with. Statements select those columns only and
+    # rows are built straight from the result tuples, no ORM object is loaded.
+    # Nested schemas are joined through the relationship of the same name.
+
+    def __init__(self, model, fields=None, nested=None):
+        self.model = model
+        self.fields = tuple(fields or (attribute.key for attribute in inspect(model).mapper.column_attrs))
+        self.nested = nested or {}
+
+    def columns(self, entity=None):
+        entity = entity or self.model
+        return [getattr(entity, field) for field in self.fields]
+
+    def select(self, statement):
+        # The same rows as an ORM statement over the model (or an alias of it), keeping
+        # its joins and filters.
+        entity = statement.column_descriptions[0]["entity"]
+        statement = statement.with_only_columns(*self.columns(entity))
+        for name, schema in self.nested.items():
+            statement = statement.join(getattr(entity, name)).add_columns(*schema.columns())
+        return statement
+
+    def dump(self, row):
+        item = dict(zip(self.fields, row))
+        start = len(self.fields)
+        for name, schema in self.nested.items():
+            stop = start + len(schema.fields)
+            item[name] = schema.dump(row[start:stop])
+            start = stop
+        return item
+
+    def dump_all(self, rows):
+        if self.nested:
+            return [self.dump(row) for row in rows]
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+
+def serialize_page(schema, statement, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    page = paginate(schema.select(statement), keys, cursor=cursor, limit=limit, descending=descending)
+    return Page(schema.dump_all(page.items), page.next_cursor)
+
+
+PRODUCT_SUMMARY = Schema(
+    Product,
+    ("id", "name", "category_label", "description", "quantity_available", "created_at", "updated_at", "deleted"),
+)
+PARTNER_SUMMARY = Schema(
+    Partner, ("id", "name", "contact_person", "address_id", "contact_id", "created_at", "updated_at", "deleted")
+)
+WAREHOUSE_SUMMARY = Schema(Warehouse, ("id", "name", "address_id", "contact_id", "created_at", "updated_at", "deleted"))
+ORDER_SUMMARY = Schema(
+    Order,
+    ("id", "category", "product_id", "partner_id", "warehouse_id", "quantity", "unit_price", "currency", "created_at"),
+)
+SUMMARIES = {
+    Product: PRODUCT_SUMMARY,
+    Partner: PARTNER_SUMMARY,
+    Warehouse: WAREHOUSE_SUMMARY,
+    Order: ORDER_SUMMARY,
+}
+
+RESOURCES = {
+    Product: Schema(Product),
+    Partner: Schema(Partner, nested={"contact": Schema(Contact), "address": Schema(Address)}),
+    Warehouse: Schema(Warehouse, nested={"contact": Schema(Contact), "address": Schema(Address)}),
+    Order: Schema(Order),
+}
+
+
+def _default(value):
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    # Dates and datetimes come out as RFC 822 HTTP dates, as with the default provider
+    # of Flask. Responses are written as the bytes orjson returns, without a round
+    # trip through str.
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_INDENT_2 if self._app.debug else self.option
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=option), mimetype="application/json")
@@ -0,0 +1,235 @@
+from itertools import islice
+
+from sqlalchemy import and_, bindparam, case, delete, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from sandstock.metrics import get_metrics
+from sandstock.models import Address, Contact, Order, Partner, Product, StockByWarehouse, Warehouse, db
+
+REBUILD_BATCH_SIZE = 100000
+# SQL Server takes at most 2100 parameters per statement, IN lists are cut well below.
+IDS_PER_STATEMENT = 500
+
+
+class StockUpdateError(Exception):
+    pass
+
+
+def apply_stock_movement(product_id, quantity):
+    # Let the database add the delta in place: concurrent orders on the same product
+    # serialize on the row lock for the duration of this statement only, and none of
+    # them can overwrite another one's balance.
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(quantity_available=Product.quantity_available + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise StockUpdateError(f"Product {product_id} does not exist.")
+
+
+def chunked(items, size=IDS_PER_STATEMENT):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def apply_stock_movements(deltas):
+    # One set-based statement per chunk of products, the movements summed per product.
+    # Each product binds three parameters: its id in the IN list, and a pair in the CASE.
+    for product_ids in chunked(sorted(deltas)):
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(product_ids))
+            .values(
+                quantity_available=Product.quantity_available
+                + case({product_id: deltas[product_id] for product_id in product_ids}, value=Product.id, else_=0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _latest(column, order_id):
+    return case((column > order_id, column), else_=order_id)
+
+
+def apply_warehouse_movement(product_id, warehouse_id, quantity, order_id):
+    # The first order of a product in a warehouse creates its row. When a concurrent
+    # order created it first, the insert fails inside its savepoint and the update
+    # is applied on top of the other order's.
+    statement = (
+        update(StockByWarehouse)
+        .where(StockByWarehouse.product_id == product_id, StockByWarehouse.warehouse_id == warehouse_id)
+        .values(
+            quantity=StockByWarehouse.quantity + quantity,
+            last_order_id=_latest(StockByWarehouse.last_order_id, order_id),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(statement).rowcount == 1:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                insert(StockByWarehouse).values(
+                    product_id=product_id, warehouse_id=warehouse_id, quantity=quantity, last_order_id=order_id
+                )
+            )
+    except IntegrityError:
+        get_metrics().inc("sandstock_stock_update_conflicts_total", (("kind", "warehouse_row"),))
+        db.session.execute(statement)
+
+
+def apply_warehouse_movements(movements, last_order_id):
+    # `movements` maps (product_id, warehouse_id) to a quantity: existing rows are
+    # updated with one executemany, the missing ones inserted with another.
+    if not movements:
+        return
+    existing = set()
+    for product_ids in chunked(sorted({product_id for product_id, _ in movements})):
+        rows = db.session.execute(
+            select(StockByWarehouse.product_id, StockByWarehouse.warehouse_id).where(
+                StockByWarehouse.product_id.in_(product_ids)
+            )
+        )
+        existing.update((row.product_id, row.warehouse_id) for row in rows)
+    table = StockByWarehouse.__table__
+    updates = [
+        {"b_product_id": product_id, "b_warehouse_id": warehouse_id, "b_quantity": quantity}
+        for (product_id, warehouse_id), quantity in movements.items()
+        if (product_id, warehouse_id) in existing
+    ]
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.product_id == bindparam("b_product_id"), table.c.warehouse_id == bindparam("b_warehouse_id"))
+            .values(
+                quantity=table.c.quantity + bindparam("b_quantity"),
+                last_order_id=_latest(table.c.last_order_id, last_order_id),
+            ),
+            updates,
+        )
+    inserts = [
+        {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": quantity, "last_order_id": last_order_id}
+        for (product_id, warehouse_id), quantity in movements.items()
+        if (product_id, warehouse_id) not in existing
+    ]
+    if inserts:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), inserts)
+        except IntegrityError:
+            get_metrics().inc("sandstock_stock_update_conflicts_total", (("kind", "warehouse_batch"),))
+            for row in inserts:
+                apply_warehouse_movement(row["product_id"], row["warehouse_id"], row["quantity"], last_order_id)
+
+
+def warehouse_stock(product_id, warehouse_id):
+    # A primary key lookup, whatever the number of orders.
+    stock = db.session.get(StockByWarehouse, (product_id, warehouse_id))
+    return stock.quantity if stock else 0
+
+
+def product_stock_by_warehouse(product_id):
+    return db.session.scalars(
+        select(StockByWarehouse)
+        .where(StockByWarehouse.product_id == product_id)
+        .order_by(StockByWarehouse.warehouse_id)
+    ).all()
+
+
+def create_order(**fields):
+    order = Order(**fields)
+    db.session.add(order)
+    db.session.flush()
+    try:
+        apply_stock_movement(order.product_id, order.quantity)
+        apply_warehouse_movement(order.product_id, order.warehouse_id, order.quantity, order.id)
+    except StockUpdateError:
+        db.session.rollback()
+        raise
+    db.session.commit()
+    return order
+
+
+def create_partner(name, contact_person, contact, address, modified_by):
+    # Contact, address and partner go out in a single flush, in dependency order,
+    # and are committed together.
+    partner = Partner(
+        name=name,
+        contact_person=contact_person,
+        contact=Contact(**contact, modified_by=modified_by),
+        address=Address(**address, modified_by=modified_by),
+        modified_by=modified_by,
+    )
+    db.session.add(partner)
+    db.session.commit()
+    return partner
+
+
+def create_warehouse(name, contact, address, modified_by):
+    warehouse = Warehouse(
+        name=name,
+        contact=Contact(**contact, modified_by=modified_by),
+        address=Address(**address, modified_by=modified_by),
+        modified_by=modified_by,
+    )
+    db.session.add(warehouse)
+    db.session.commit()
+    return warehouse
+
+
+def reconcile_stock_balances():
+    # fact_order is the ledger of stock movements: fix every balance that drifted from it.
+    movements = (
+        select(func.coalesce(func.sum(Order.quantity), 0)).where(Order.product_id == Product.id).scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Product)
+        .where(Product.quantity_available != movements)
+        .values(quantity_available=movements)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def rebuild_warehouse_stock(batch_size=REBUILD_BATCH_SIZE):
+    # Recomputed from fact_order one range of order ids at a time, each folded in with
+    # two set-based statements. The whole rebuild is committed at once, readers keep
+    # seeing the previous balances until it is complete.
+    db.session.execute(delete(StockByWarehouse))
+    last_id = db.session.scalar(select(func.max(Order.id))) or 0
+    for start in range(0, last_id, batch_size):
+        batch = (
+            select(
+                Order.product_id,
+                Order.warehouse_id,
+                func.sum(Order.quantity).label("quantity"),
+                func.max(Order.id).label("last_order_id"),
+            )
+            .where(Order.id > start, Order.id <= start + batch_size)
+            .group_by(Order.product_id, Order.warehouse_id)
+            .subquery()
+        )
+        matching = and_(
+            batch.c.product_id == StockByWarehouse.product_id, batch.c.warehouse_id == StockByWarehouse.warehouse_id
+        )
+        db.session.execute(
+            update(StockByWarehouse)
+            .where(exists().where(matching))
+            .values(
+                quantity=StockByWarehouse.quantity + select(batch.c.quantity).where(matching).scalar_subquery(),
+                last_order_id=select(batch.c.last_order_id).where(matching).scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            insert(StockByWarehouse).from_select(
+                ["product_id", "warehouse_id", "quantity", "last_order_id"],
+                select(batch).where(~exists().where(matching)),
+            )
+        )
+    db.session.commit()
+    return db.session.scalar(select(func.count()).select_from(StockByWarehouse))
@@ -31,7 +31,7 @@ setup(
     packages=find_packages(exclude=["tests", ".github"]),
     install_requires=read_requirements("requirements.txt"),
     entry_points={"console_scripts": ["sandstock = sandstock.__main__:main"]},
-    extras_require={"test": read_requirements("requirements-dev.txt")},
+    extras_require={"test": read_requirements("requirements-dev.txt"), "parquet": ["pyarrow"], "redis": ["redis"]},
     license_files="LICENSE",
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -0,0 +1,65 @@
+import pytest
+
+from sandstock import create_app, db
+from sandstock.config import TestingConfig
+from sandstock.models import Product
+from sandstock.services import create_partner, create_warehouse
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+
+    with app.app_context():
+        db.create_all()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def runner(app):
+    return app.test_cli_runner()
+
+
+@pytest.fixture
+def contact():
+    return {"email": "contact@testpartner.com", "phone_number": "123456789"}
+
+
+@pytest.fixture
+def address():
+    return {"street_address": "1 Main St", "city": "New York", "state": "NY", "postal_code": "10001", "country": "US"}
+
+
+@pytest.fixture
+def add_product(app):
+    def add(name, deleted=False):
+        product = Product(
+            name=name,
+            category_label="Test Category",
+            description="This is a test product.",
+            quantity_available=0,
+            modified_by="test@gmail.com",
+            deleted=deleted,
+        )
+        db.session.add(product)
+        db.session.commit()
+        return product
+
+    return add
+
+
+@pytest.fixture
+def references(contact, address, add_product):
+    # The product, partner and warehouse ids an order needs.
+    partner = create_partner("Test Partner", "John Doe", contact, address, "test@gmail.com")
+    warehouse = create_warehouse("Test Warehouse", contact, address, "test@gmail.com")
+    return add_product("Blue Widget").id, partner.id, warehouse.id
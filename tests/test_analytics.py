@@ -0,0 +1,118 @@
+from datetime import date, datetime
+
+import pytest
+
+from sandstock import db
+from sandstock.analytics import abc_classes, load_product_report
+from sandstock.explain import capture_statements
+from sandstock.models import Order, Product
+from sandstock.services import create_partner, create_warehouse
+
+
+@pytest.fixture
+def orders(app, contact, address):
+    partner = create_partner("Test Partner", "John Doe", contact, address, "test@gmail.com")
+    warehouse = create_warehouse("Test Warehouse", contact, address, "test@gmail.com")
+    other = create_warehouse("Other Warehouse", contact, address, "test@gmail.com")
+    products = [
+        Product(name=name, category_label="Widgets", description="Widget", quantity_available=0, modified_by="test")
+        for name in ("Blue Widget", "Red Widget")
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    blue, red = products[0].id, products[1].id
+    for product_id, warehouse_id, quantity, unit_price, created_at in [
+        (blue, warehouse.id, 10, 2.0, datetime(2024, 1, 5)),
+        (blue, other.id, 30, 4.0, datetime(2024, 2, 1)),
+        (blue, warehouse.id, -8, 10.0, datetime(2024, 2, 10)),
+        (blue, other.id, -12, 10.0, datetime(2024, 3, 2)),
+        (red, warehouse.id, 5, 1.0, datetime(2024, 1, 5)),
+        (red, warehouse.id, -1, 3.0, datetime(2024, 2, 15)),
+    ]:
+        db.session.add(
+            Order(
+                category="TRANSACTION",
+                product_id=product_id,
+                partner_id=partner.id,
+                warehouse_id=warehouse_id,
+                quantity=quantity,
+                unit_price=unit_price,
+                currency="USD",
+                created_at=created_at,
+                modified_by="test@gmail.com",
+            )
+        )
+    db.session.commit()
+    return blue, red, warehouse.id, other.id
+
+
+def test_abc_classes():
+    assert abc_classes({1: 80.0, 2: 15.0, 3: 5.0}) == {1: "A", 2: "B", 3: "C"}
+
+
+def test_load_product_report(app, orders):
+    blue, red, _, _ = orders
+
+    assert load_product_report("USD", top=1) == [
+        {
+            "product_id": blue,
+            "currency": "USD",
+            "on_hand": 20,
+            "average_cost": 3.5,
+            "stock_value": 70.0,
+            "units_sold": 20,
+            "revenue": 200.0,
+            "turnover": 20 / 10,
+            "abc_class": "A",
+        }
+    ]
+    report = {row["product_id"]: row for row in load_product_report("USD", date_to=date(2024, 2, 10))}
+    assert (report[blue]["on_hand"], report[red]["on_hand"]) == (32, 5)
+    # Blue: 20 sold from February on, 10 in stock on the first, 20 at the end.
+    report = {row["product_id"]: row for row in load_product_report("USD", date(2024, 2, 1), date(2024, 3, 31))}
+    assert report[blue]["turnover"] == 20 / 15
+
+
+def test_load_product_report_keeps_currencies_apart(app, orders):
+    blue, _, warehouse_id, _ = orders
+    partner_id = Order.query.first().partner_id
+    for quantity, unit_price in [(10, 100.0), (-5, 150.0)]:
+        db.session.add(
+            Order(
+                category="TRANSACTION",
+                product_id=blue,
+                partner_id=partner_id,
+                warehouse_id=warehouse_id,
+                quantity=quantity,
+                unit_price=unit_price,
+                currency="EUR",
+                created_at=datetime(2024, 3, 5),
+                modified_by="test@gmail.com",
+            )
+        )
+    db.session.commit()
+
+    usd = {row["product_id"]: row for row in load_product_report("USD")}[blue]
+    eur = {row["product_id"]: row for row in load_product_report("EUR")}[blue]
+
+    assert (usd["on_hand"], usd["units_sold"]) == (eur["on_hand"], eur["units_sold"]) == (25, 25)
+    assert (usd["average_cost"], usd["revenue"]) == (3.5, 200.0)
+    assert (eur["average_cost"], eur["revenue"]) == (100.0, 750.0)
+
+
+def test_get_product_report(client, app, orders):
+    blue, red, _, _ = orders
+
+    response = client.get("/analytics/products?date_from=2024-02-12&date_to=2024-02-29")
+
+    assert response.status_code == 200
+    assert [(row["product_id"], row["revenue"], row["abc_class"]) for row in response.get_json()] == [
+        (red, 3.0, "A"),
+        (blue, 0.0, "C"),
+    ]
+    assert client.get("/analytics/products?currency=EUR").get_json()[0]["revenue"] == 0.0
+
+    with capture_statements(db.engine) as statements:
+        client.get("/analytics/products?top=1")
+    # One row per product, summed by the database.
+    assert "GROUP BY" in statements[-1][0]
@@ -0,0 +1,117 @@
+import pytest
+
+from sandstock import db
+from sandstock.instrumentation import query_count
+from sandstock.models import Order, Partner, Product, StockByWarehouse
+
+HEADERS = {"X-MS-CLIENT-PRINCIPAL-NAME": "api@mail.com"}
+
+
+@pytest.fixture
+def api_references(client, contact, address):
+    # Created through the API itself.
+    product = client.post(
+        "/api/v1/products", json={"name": "Blue Widget", "category_label": "Widgets", "description": "Blue"}
+    )
+    partner = client.post("/api/v1/partners", json={"name": "Acme", "contact_person": "Jane", **contact, **address})
+    warehouse = client.post("/api/v1/warehouses", json={"name": "Main", **contact, **address})
+    return product.get_json()["id"], partner.get_json()["id"], warehouse.get_json()["id"]
+
+
+def test_create_and_get_resources(client, app, contact, address):
+    response = client.post(
+        "/api/v1/partners", json={"name": "Acme", "contact_person": "Jane", **contact, **address}, headers=HEADERS
+    )
+
+    assert response.status_code == 201
+    partner = response.get_json()
+    assert partner["name"] == "Acme"
+    assert partner["modified_by"] == "api@mail.com"
+    assert partner["contact"]["email"] == "contact@testpartner.com"
+    assert partner["address"]["city"] == "New York"
+
+    response = client.get(f"/api/v1/partners/{partner['id']}")
+    assert response.get_json() == partner
+    assert query_count("SELECT") == 1
+    assert client.get("/api/v1/partners/12345").status_code == 404
+
+
+def test_create_invalid_resource(client, app):
+    response = client.post("/api/v1/products", json={"name": "", "category_label": "Widgets", "description": "Blue"})
+
+    assert response.status_code == 422
+    assert response.get_json() == {"errors": [{"row": 1, "errors": {"name": ["This field is required."]}}]}
+    assert client.post("/api/v1/products", data="not json").status_code == 400
+
+
+def test_create_orders_batch(client, app, api_references):
+    product_id, partner_id, warehouse_id = api_references
+    order = {
+        "category": "TRANSACTION",
+        "product_id": product_id,
+        "partner_id": partner_id,
+        "warehouse_id": warehouse_id,
+        "unit_price": 10.0,
+        "currency": "USD",
+    }
+
+    response = client.post("/api/v1/orders:batch", json=[{**order, "quantity": quantity} for quantity in range(1, 6)])
+
+    assert response.status_code == 201
+    ids = response.get_json()["ids"]
+    assert ids == sorted(ids) and len(ids) == 5
+    assert [order.quantity for order in Order.query.order_by(Order.id)] == [1, 2, 3, 4, 5]
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).quantity_available == 15
+    assert db.session.get(StockByWarehouse, (product_id, warehouse_id)).quantity == 15
+
+
+def test_create_orders_batch_is_all_or_nothing(client, app, api_references):
+    product_id, partner_id, warehouse_id = api_references
+    order = {
+        "category": "TRANSACTION",
+        "product_id": product_id,
+        "partner_id": partner_id,
+        "warehouse_id": warehouse_id,
+        "quantity": 1,
+        "unit_price": 10.0,
+        "currency": "USD",
+    }
+
+    response = client.post("/api/v1/orders:batch", json=[order, {**order, "product_id": 12345}, order])
+
+    assert response.status_code == 422
+    assert response.get_json() == {"errors": [{"row": 2, "errors": {"product_id": ["Product 12345 does not exist."]}}]}
+    assert Order.query.count() == 0
+    assert client.post("/api/v1/orders:batch", json="orders").status_code == 400
+
+
+def test_get_products_by_ids(client, app):
+    response = client.post(
+        "/api/v1/products:batch",
+        json=[{"name": f"Widget {index}", "category_label": "Widgets", "description": "Widget"} for index in range(5)],
+    )
+    ids = response.get_json()["ids"]
+
+    response = client.get(f"/api/v1/products?ids={ids[3]},{ids[1]},12345")
+
+    assert [product["id"] for product in response.get_json()] == [ids[1], ids[3]]
+    assert query_count("SELECT") == 1
+    assert client.get("/api/v1/products?ids=1,a").status_code == 400
+
+
+def test_list_resources(client, app, contact, address):
+    client.post(
+        "/api/v1/partners:batch",
+        json=[{"name": f"Partner {index}", "contact_person": "Jane", **contact, **address} for index in range(3)],
+    )
+    partner = Partner.query.first()
+    partner.deleted = True
+    db.session.commit()
+
+    response = client.get("/api/v1/partners?limit=1")
+    assert [partner["name"] for partner in response.get_json()] == ["Partner 1"]
+
+    response = client.get(f"/api/v1/partners?limit=1&cursor={response.headers['X-Next-Cursor']}")
+    assert [partner["name"] for partner in response.get_json()] == ["Partner 2"]
+    assert "X-Next-Cursor" not in response.headers
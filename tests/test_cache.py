@@ -0,0 +1,71 @@
+from sandstock.cache import DimensionCache, LocalCache
+from sandstock.instrumentation import query_count
+from sandstock.metrics import LocalStore, Metrics, get_metrics
+from sandstock.models import Product
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_local_cache_lru_and_ttl():
+    clock = Clock()
+    metrics = Metrics(LocalStore())
+    cache = LocalCache(max_entries=2, ttl=10, clock=clock, metrics=metrics)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert len(cache.entries) == 1
+    assert "sandstock_cache_evictions_total 1.0" in metrics.render().splitlines()
+
+
+def test_dimension_cache_follows_the_database_version(app, add_product):
+    worker, other_worker = DimensionCache(LocalCache()), DimensionCache(LocalCache())
+    loads = []
+
+    def load():
+        loads.append(1)
+        return ["page"]
+
+    assert worker.fetch(Product, ("get", ""), load) == ["page"]
+    assert worker.fetch(Product, ("get", ""), load) == ["page"]
+    assert len(loads) == 1
+
+    # Written through another worker: nothing reaches this worker's backend but the
+    # version in the database.
+    other_worker.fetch(Product, ("get", ""), load)
+    add_product("Test Product")
+
+    worker.fetch(Product, ("get", ""), load)
+    assert len(loads) == 3
+
+
+def test_get_products_is_served_from_cache_until_written(client, app, add_product):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+    product_id = add_product("Test Product").id
+
+    assert client.get("/product/get").get_json()[0]["name"] == "Test Product"
+    assert client.get("/product/get").get_json()[0]["name"] == "Test Product"
+    # The table version only.
+    assert query_count("SELECT") == 1
+
+    client.post(
+        f"/product/{product_id}/edit",
+        data={"name": "Renamed Product", "category_label": "Test Category", "description": "Renamed."},
+    )
+
+    assert client.get("/product/get").get_json()[0]["name"] == "Renamed Product"
+    client.post(f"/product/{product_id}/delete")
+    assert client.get("/product/get").get_json() == []
+    assert 'sandstock_cache_requests_total{table="dim_product",result="hit"} 1.0' in get_metrics().render().splitlines()
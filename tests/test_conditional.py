@@ -0,0 +1,171 @@
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.exc import OperationalError
+
+from sandstock import db
+from sandstock.instrumentation import query_count
+from sandstock.models import Order, Product, TableVersion
+from sandstock.services import create_order, create_partner, create_warehouse
+
+
+def versions():
+    db.session.expire_all()
+    return {row.name: row.version for row in TableVersion.query}
+
+
+def test_writes_bump_table_versions(app, add_product, contact, address):
+    assert versions() == {"dim_partner": 0, "dim_product": 0, "dim_warehouse": 0, "fact_order": 0}
+
+    product_id = add_product("Blue Widget").id
+    db.session.execute(update(Product).values(quantity_available=5))
+    db.session.commit()
+    assert versions()["dim_product"] == 2
+
+    partner = create_partner("Test Partner", "John Doe", contact, address, "test@gmail.com")
+    warehouse = create_warehouse("Test Warehouse", contact, address, "test@gmail.com")
+    create_order(
+        category="TRANSACTION",
+        product_id=product_id,
+        partner_id=partner.id,
+        warehouse_id=warehouse.id,
+        quantity=5,
+        unit_price=10.0,
+        currency="USD",
+        modified_by="test@gmail.com",
+    )
+
+    # One bump per transaction, savepoints included.
+    assert versions() == {"dim_partner": 1, "dim_product": 3, "dim_warehouse": 1, "fact_order": 1}
+
+
+def test_versions_move_with_the_commit(app, add_product, contact, address):
+    # The versions are bumped last in the transaction of the write, one table at a time
+    # in name order.
+    product_id = add_product("Blue Widget").id
+    partner = create_partner("Test Partner", "John Doe", contact, address, "test@gmail.com")
+    warehouse = create_warehouse("Test Warehouse", contact, address, "test@gmail.com")
+    calls = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        calls.append((" ".join(statement.split()[:3]), parameters))
+
+    def record_commit(conn):
+        calls.append(("COMMIT", None))
+
+    event.listen(db.engine, "before_cursor_execute", record_statement)
+    event.listen(db.engine, "commit", record_commit)
+    try:
+        create_order(
+            category="TRANSACTION",
+            product_id=product_id,
+            partner_id=partner.id,
+            warehouse_id=warehouse.id,
+            quantity=5,
+            unit_price=10.0,
+            currency="USD",
+            modified_by="test@gmail.com",
+        )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record_statement)
+        event.remove(db.engine, "commit", record_commit)
+
+    statements = [statement for statement, _ in calls]
+    assert statements.count("COMMIT") == 1
+    bumps = [parameters[-1] for statement, parameters in calls if statement == "UPDATE meta_table_version SET"]
+    assert bumps == ["dim_product", "fact_order"]
+    assert statements[-3:] == ["UPDATE meta_table_version SET", "UPDATE meta_table_version SET", "COMMIT"]
+
+
+def test_failed_bump_fails_the_write(app, add_product, contact, address):
+    product_id = add_product("Blue Widget").id
+    partner = create_partner("Test Partner", "John Doe", contact, address, "test@gmail.com")
+    warehouse = create_warehouse("Test Warehouse", contact, address, "test@gmail.com")
+    before = versions()
+
+    def fail_bump(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE meta_table_version"):
+            raise OperationalError(statement, parameters, Exception("lock timeout"))
+
+    event.listen(db.engine, "before_cursor_execute", fail_bump)
+    try:
+        with pytest.raises(OperationalError):
+            create_order(
+                category="TRANSACTION",
+                product_id=product_id,
+                partner_id=partner.id,
+                warehouse_id=warehouse.id,
+                quantity=5,
+                unit_price=10.0,
+                currency="USD",
+                modified_by="test@gmail.com",
+            )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", fail_bump)
+    db.session.rollback()
+
+    # Neither the order nor a version is stored: a retry writes it once.
+    assert Order.query.count() == 0
+    assert versions() == before
+
+
+def test_home_not_modified(client, app, add_product):
+    add_product("Blue Widget")
+    response = client.get("/")
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "Last-Modified" in response.headers
+
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert query_count("SELECT") == 1
+
+    add_product("Red Widget")
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert b"Red Widget" in response.data
+
+
+def test_flash_messages_are_rendered(client, app):
+    etag = client.get("/").headers["ETag"]
+    with client.session_transaction() as session:
+        session["_flashes"] = [("success", "Product updated successfully!")]
+
+    response = client.get("/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert b"Product updated successfully!" in response.data
+
+
+def test_edit_page_not_modified(client, app, add_product):
+    product_id = add_product("Blue Widget").id
+    etag = client.get(f"/product/{product_id}/edit").headers["ETag"]
+
+    response = client.get(f"/product/{product_id}/edit", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert query_count("SELECT") == 1
+
+    client.post(
+        f"/product/{product_id}/edit",
+        data={"name": "Renamed Widget", "category_label": "Test Category", "description": "Renamed."},
+    )
+    with client.session_transaction() as session:
+        session.pop("_flashes", None)
+    response = client.get(f"/product/{product_id}/edit", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"Renamed Widget" in response.data
+
+
+def test_json_responses_are_tagged(client, app, add_product):
+    add_product("Blue Widget")
+    response = client.get("/product/get")
+    etag = response.headers["ETag"]
+
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    response = client.get("/product/get", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert client.get("/product/get", headers={"If-None-Match": '"other"'}).status_code == 200
@@ -0,0 +1,105 @@
+import pytest
+
+from sandstock import create_app, db
+from sandstock.config import TestingConfig
+from sandstock.credentials import KeyVaultSecretProvider, LocalSecretProvider, SecretProvider, create_secret_provider
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProvider(SecretProvider):
+    def __init__(self, expires_at=None, **kwargs):
+        super().__init__(**kwargs)
+        self.expires_at = expires_at
+        self.fetches = 0
+        self.failing = False
+
+    def fetch(self, name):
+        if self.failing:
+            raise ConnectionError("vault unreachable")
+        self.fetches += 1
+        return f"{name}-{self.fetches}", self.expires_at
+
+
+def test_secret_is_fetched_once_until_max_age():
+    clock = Clock()
+    provider = FakeProvider(max_age=60, clock=clock)
+
+    assert provider.get("db-password") == "db-password-1"
+    clock.now += 59
+    assert provider.get("db-password") == "db-password-1"
+    clock.now += 1
+    assert provider.get("db-password") == "db-password-2"
+
+
+def test_secret_is_refreshed_before_it_expires():
+    clock = Clock()
+    provider = FakeProvider(expires_at=clock.now + 400, max_age=3600, margin=300, clock=clock)
+
+    provider.get("db-password")
+    clock.now += 99
+    assert provider.get("db-password") == "db-password-1"
+    clock.now += 1
+    assert provider.get("db-password") == "db-password-2"
+
+
+def test_failed_refresh_keeps_the_cached_value_until_expiry():
+    clock = Clock()
+    provider = FakeProvider(expires_at=clock.now + 400, max_age=3600, margin=300, clock=clock)
+    provider.get("db-password")
+
+    provider.failing = True
+    clock.now += 200
+    assert provider.get("db-password") == "db-password-1"
+    clock.now += 200
+    with pytest.raises(ConnectionError):
+        provider.get("db-password")
+
+
+def test_local_secret_provider(monkeypatch, tmp_path):
+    monkeypatch.setenv("DEV_ERP_DB_PASSWORD", "from-env")
+    (tmp_path / "other-secret").write_text("from-file\n")
+    provider = LocalSecretProvider(tmp_path)
+
+    assert provider.get("dev-erp-db-password") == "from-env"
+    assert provider.get("other-secret") == "from-file"
+    with pytest.raises(KeyError):
+        provider.get("missing-secret")
+
+
+def test_create_secret_provider():
+    config = {"SECRET_PROVIDER": "keyvault", "KEY_VAULT_URL": "https://kv", "SECRET_MAX_AGE": 60}
+    assert isinstance(create_secret_provider(config), KeyVaultSecretProvider)
+    config.update(SECRET_PROVIDER="local", SECRET_DIRECTORY=None)
+    assert isinstance(create_secret_provider(config), LocalSecretProvider)
+
+
+def test_password_is_resolved_on_connect(monkeypatch):
+    pytest.importorskip("pyodbc", exc_type=ImportError)
+    monkeypatch.setenv("ERP_DB_PASSWORD", "p}w;d")
+    config = type(
+        "SecretConfig",
+        (TestingConfig,),
+        {
+            "SQLALCHEMY_DATABASE_URI": "mssql+pyodbc://usr@localhost:57000/master?driver=ODBC+Driver+18+for+SQL+Server",
+            "SECRET_PROVIDER": "local",
+            "DATABASE_PASSWORD_SECRET": "erp-db-password",
+        },
+    )
+    app = create_app(config)
+    provider = app.extensions["sandstock_secrets"]
+    assert provider.values == {}
+
+    with app.app_context():
+        engine = db.engine
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        cargs = list(cargs)
+        engine.dialect.dispatch.do_connect(engine.dialect, None, cargs, cparams)
+
+    assert cargs[0].endswith(";UID=usr;PWD={p}}w;d}")
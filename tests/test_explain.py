@@ -0,0 +1,51 @@
+from sandstock import db
+from sandstock.explain import EXPECTED_SCANS, capture_statements, expected_scan, explain, explain_routes, table_scans
+from sandstock.models import Product
+
+
+def test_table_scans():
+    assert table_scans("sqlite", ["SCAN fact_order"]) == ["SCAN fact_order"]
+    assert table_scans("sqlite", ["SCAN fact_order USING INDEX ix_fact_order_created_at"]) == []
+    assert table_scans("sqlite", ["SEARCH dim_product USING INTEGER PRIMARY KEY (rowid=?)"]) == []
+    # Subqueries read back from their own plan.
+    assert table_scans("sqlite", ["SCAN anon_1"]) == []
+    assert table_scans("mssql", ["Clustered Index Scan OBJECT:([fact_order].[PK])"]) != []
+    assert table_scans("mssql", ["Clustered Index Seek OBJECT:([fact_order].[PK])"]) == []
+    assert table_scans("postgresql", ["Seq Scan on fact_order  (cost=0.00..1.01 rows=1 width=4)"]) != []
+
+
+def test_expected_scan(monkeypatch):
+    monkeypatch.setitem(EXPECTED_SCANS, "/order/export", "Streams every order.")
+
+    assert expected_scan("/order/export?query=1") == "Streams every order."
+    assert expected_scan("/order/get?query=1") is None
+
+
+def test_explain(app):
+    with capture_statements(db.engine) as statements:
+        db.session.get(Product, 1)
+
+    assert len(statements) == 1
+    with db.engine.connect() as connection:
+        plan = explain(connection, *statements[0])
+    assert plan
+
+
+def test_explain_routes(app):
+    reports = explain_routes(app)
+
+    urls = {url for url, _, _, _ in reports}
+    assert any(url.startswith("/product/get") for url in urls)
+    assert any(url.startswith("/order/1/edit") for url in urls)
+    # The n-gram search is planned, not only the prefix match of short queries.
+    assert any("UNION" in statement and "idx_search_gram" in statement for _, statement, _, _ in reports)
+    for _, statement, plan, _ in reports:
+        assert statement.lstrip().upper().startswith("SELECT")
+        assert plan
+
+
+def test_explain_command(runner):
+    result = runner.invoke(args=["explain"])
+    assert result.exit_code == 0, result.output
+    assert "/product/get" in result.output
+    assert "[EXPECTED SCAN] /order/export" in result.output
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from sandstock import db
+from sandstock.exports import ExportFormatError, export_orders
+from sandstock.imports import import_rows
+
+
+@pytest.fixture
+def add_orders(references):
+    product_id, partner_id, warehouse_id = references
+
+    def add(count):
+        rows = [
+            {
+                "category": "TRANSACTION",
+                "product_id": product_id,
+                "partner_id": partner_id,
+                "warehouse_id": warehouse_id,
+                "quantity": index + 1,
+                "unit_price": 2.5,
+                "currency": "EUR",
+                "created_at": datetime(2024, 1, 1 + index % 28).isoformat(sep=" "),
+            }
+            for index in range(count)
+        ]
+        report = import_rows("order", rows, "test@gmail.com")
+        assert report.imported == count
+
+    return add
+
+
+def test_export_orders_csv(app, add_orders):
+    add_orders(25)
+
+    chunks = list(export_orders("csv", chunk_size=10))
+
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 25
+    assert rows[0]["order_id"] == "1"
+    assert rows[0]["product_name"] == "Blue Widget"
+    assert rows[0]["partner_name"] == "Test Partner"
+    assert rows[0]["warehouse_name"] == "Test Warehouse"
+    assert rows[24]["quantity"] == "25"
+
+
+def test_export_orders_ndjson_with_filters(app, add_orders):
+    add_orders(10)
+
+    chunks = export_orders("ndjson", date_from=datetime(2024, 1, 3).date(), date_to=datetime(2024, 1, 4).date())
+
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [row["order_id"] for row in rows] == [3, 4]
+    assert rows[0]["created_at"] == "2024-01-03T00:00:00"
+
+
+def test_export_orders_parquet(app, add_orders):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    add_orders(25)
+
+    table = parquet.read_table(io.BytesIO(b"".join(export_orders("parquet", chunk_size=10))))
+
+    assert table.num_rows == 25
+    assert table.column("order_id").to_pylist() == list(range(1, 26))
+    assert parquet.ParquetFile(io.BytesIO(b"".join(export_orders("parquet", chunk_size=10)))).num_row_groups == 3
+
+
+def test_export_orders_parquet_without_orders(app):
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    table = parquet.read_table(io.BytesIO(b"".join(export_orders("parquet"))))
+
+    assert table.num_rows == 0
+    assert table.schema.field("order_id").type == "int64"
+    assert table.schema.field("created_at").type == "timestamp[us]"
+    assert table.schema.field("product_name").type == "string"
+
+
+def test_export_orders_unknown_format(app):
+    with pytest.raises(ExportFormatError):
+        export_orders("xlsx")
+
+
+def test_export_endpoint(client, app, add_orders):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+    add_orders(3)
+    db.session.remove()
+
+    response = client.get("/order/export?format=ndjson&product_id=1")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["Content-Disposition"] == "attachment; filename=orders.ndjson"
+    assert len(response.data.splitlines()) == 3
+
+    response = client.get("/order/export?product_id=2")
+    assert response.data.decode().splitlines()[0].startswith("order_id,created_at,category")
+    assert len(response.data.splitlines()) == 1
+
+    response = client.get("/order/export?format=xlsx")
+    assert response.status_code == 400
+
+
+def test_export_cli(app, runner, tmp_path, add_orders):
+    add_orders(5)
+    path = tmp_path / "orders.csv"
+
+    result = runner.invoke(args=["export-orders", str(path), "--chunk-size", "2"])
+
+    assert result.exit_code == 0
+    assert len(path.read_text().splitlines()) == 6
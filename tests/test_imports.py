@@ -0,0 +1,168 @@
+import io
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from sandstock import db
+from sandstock.explain import capture_statements
+from sandstock.imports import ImportFormatError, file_format, import_file, import_rows, read_rows
+from sandstock.models import Order, Partner, Product, Warehouse
+from sandstock.search import search
+from sandstock.services import warehouse_stock
+
+PRODUCTS_CSV = """name,category_label,description
+Blue Widget,Widgets,A blue widget
+,Widgets,Missing name
+Red Widget,Widgets,A red widget
+"""
+
+
+def test_file_format():
+    assert file_format("products.CSV") == "csv"
+    assert file_format("orders.parquet") == "parquet"
+    with pytest.raises(ImportFormatError):
+        file_format("orders.xlsx")
+
+
+def test_read_csv_rows():
+    rows = list(read_rows(io.BytesIO(PRODUCTS_CSV.encode("utf-8-sig")), "csv"))
+    assert len(rows) == 3
+    assert rows[0] == {"name": "Blue Widget", "category_label": "Widgets", "description": "A blue widget"}
+
+
+def test_import_products(app):
+    report = import_file("product", io.BytesIO(PRODUCTS_CSV.encode()), "csv", "test@gmail.com", batch_size=2)
+
+    assert report.to_dict() == {
+        "imported": 2,
+        "failed": 1,
+        "errors": [{"row": 2, "errors": {"name": ["This field is required."]}}],
+    }
+    products = Product.query.order_by(Product.id).all()
+    assert [product.name for product in products] == ["Blue Widget", "Red Widget"]
+    assert all(product.quantity_available == 0 and product.modified_by == "test@gmail.com" for product in products)
+    assert [product.name for product in search(Product, "widget").items] == ["Red Widget", "Blue Widget"]
+
+
+def test_import_partners_and_warehouses(app, contact, address):
+    rows = [{"name": f"Partner {index}", "contact_person": "John Doe", **contact, **address} for index in range(3)]
+    rows.append({"name": "No Email", **address})
+
+    report = import_rows("partner", rows, "test@gmail.com")
+
+    assert report.imported == 3
+    assert report.errors == [{"row": 4, "errors": {"email": ["This field is required."]}}]
+    partners = Partner.query.order_by(Partner.id).all()
+    assert [partner.name for partner in partners] == ["Partner 0", "Partner 1", "Partner 2"]
+    assert len({partner.contact_id for partner in partners}) == 3
+    assert partners[2].address.city == "New York"
+
+    report = import_rows("warehouse", [{"name": "Main Warehouse", **contact, **address}], "test@gmail.com")
+    assert report.imported == 1
+    assert Warehouse.query.one().contact.email == "contact@testpartner.com"
+
+
+def test_import_orders_applies_stock_deltas(app, references):
+    product_id, partner_id, warehouse_id = references
+    order = {
+        "category": "TRANSACTION",
+        "product_id": product_id,
+        "partner_id": partner_id,
+        "warehouse_id": warehouse_id,
+        "unit_price": 10.0,
+        "currency": "USD",
+    }
+    rows = [
+        {**order, "quantity": 5, "created_at": "2024-03-01 10:00:00"},
+        {**order, "quantity": -2},
+        {**order, "quantity": 3, "product_id": 42},
+        {**order, "quantity": 1, "unit_price": -1},
+        {**order, "quantity": 4, "created_at": "yesterday"},
+    ]
+
+    report = import_rows("order", rows, "test@gmail.com")
+
+    assert report.imported == 2
+    assert [error["row"] for error in report.errors] == [3, 4, 5]
+    assert report.errors[0]["errors"] == {"product_id": ["Product 42 does not exist."]}
+    assert report.errors[1]["errors"] == {"unit_price": ["Price must be greater or equal than 0."]}
+    assert list(report.errors[2]["errors"]) == ["created_at"]
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).quantity_available == 3
+    assert warehouse_stock(product_id, warehouse_id) == 3
+    orders = Order.query.order_by(Order.id).all()
+    assert orders[0].created_at == datetime(2024, 3, 1, 10)
+    assert [order.modified_by for order in orders] == ["test@gmail.com"] * 2
+
+
+def test_import_orders_stays_under_the_parameter_limit(app, references):
+    _, partner_id, warehouse_id = references
+    db.session.add_all(
+        [
+            Product(
+                name=f"Part {index}", category_label="Test", description="Test", quantity_available=0, modified_by="t"
+            )
+            for index in range(2200)
+        ]
+    )
+    db.session.commit()
+    product_ids = db.session.scalars(select(Product.id).order_by(Product.id)).all()
+    rows = [
+        {
+            "category": "TRANSACTION",
+            "product_id": product_id,
+            "partner_id": partner_id,
+            "warehouse_id": warehouse_id,
+            "quantity": 2,
+            "unit_price": 10.0,
+            "currency": "USD",
+        }
+        for product_id in product_ids
+    ]
+
+    with capture_statements(db.engine, selects_only=False) as statements:
+        report = import_rows("order", rows, "test@gmail.com", batch_size=len(rows))
+
+    assert report.imported == len(rows)
+    # The lookups of the references and the stock updates: SQL Server takes 2100 parameters.
+    lists = [parameters for statement, parameters in statements if " IN (" in statement]
+    assert len(lists) > 3
+    assert max(len(parameters) for parameters in lists) < 2100
+    db.session.expire_all()
+    assert db.session.scalar(select(func.sum(Product.quantity_available))) == 2 * len(rows)
+    assert warehouse_stock(product_ids[-1], warehouse_id) == 2
+
+
+def test_import_cli(app, runner, tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(PRODUCTS_CSV)
+
+    result = runner.invoke(args=["import", "product", str(path), "--modified-by", "cli@mail.com"])
+
+    assert result.exit_code == 1
+    assert "Row 2: {'name': ['This field is required.']}" in result.output
+    assert "Imported 2 rows, 1 failed." in result.output
+    assert Product.query.count() == 2
+
+    result = runner.invoke(args=["import", "product", str(path), "--format", "parquet"])
+    assert result.exit_code != 0
+
+
+def test_import_endpoint(client, app):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    response = client.post(
+        "/product/import",
+        data={"file": (io.BytesIO(PRODUCTS_CSV.encode()), "products.csv")},
+        headers={"X-MS-CLIENT-PRINCIPAL-NAME": "user@mail.com"},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 2
+    assert Product.query.filter_by(modified_by="user@mail.com").count() == 2
+
+    response = client.post("/product/import", data={"file": (io.BytesIO(b""), "products.xlsx")})
+    assert response.status_code == 400
+    response = client.post("/product/import")
+    assert response.status_code == 400
@@ -0,0 +1,85 @@
+import logging
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from sandstock import create_app, db
+from sandstock.config import TestingConfig
+from sandstock.instrumentation import parameter_shape, query_count
+from sandstock.models import Product
+
+
+class Capture(logging.Handler):
+    # The test targets run pytest with `-p no:logging`, so without caplog.
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    logger = logging.getLogger("sandstock.instrumentation")
+    handler, level = Capture(), logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_parameter_shape():
+    assert parameter_shape((1, "a", None)) == "(int, str, NoneType)"
+    assert parameter_shape({"id": 1, "at": datetime(2024, 1, 1)}) == "{id: int, at: datetime}"
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+def test_requests_report_their_queries(client, app, records, add_product):
+    add_product("Blue Widget")
+
+    response = client.get("/product/get")
+
+    metrics = [metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")]
+    assert metrics == ["db", "db-slowest", "app"]
+    assert f'desc="{query_count()} statements' in response.headers["Server-Timing"]
+    [record] = [record for record in records if "statements=" in record.getMessage()]
+    assert record.getMessage().startswith("GET /product/get 200 statements=")
+    assert record.endpoint == "get_products"
+    assert record.statements == query_count()
+    assert record.slowest.startswith("SELECT")
+    # Reads are not counted, drivers report no rowcount for them.
+    assert record.rows_written == 0
+
+
+def test_requests_report_the_rows_they_write(client, app, records, add_product):
+    product_id = add_product("Blue Widget").id
+
+    client.post(
+        f"/product/{product_id}/edit",
+        data={"name": "Renamed Widget", "category_label": "Test Category", "description": "Renamed."},
+    )
+
+    [record] = [record for record in records if "statements=" in record.getMessage()]
+    assert record.getMessage().startswith(f"POST /product/{product_id}/edit 302 statements=")
+    # The product, and its search grams and table version along with it.
+    assert record.rows_written > 1
+
+
+def test_slow_queries_are_logged(records):
+    app = create_app(type("SlowQueryConfig", (TestingConfig,), {"SLOW_QUERY_MS": 0}))
+    with app.app_context():
+        db.create_all()
+        try:
+            db.session.execute(select(Product).where(Product.id == 1, Product.name == "Blue Widget")).all()
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+    [record] = [record for record in records if "FROM dim_product" in record.getMessage()]
+    assert record.getMessage().startswith("Slow query, ")
+    assert record.getMessage().endswith("parameters=(int, str)")
+    assert record.endpoint is None
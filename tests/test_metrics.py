@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+
+from sandstock.metrics import ARCHIVE, FileStore, LocalStore, Metrics, mark_process_dead
+
+REQUESTS = (("endpoint", "home"), ("method", "GET"), ("status", 200))
+
+
+def record(directory):
+    metrics = Metrics(FileStore(directory))
+    metrics.inc("sandstock_requests_total", REQUESTS, 2)
+    metrics.observe("sandstock_request_duration_seconds", (("endpoint", "home"), ("method", "GET")), 0.2)
+
+
+def test_file_store_sums_processes(tmp_path):
+    worker = multiprocessing.get_context("fork").Process(target=record, args=(str(tmp_path),))
+    worker.start()
+    worker.join()
+    record(str(tmp_path))
+
+    output = Metrics(FileStore(str(tmp_path), "reader.db")).render()
+
+    assert 'sandstock_requests_total{endpoint="home",method="GET",status="200"} 4.0' in output
+    assert 'sandstock_request_duration_seconds_count{endpoint="home",method="GET"} 2.0' in output
+
+    mark_process_dead(worker.pid, str(tmp_path))
+
+    assert not os.path.exists(tmp_path / f"{worker.pid}.db")
+    assert os.path.exists(tmp_path / ARCHIVE)
+    assert Metrics(FileStore(str(tmp_path), "reader.db")).render() == output
+
+
+def test_file_store_reopens_its_file(tmp_path):
+    store = FileStore(str(tmp_path), "worker.db")
+    for index in range(5000):
+        store.add(("counter", "sandstock_requests_total", (("endpoint", f"view_{index}"),)), 1.0)
+    store.close()
+
+    store = FileStore(str(tmp_path), "worker.db")
+    store.add(("counter", "sandstock_requests_total", (("endpoint", "view_0"),)), 1.0)
+
+    values = store.collect()
+    assert len(values) == 5000
+    assert values["counter", "sandstock_requests_total", (("endpoint", "view_0"),)] == 2.0
+
+
+def test_histograms_are_cumulative():
+    metrics = Metrics(LocalStore())
+    for value in (0.003, 0.003, 0.2, 60):
+        metrics.observe("sandstock_db_pool_checkout_seconds", (), value)
+
+    lines = metrics.render().splitlines()
+
+    assert 'sandstock_db_pool_checkout_seconds_bucket{le="0.001"} 0.0' in lines
+    assert 'sandstock_db_pool_checkout_seconds_bucket{le="0.005"} 2.0' in lines
+    assert 'sandstock_db_pool_checkout_seconds_bucket{le="0.25"} 3.0' in lines
+    assert 'sandstock_db_pool_checkout_seconds_bucket{le="30.0"} 3.0' in lines
+    assert 'sandstock_db_pool_checkout_seconds_bucket{le="+Inf"} 4.0' in lines
+    assert "sandstock_db_pool_checkout_seconds_count 4.0" in lines
+    assert "sandstock_db_pool_checkout_seconds_sum 60.206" in lines
+    assert "# TYPE sandstock_db_pool_checkout_seconds histogram" in lines
+
+
+def test_collectors_advance_counters_kept_elsewhere(tmp_path):
+    # As the Redis cache does with the evictions its server counts, from two workers.
+    evicted = [3]
+    workers = [Metrics(FileStore(str(tmp_path), f"{name}.db")) for name in ("one", "two")]
+    for metrics in workers:
+        metrics.collectors.append(
+            lambda metrics=metrics: metrics.advance("sandstock_cache_evictions_total", evicted[0])
+        )
+
+    assert "sandstock_cache_evictions_total 3.0" in workers[0].render().splitlines()
+    evicted[0] = 5
+    assert "sandstock_cache_evictions_total 5.0" in workers[1].render().splitlines()
+    assert "sandstock_cache_evictions_total 5.0" in workers[0].render().splitlines()
+    evicted[0] = 0
+    assert "sandstock_cache_evictions_total 5.0" in workers[1].render().splitlines()
+
+
+def test_get_metrics(client, app, add_product):
+    add_product("Blue Widget")
+    client.get("/product/get")
+    client.get("/product/get")
+    client.get("/not/a/page")
+
+    response = client.get("/metrics")
+
+    assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
+    lines = response.data.decode().splitlines()
+    assert 'sandstock_requests_total{endpoint="get_products",method="GET",status="200"} 2.0' in lines
+    assert 'sandstock_requests_total{endpoint="unmatched",method="GET",status="404"} 1.0' in lines
+    assert 'sandstock_cache_requests_total{table="dim_product",result="hit"} 1.0' in lines
+    assert 'sandstock_cache_requests_total{table="dim_product",result="miss"} 1.0' in lines
+    assert 'sandstock_request_duration_seconds_count{endpoint="get_products",method="GET"} 2.0' in lines
+    assert 'sandstock_request_db_seconds_count{endpoint="get_products"} 2.0' in lines
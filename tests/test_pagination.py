@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from sandstock import db
+from sandstock.models import Product
+from sandstock.pagination import InvalidCursor, decode_cursor, encode_cursor, page_size, paginate
+
+
+def add_products(count):
+    for index in range(count):
+        product = Product(
+            name=f"Product {index:02d}",
+            category_label="Test Category",
+            description="This is a test product.",
+            quantity_available=0,
+            created_at=datetime(2025, 1, 1 + index % 3),
+            modified_by="test@gmail.com",
+        )
+        db.session.add(product)
+    db.session.commit()
+
+
+def test_cursor_round_trip():
+    values = [datetime(2025, 1, 2, 3, 4, 5), "name", 42]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+def test_invalid_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor")
+
+
+def test_page_size():
+    assert page_size(None) == 10
+    assert page_size(0) == 10
+    assert page_size(-5) == 1
+    assert page_size(1000) == 100
+
+
+def test_paginate(app):
+    add_products(25)
+
+    seen = []
+    cursor = None
+    while True:
+        page = paginate(select(Product), [Product.id], cursor=cursor, limit=10)
+        seen.append([product.id for product in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [len(ids) for ids in seen] == [10, 10, 5]
+    assert sum(seen, []) == list(range(1, 26))
+
+
+def test_paginate_descending_on_non_unique_key(app):
+    add_products(7)
+
+    first = paginate(select(Product), [Product.created_at, Product.id], limit=4, descending=True)
+    second = paginate(
+        select(Product), [Product.created_at, Product.id], cursor=first.next_cursor, limit=4, descending=True
+    )
+
+    assert [product.id for product in first.items] == [6, 3, 5, 2]
+    assert [product.id for product in second.items] == [7, 4, 1]
+    assert second.next_cursor is None
+
+
+def test_get_products_pages(client, app):
+    add_products(3)
+
+    response = client.get("/product/get?limit=2")
+    assert [product["id"] for product in response.get_json()] == [1, 2]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/product/get?limit=2&cursor={cursor}")
+    assert [product["id"] for product in response.get_json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/product/get?cursor=broken")
+    assert response.status_code == 400
+
+
+def test_home_pages(client, app):
+    add_products(12)
+
+    response = client.get("/")
+    assert b"Product 09" in response.data
+    assert b"Product 10" not in response.data
+    assert b"products_cursor=" in response.data
+
+    cursor = encode_cursor([10])
+    response = client.get(f"/?products_cursor={cursor}")
+    assert b"Product 10" in response.data
+    assert b"products_cursor=" not in response.data
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+
+from sandstock import create_app, db
+from sandstock.config import TestingConfig, engine_options, resolve_test_database
+from sandstock.models import Address, Contact, Partner, Product, Warehouse
+from sandstock.rollups import refresh_rollups
+from sandstock.services import create_order
+
+SQLITE = resolve_test_database("sqlite")
+CREATED_AT = datetime(2024, 1, 1, 8, 30)
+# JSON pages built by every kind of query the app runs: keyset pages, searches, filters,
+# aggregates and the rollups.
+PATHS = [
+    "/product/get?limit=2",
+    "/product/get?query=widget",
+    "/partner/get",
+    "/warehouse/get",
+    "/product/choices?query=bolt",
+    "/order/get?limit=3",
+    "/order/get?query=1-4",
+    "/order/get?product_id=1&date_from=2024-02-01&date_to=2024-02-29",
+    "/product/1/stock",
+    "/product/1/stock?warehouse_id=2",
+    "/analytics/orders?grain=day",
+    "/analytics/orders?grain=week&by=product&id=1",
+    "/analytics/products",
+    "/api/v1/partners?ids=1,2",
+    "/api/v1/orders/2",
+]
+
+
+def stamped(entity):
+    entity.created_at = entity.updated_at = CREATED_AT
+    return entity
+
+
+def place(model, name):
+    return stamped(
+        model(
+            name=name,
+            contact=stamped(Contact(email=f"{name}@example.com", phone_number="123456789", modified_by="test")),
+            address=stamped(
+                Address(
+                    street_address="1 Main St",
+                    city="New York",
+                    state="NY",
+                    postal_code="10001",
+                    country="US",
+                    modified_by="test",
+                )
+            ),
+            modified_by="test",
+        )
+    )
+
+
+def seed():
+    names = ["Blue Widget", "Red Widget", "Steel Bolt", "Copper Pipe"]
+    db.session.add_all(
+        [
+            stamped(Product(name=name, category_label="Test", description=name, quantity_available=0, modified_by="t"))
+            for name in names
+        ]
+        + [place(Partner, "Partner A"), place(Partner, "Partner B")]
+        + [place(Warehouse, "Warehouse A"), place(Warehouse, "Warehouse B")]
+    )
+    db.session.commit()
+    for index in range(12):
+        create_order(
+            category="TRANSACTION" if index % 4 else "CORRECTION",
+            product_id=index % 4 + 1,
+            partner_id=index % 2 + 1,
+            warehouse_id=index % 3 % 2 + 1,
+            quantity=index + 1,
+            unit_price=2.5 * (index % 3 + 1),
+            currency="USD" if index % 2 else "EUR",
+            created_at=datetime(2024, 1 + index % 3, 1 + index * 2, 12),
+            modified_by="test",
+        )
+    refresh_rollups()
+
+
+def comparable(value):
+    # Stock movements stamp products with the time they ran.
+    if isinstance(value, list):
+        return [comparable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: comparable(item) for key, item in value.items() if key != "updated_at"}
+    return value
+
+
+def responses(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        try:
+            seed()
+            client = app.test_client()
+            return {path: comparable(client.get(path).get_json()) for path in PATHS}
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def test_sqlite_answers_like_the_test_database():
+    if TestingConfig.SQLALCHEMY_DATABASE_URI == SQLITE:
+        pytest.skip("TEST_DATABASE is SQLite already, there is no other database to compare with")
+    config = type(
+        "SQLiteConfig",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": SQLITE, "SQLALCHEMY_ENGINE_OPTIONS": engine_options(SQLITE)},
+    )
+
+    expected = responses(TestingConfig)
+
+    assert all(expected.values())
+    assert responses(config) == expected
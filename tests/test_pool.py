@@ -0,0 +1,56 @@
+from sandstock import db
+from sandstock.config import engine_options
+from sandstock.pool import TimedQueuePool
+
+MSSQL_URL = "mssql+pyodbc://usr@localhost:1433/erp?driver=ODBC+Driver+18+for+SQL+Server"
+
+
+def test_engine_options_defaults():
+    options = engine_options(MSSQL_URL)
+
+    assert options == {
+        "poolclass": TimedQueuePool,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 1200,
+        "pool_pre_ping": True,
+        "fast_executemany": True,
+    }
+    assert engine_options("sqlite://") == {}
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "300")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_ISOLATION_LEVEL", "SNAPSHOT")
+    monkeypatch.setenv("DB_FAST_EXECUTEMANY", "0")
+    monkeypatch.setenv("DB_MARS", "yes")
+
+    options = engine_options(MSSQL_URL)
+
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 0
+    assert options["pool_recycle"] == 300
+    assert options["pool_pre_ping"] is False
+    assert options["isolation_level"] == "SNAPSHOT"
+    assert options["fast_executemany"] is False
+    assert options["connect_args"] == {"MARS_Connection": "yes"}
+    assert "fast_executemany" not in engine_options("postgresql://usr@localhost/erp")
+
+
+def test_pool_stats(client, app):
+    db.session.execute(db.select(1))
+    db.session.commit()
+
+    response = client.get("/pool/stats")
+
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats["connects"] >= 1
+    assert stats["checkouts"] >= 1
+    assert stats["invalidations"] == 0
+    if stats["pool"] == "QueuePool":
+        assert stats["size"] == app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("pool_size", 5)
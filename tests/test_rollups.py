@@ -0,0 +1,152 @@
+from datetime import date, datetime
+
+import pytest
+
+from sandstock import db
+from sandstock.models import Order, OrderRollup, RollupWatermark
+from sandstock.rollups import RollupError, order_rollups, refresh_rollups
+from sandstock.services import create_partner, create_warehouse
+
+
+def add_order(
+    product_id, partner_id, warehouse_id, created_at, quantity, unit_price=10.0, currency="USD", order_id=None
+):
+    order = Order(
+        id=order_id,
+        category="TRANSACTION",
+        product_id=product_id,
+        partner_id=partner_id,
+        warehouse_id=warehouse_id,
+        quantity=quantity,
+        unit_price=unit_price,
+        currency=currency,
+        created_at=created_at,
+        modified_by="test@gmail.com",
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def test_refresh_rollups(app, references):
+    product_id, partner_id, warehouse_id = references
+    # 2024-03-04 is a Monday.
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 18), 3, unit_price=5.0)
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 10, 23), 1, currency="EUR")
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 11, 0), 4)
+
+    assert refresh_rollups(batch_size=3) == 4
+
+    days = [tuple(row) for row in order_rollups("day")]
+    assert days == [
+        (date(2024, 3, 4), "USD", 2, 5, 35.0),
+        (date(2024, 3, 10), "EUR", 1, 1, 10.0),
+        (date(2024, 3, 11), "USD", 1, 4, 40.0),
+    ]
+    weeks = [tuple(row) for row in order_rollups("week")]
+    assert weeks == [
+        (date(2024, 3, 4), "EUR", 1, 1, 10.0),
+        (date(2024, 3, 4), "USD", 2, 5, 35.0),
+        (date(2024, 3, 11), "USD", 1, 4, 40.0),
+    ]
+    assert db.session.get(RollupWatermark, "order_rollup").last_order_id == Order.query.count()
+
+
+def test_refresh_rollups_is_incremental(app, references):
+    product_id, partner_id, warehouse_id = references
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    refresh_rollups()
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 10), 3)
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 5, 10), 1)
+
+    assert refresh_rollups() == 2
+    refresh_rollups()
+
+    assert [tuple(row) for row in order_rollups("day")] == [
+        (date(2024, 3, 4), "USD", 2, 5, 50.0),
+        (date(2024, 3, 5), "USD", 1, 1, 10.0),
+    ]
+    assert OrderRollup.query.filter_by(grain="week").one().orders == 3
+
+
+def test_refresh_rollups_folds_orders_committed_late(app, references):
+    product_id, partner_id, warehouse_id = references
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    late_id = add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 5, 9), 3).id
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 6, 9), 4)
+    # The second order took its id first but commits after the refresh.
+    Order.query.filter_by(id=late_id).delete()
+    db.session.commit()
+    refresh_rollups()
+    assert db.session.get(RollupWatermark, "order_rollup").last_order_id == late_id + 1
+
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 5, 9), 3, order_id=late_id)
+    refresh_rollups()
+    refresh_rollups()
+
+    assert [tuple(row) for row in order_rollups("day")] == [
+        (date(2024, 3, 4), "USD", 1, 2, 20.0),
+        (date(2024, 3, 5), "USD", 1, 3, 30.0),
+        (date(2024, 3, 6), "USD", 1, 4, 40.0),
+    ]
+    assert [tuple(row) for row in order_rollups("week")] == [(date(2024, 3, 4), "USD", 3, 9, 90.0)]
+
+
+def test_refresh_rollups_full(app, runner, references):
+    product_id, partner_id, warehouse_id = references
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    refresh_rollups()
+    db.session.query(OrderRollup).update({"quantity": 100})
+    db.session.commit()
+
+    result = runner.invoke(args=["rollups", "refresh", "--full"])
+
+    assert result.exit_code == 0
+    assert "Rolled up 1 orders." in result.output
+    db.session.expire_all()
+    assert {rollup.quantity for rollup in OrderRollup.query} == {2}
+
+
+def test_order_rollups_by_dimension(app, references, contact, address):
+    product_id, partner_id, warehouse_id = references
+    other_partner = create_partner("Other Partner", "Jane Doe", contact, address, "test@gmail.com")
+    other_warehouse = create_warehouse("Other Warehouse", contact, address, "test@gmail.com")
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    add_order(product_id, other_partner.id, warehouse_id, datetime(2024, 3, 4, 9), 3)
+    add_order(product_id, other_partner.id, other_warehouse.id, datetime(2024, 3, 6, 9), 5)
+    refresh_rollups()
+
+    assert [tuple(row) for row in order_rollups("week", by="partner")] == [
+        (date(2024, 3, 4), partner_id, "USD", 1, 2, 20.0),
+        (date(2024, 3, 4), other_partner.id, "USD", 2, 8, 80.0),
+    ]
+    assert [tuple(row) for row in order_rollups("day", by="warehouse", entity_id=other_warehouse.id)] == [
+        (date(2024, 3, 6), other_warehouse.id, "USD", 1, 5, 50.0)
+    ]
+    assert [row.bucket for row in order_rollups("day", date_from=date(2024, 3, 5))] == [date(2024, 3, 6)]
+    with pytest.raises(RollupError):
+        order_rollups("month")
+    with pytest.raises(RollupError):
+        order_rollups("day", entity_id=1)
+
+
+def test_get_order_rollups(client, app, references):
+    product_id, partner_id, warehouse_id = references
+    add_order(product_id, partner_id, warehouse_id, datetime(2024, 3, 4, 9), 2)
+    refresh_rollups()
+
+    response = client.get(f"/analytics/orders?grain=week&by=product&id={product_id}&date_from=2024-03-01")
+
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {
+            "bucket": "2024-03-04",
+            "product_id": product_id,
+            "currency": "USD",
+            "orders": 1,
+            "quantity": 2,
+            "revenue": 20.0,
+        }
+    ]
+    assert client.get("/analytics/orders?by=region").status_code == 400
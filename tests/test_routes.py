@@ -1,31 +1,12 @@
-import pytest
+from datetime import datetime
 
-from sandstock import create_app, db
-from sandstock.config import TestingConfig
-from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
-
-
-@pytest.fixture
-def app():
-    app = create_app(TestingConfig)
-
-    with app.app_context():
-        db.create_all()
-
-        yield app
-
-        db.session.remove()
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    return app.test_client()
+from sqlalchemy import update
 
-
-@pytest.fixture
-def runner(app):
-    return app.test_cli_runner()
+from sandstock import db
+from sandstock.explain import capture_statements
+from sandstock.instrumentation import query_count
+from sandstock.models import Address, Contact, Order, Partner, Product, Warehouse
+from sandstock.services import create_order
 
 
 def test_logout(client):
@@ -749,9 +730,9 @@ def test_add_order(client, app):
         "/order/add",
         data={
             "category": "TRANSACTION",
-            "product_name": f"{product.name} ({product.id})",
-            "partner_name": f"{partner.name} ({partner.id})",
-            "warehouse_name": f"{warehouse.name} ({warehouse.id})",
+            "product_id": product.id,
+            "partner_id": partner.id,
+            "warehouse_id": warehouse.id,
             "quantity": 5,
             "unit_price": 10.0,
             "currency": "USD",
@@ -774,6 +755,27 @@ def test_add_order(client, app):
     assert product.quantity_available == 5
 
 
+def test_get_product_stock(client, app, references):
+    product_id, partner_id, warehouse_id = references
+    order = create_order(
+        category="TRANSACTION",
+        product_id=product_id,
+        partner_id=partner_id,
+        warehouse_id=warehouse_id,
+        quantity=5,
+        unit_price=10.0,
+        currency="USD",
+        modified_by="test@gmail.com",
+    )
+
+    response = client.get(f"/product/{product_id}/stock")
+    assert response.get_json() == [{"warehouse_id": warehouse_id, "quantity": 5, "last_order_id": order.id}]
+
+    response = client.get(f"/product/{product_id}/stock?warehouse_id={warehouse_id}")
+    assert response.get_json() == {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": 5}
+    assert query_count("SELECT") == 1
+
+
 def test_edit_order(client, app):
     client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
 
@@ -998,3 +1000,204 @@ def test_get_orders_with_filter(client, app):
     data = response.get_json()
     assert len(data) == 1
     assert data[0]["category"] == "Test Category"
+
+
+def test_get_orders_with_id_range_and_references(client, app):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    contact = Contact(
+        email="contact@testpartner.com",
+        phone_number="123456789",
+        modified_by="test@gmail.com",
+    )
+    address = Address(
+        street_address="123 Main Street",
+        city="New York",
+        state="NY",
+        postal_code="10001",
+        country="USA",
+        modified_by="test@gmail.com",
+    )
+
+    db.session.add(contact)
+    db.session.add(address)
+    db.session.commit()
+
+    product = Product(
+        name="Test Product",
+        category_label="Test Category",
+        description="This is a test product.",
+        quantity_available=0,
+        modified_by="test@gmail.com",
+    )
+    partner_a = Partner(
+        name="Test Partner",
+        contact_person="John Doe",
+        contact_id=Contact.query.first().id,
+        address_id=Address.query.first().id,
+        modified_by="test@gmail.com",
+    )
+    partner_b = Partner(
+        name="Other Partner",
+        contact_person="Jane Doe",
+        contact_id=Contact.query.first().id,
+        address_id=Address.query.first().id,
+        modified_by="test@gmail.com",
+    )
+    warehouse = Warehouse(
+        name="Test Warehouse",
+        contact_id=Contact.query.first().id,
+        address_id=Address.query.first().id,
+        modified_by="test@gmail.com",
+    )
+
+    db.session.add(product)
+    db.session.add(partner_a)
+    db.session.add(partner_b)
+    db.session.add(warehouse)
+    db.session.commit()
+
+    for index in range(12):
+        order = Order(
+            category="TRANSACTION",
+            product_id=product.id,
+            partner_id=partner_a.id if index % 2 else partner_b.id,
+            warehouse_id=warehouse.id,
+            quantity=index,
+            unit_price=10.0,
+            currency="USD",
+            created_at=datetime(2025, 1, index + 1, 12),
+            modified_by="test@gmail.com",
+        )
+        db.session.add(order)
+    db.session.commit()
+
+    response = client.get("/order/get?query=3-5", follow_redirects=True)
+    assert [order["id"] for order in response.get_json()] == [3, 4, 5]
+
+    response = client.get("/order/get?query=1", follow_redirects=True)
+    assert [order["id"] for order in response.get_json()] == [1, 10, 11, 12]
+
+    response = client.get("/order/get?query=abc", follow_redirects=True)
+    assert response.get_json() == []
+
+    response = client.get(f"/order/get?partner_id={partner_a.id}&date_from=2025-01-03&date_to=2025-01-06")
+    assert [order["id"] for order in response.get_json()] == [4, 6]
+
+
+def test_add_order_rejects_unknown_references(client, app):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    product = Product(
+        name="Test Product",
+        category_label="Test Category",
+        description="This is a test product.",
+        quantity_available=0,
+        modified_by="test@gmail.com",
+        deleted=True,
+    )
+    db.session.add(product)
+    db.session.commit()
+
+    product_id = product.id
+
+    response = client.get("/order/add")
+    assert response.status_code == 200
+
+    with capture_statements(db.engine) as statements:
+        response = client.post(
+            "/order/add",
+            data={
+                "category": "TRANSACTION",
+                "product_id": product_id,
+                "partner_id": 42,
+                "warehouse_id": 42,
+                "quantity": 5,
+                "unit_price": 10.0,
+                "currency": "USD",
+            },
+            headers={"X-MS-CLIENT-PRINCIPAL-NAME": "user@mail.com"},
+            follow_redirects=True,
+        )
+
+    assert len(statements) == 1
+    assert b"Order added successfully!" not in response.data
+    assert f"Product {product_id} does not exist.".encode() in response.data
+    assert b"Partner 42 does not exist." in response.data
+    assert Order.query.count() == 0
+
+
+def test_add_order_rejects_a_product_deleted_elsewhere(client, app, references):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    product_id, partner_id, warehouse_id = references
+    data = {
+        "category": "TRANSACTION",
+        "product_id": product_id,
+        "partner_id": partner_id,
+        "warehouse_id": warehouse_id,
+        "quantity": 5,
+        "unit_price": 10.0,
+        "currency": "USD",
+    }
+
+    response = client.post("/order/add", data=data, follow_redirects=True)
+    assert b"Order added successfully!" in response.data
+
+    # Another worker deletes the product, this process never hears of it.
+    db.session.execute(update(Product).where(Product.id == product_id).values(deleted=True))
+    db.session.commit()
+
+    response = client.post("/order/add", data=data, follow_redirects=True)
+    assert f"Product {product_id} does not exist.".encode() in response.data
+    assert Order.query.count() == 1
+
+
+def test_get_choices(client, app):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    for name in ["Test Product", "Other Product", "Deleted Product"]:
+        product = Product(
+            name=name,
+            category_label="Test Category",
+            description="This is a test product.",
+            quantity_available=0,
+            modified_by="test@gmail.com",
+            deleted=name.startswith("Deleted"),
+        )
+        db.session.add(product)
+    db.session.commit()
+
+    response = client.get("/product/choices")
+    assert response.status_code == 200
+    assert response.get_json() == [[1, "Test Product (1)"], [2, "Other Product (2)"]]
+
+    response = client.get("/product/choices?query=other")
+    assert response.get_json() == [[2, "Other Product (2)"]]
+
+    response = client.get("/order/choices")
+    assert response.status_code == 404
+
+
+def test_edit_views_load_the_aggregate_in_one_select(client, app, references):
+    client.post("/login", data={"email": "test@example.com", "password": "password"}, follow_redirects=True)
+
+    product_id, partner_id, warehouse_id = references
+    order = create_order(
+        category="TRANSACTION",
+        product_id=product_id,
+        partner_id=partner_id,
+        warehouse_id=warehouse_id,
+        quantity=5,
+        unit_price=10.0,
+        currency="USD",
+        modified_by="test@gmail.com",
+    )
+    urls = [f"/partner/{partner_id}/edit", f"/warehouse/{warehouse_id}/edit", f"/order/{order.id}/edit"]
+    db.session.expunge_all()
+
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert query_count("SELECT") == 1
+        db.session.expunge_all()
@@ -0,0 +1,108 @@
+from sandstock import db
+from sandstock.explain import capture_statements, explain, index_seeks, table_scans
+from sandstock.models import Product, SearchGram
+from sandstock.pagination import paginate
+from sandstock.search import CANDIDATE_WINDOW, NgramSearchBackend, id_prefix_ranges, ngrams, search, search_orders
+
+
+def test_ngrams():
+    assert ngrams("Bolt") == {"bol", "olt"}
+    assert ngrams("  A  b ") == {"a b"}
+    assert ngrams("ab") == set()
+
+
+def test_search_ranks_exact_then_prefix_then_contains(app, add_product):
+    add_product("Steel Bolt Large")
+    add_product("Large Bolt")
+    add_product("bolt")
+    add_product("Bolt Large")
+
+    results = search(Product, "Bolt").items
+
+    assert [product.name for product in results] == ["bolt", "Bolt Large", "Large Bolt", "Steel Bolt Large"]
+
+
+def test_search_bounds_the_candidates(app, add_product):
+    db.session.add_all(
+        [
+            Product(
+                name=f"widget {index}", category_label="Test", description="Test", quantity_available=0, modified_by="t"
+            )
+            for index in range(1500)
+        ]
+    )
+    db.session.commit()
+    exact = add_product("Widget")
+
+    page = search(Product, "widget", limit=100)
+    assert page.items[0].id == exact.id
+
+    found = len(page.items)
+    while page.next_cursor:
+        page = search(Product, "widget", limit=100, cursor=page.next_cursor)
+        found += len(page.items)
+    assert CANDIDATE_WINDOW < found <= 2 * CANDIDATE_WINDOW
+
+
+def test_search_rechecks_candidates(app, add_product):
+    add_product("Bolt Steel")
+
+    assert search(Product, "Steel Bolt").items == []
+    assert [product.name for product in search(Product, "t Ste").items] == ["Bolt Steel"]
+
+
+def test_search_short_query_matches_prefix(app, add_product):
+    add_product("Nut")
+    add_product("Walnut")
+
+    assert [product.name for product in search(Product, "nu").items] == ["Nut"]
+
+
+def test_index_follows_writes(app, add_product):
+    product = add_product("Copper Pipe")
+    assert [p.id for p in search(Product, "pipe").items] == [product.id]
+
+    product.name = "Copper Valve"
+    db.session.commit()
+    assert search(Product, "pipe").items == []
+    assert [p.id for p in search(Product, "valve").items] == [product.id]
+
+    product.deleted = True
+    db.session.commit()
+    assert search(Product, "valve").items == []
+    assert SearchGram.query.filter_by(entity_id=product.id).count() == 0
+
+
+def test_reindex(app, add_product):
+    product = add_product("Copper Pipe")
+    add_product("Deleted Pipe", deleted=True)
+    SearchGram.query.delete()
+    db.session.commit()
+
+    NgramSearchBackend().reindex(Product)
+
+    assert [p.id for p in search(Product, "pipe").items] == [product.id]
+
+
+def test_search_reindex_command(runner):
+    result = runner.invoke(args=["search", "reindex"])
+    assert "Reindexed dim_product." in result.output
+
+
+def test_id_prefix_ranges():
+    assert id_prefix_ranges("12", max_id=1300) == [(12, 13), (120, 130), (1200, 1300)]
+    assert id_prefix_ranges("9", max_id=95) == [(9, 10), (90, 96)]
+    assert len(id_prefix_ranges("1")) == 10
+    assert id_prefix_ranges("0") == []
+    assert id_prefix_ranges("1a") == []
+
+
+def test_search_orders_uses_index_seek(app):
+    with capture_statements(db.engine) as statements:
+        paginate(*search_orders("12"), limit=10)
+
+    with db.engine.connect() as connection:
+        plan = explain(connection, *statements[0])
+    dialect = db.engine.dialect.name
+    assert index_seeks(dialect, plan)
+    assert not table_scans(dialect, plan)
@@ -0,0 +1,96 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from sandstock import db
+from sandstock.models import Order, Partner, Product
+from sandstock.search import search_orders
+from sandstock.serializers import PRODUCT_SUMMARY, RESOURCES, SUMMARIES, serialize_page
+from sandstock.services import create_partner
+
+
+@pytest.fixture
+def add_orders(references):
+    product_id, partner_id, warehouse_id = references
+
+    def add(count):
+        for index in range(count):
+            db.session.add(
+                Order(
+                    category="TRANSACTION",
+                    product_id=product_id,
+                    partner_id=partner_id,
+                    warehouse_id=warehouse_id,
+                    quantity=index + 1,
+                    unit_price=10.0,
+                    currency="USD",
+                    created_at=datetime(2024, 3, 4, 9),
+                    modified_by="test@gmail.com",
+                )
+            )
+        db.session.commit()
+
+    return add
+
+
+def test_schema_selects_its_columns_only():
+    statement = str(PRODUCT_SUMMARY.select(select(Product).where(Product.deleted == False)))  # noqa: E712
+
+    assert "dim_product.category_label" in statement
+    assert "modified_by" not in statement
+    assert "WHERE dim_product.deleted = false" in statement
+
+
+def test_serialize_page_nested(app, add_orders, contact, address):
+    add_orders(0)
+    create_partner("Other Partner", None, {**contact, "email": "other@testpartner.com"}, address, "test@gmail.com")
+
+    first = serialize_page(RESOURCES[Partner], select(Partner), [Partner.id], limit=1)
+    second = serialize_page(RESOURCES[Partner], select(Partner), [Partner.id], cursor=first.next_cursor, limit=1)
+
+    assert [partner["name"] for partner in first.items + second.items] == ["Test Partner", "Other Partner"]
+    assert second.items[0]["contact"]["email"] == "other@testpartner.com"
+    assert second.items[0]["address"]["city"] == "New York"
+    assert second.next_cursor is None
+
+
+def test_serialize_page_over_an_alias(app, add_orders):
+    add_orders(12)
+    # Ids starting with 1 are searched with one range per length, merged into an aliased union.
+    statement, keys = search_orders("1")
+
+    page = serialize_page(SUMMARIES[Order], statement, keys, limit=3)
+
+    assert [order["id"] for order in page.items] == [1, 10, 11]
+    assert page.items[0] == {
+        "id": 1,
+        "category": "TRANSACTION",
+        "product_id": 1,
+        "partner_id": 1,
+        "warehouse_id": 1,
+        "quantity": 1,
+        "unit_price": 10.0,
+        "currency": "USD",
+        "created_at": datetime(2024, 3, 4, 9),
+    }
+    assert page.next_cursor is not None
+
+
+def test_json_provider(app):
+    response = app.json.response({"at": datetime(2024, 3, 4, 9, 30), "price": Decimal("9.99"), 1: "one"})
+
+    assert response.mimetype == "application/json"
+    assert app.json.loads(response.data) == {"at": "Mon, 04 Mar 2024 09:30:00 GMT", "price": "9.99", "1": "one"}
+    assert app.json.loads(app.json.dumps([1, "a"])) == [1, "a"]
+
+
+def test_json_provider_keeps_the_flask_formats(app):
+    # Clients parse the dates Flask has always sent, RFC 822 and not ISO 8601.
+    value = {"at": datetime(2024, 3, 4, 9, 30), "on": date(2024, 3, 4), "price": Decimal("9.99")}
+
+    assert app.json.loads(app.json.dumps(value)) == json.loads(DefaultJSONProvider(app).dumps(value))
+    assert app.json.loads(app.json.dumps(value))["on"] == "Mon, 04 Mar 2024 00:00:00 GMT"
@@ -0,0 +1,202 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from sandstock import db
+from sandstock.explain import capture_statements
+from sandstock.models import Address, Contact, Order, Product, StockByWarehouse, Warehouse
+from sandstock.services import (
+    StockUpdateError,
+    apply_stock_movement,
+    apply_warehouse_movements,
+    create_order,
+    create_partner,
+    create_warehouse,
+    product_stock_by_warehouse,
+    rebuild_warehouse_stock,
+    reconcile_stock_balances,
+    warehouse_stock,
+)
+
+
+def order_fields(product_id, partner_id, warehouse_id, quantity):
+    return {
+        "category": "TRANSACTION",
+        "product_id": product_id,
+        "partner_id": partner_id,
+        "warehouse_id": warehouse_id,
+        "quantity": quantity,
+        "unit_price": 10.0,
+        "currency": "USD",
+        "modified_by": "test@gmail.com",
+    }
+
+
+def test_create_order_applies_stock_movement(app, references):
+    product_id, partner_id, warehouse_id = references
+
+    create_order(**order_fields(product_id, partner_id, warehouse_id, 5))
+    create_order(**order_fields(product_id, partner_id, warehouse_id, -2))
+
+    assert Order.query.count() == 2
+    assert db.session.get(Product, product_id).quantity_available == 3
+
+
+def test_apply_stock_movement_unknown_product(app):
+    with pytest.raises(StockUpdateError):
+        apply_stock_movement(12345, 1)
+
+
+def test_reconcile_stock_balances(app, runner, references):
+    product_id, partner_id, warehouse_id = references
+    create_order(**order_fields(product_id, partner_id, warehouse_id, 7))
+    db.session.execute(update(Product).values(quantity_available=100))
+    db.session.commit()
+
+    result = runner.invoke(args=["stock", "reconcile"])
+
+    assert result.exit_code == 0
+    assert "Reconciled 1 product balances." in result.output
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).quantity_available == 7
+    assert reconcile_stock_balances() == 0
+
+
+def test_concurrent_orders_keep_an_exact_balance(app, references):
+    if app.config["SQLALCHEMY_DATABASE_URI"] in ("sqlite://", "sqlite:///:memory:"):
+        pytest.skip("needs a database shared between connections")
+    product_id, partner_id, warehouse_id = references
+
+    def post_order(quantity):
+        client = app.test_client()
+        response = client.post(
+            "/order/add",
+            data={
+                "category": "TRANSACTION",
+                "product_id": product_id,
+                "partner_id": partner_id,
+                "warehouse_id": warehouse_id,
+                "quantity": quantity,
+                "unit_price": 10.0,
+                "currency": "USD",
+            },
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(post_order, [1, 2, 3, -1] * 10))
+
+    assert statuses == [302] * 40
+    db.session.expire_all()
+    assert db.session.get(Product, product_id).quantity_available == 50
+    assert warehouse_stock(product_id, warehouse_id) == 50
+    assert Order.query.count() == 40
+
+
+def add_warehouse(name):
+    warehouse = Warehouse.query.first()
+    other = Warehouse(name=name, contact_id=warehouse.contact_id, address_id=warehouse.address_id, modified_by="test")
+    db.session.add(other)
+    db.session.commit()
+    return other.id
+
+
+def test_create_order_maintains_stock_by_warehouse(app, references):
+    product_id, partner_id, warehouse_id = references
+    other_id = add_warehouse("Other Warehouse")
+
+    first = create_order(**order_fields(product_id, partner_id, warehouse_id, 5))
+    create_order(**order_fields(product_id, partner_id, other_id, 4))
+    last = create_order(**order_fields(product_id, partner_id, warehouse_id, -2))
+
+    assert warehouse_stock(product_id, warehouse_id) == 3
+    assert warehouse_stock(product_id, other_id) == 4
+    assert warehouse_stock(product_id, 12345) == 0
+    stocks = product_stock_by_warehouse(product_id)
+    assert [(stock.warehouse_id, stock.quantity) for stock in stocks] == [(warehouse_id, 3), (other_id, 4)]
+    assert stocks[0].last_order_id == last.id
+    assert stocks[0].last_order_id > first.id
+
+
+def test_apply_warehouse_movements(app, references):
+    product_id, partner_id, warehouse_id = references
+    other_id = add_warehouse("Other Warehouse")
+    create_order(**order_fields(product_id, partner_id, warehouse_id, 5))
+
+    apply_warehouse_movements({(product_id, warehouse_id): 2, (product_id, other_id): 7}, 99)
+    db.session.commit()
+
+    assert warehouse_stock(product_id, warehouse_id) == 7
+    assert warehouse_stock(product_id, other_id) == 7
+    assert {stock.last_order_id for stock in product_stock_by_warehouse(product_id)} == {99}
+
+
+def test_rebuild_warehouse_stock(app, runner, references):
+    product_id, partner_id, warehouse_id = references
+    other_id = add_warehouse("Other Warehouse")
+    for warehouse, quantity in [(warehouse_id, 5), (other_id, 4), (warehouse_id, -2), (other_id, 1), (warehouse_id, 6)]:
+        create_order(**order_fields(product_id, partner_id, warehouse, quantity))
+    last_id = db.session.query(db.func.max(Order.id)).scalar()
+    db.session.execute(update(StockByWarehouse).values(quantity=100))
+    db.session.query(StockByWarehouse).filter_by(warehouse_id=other_id).delete()
+    db.session.commit()
+
+    # Two orders per batch, so that rows are both inserted and updated across batches.
+    result = runner.invoke(args=["stock", "rebuild-warehouses", "--batch-size", "2"])
+
+    assert result.exit_code == 0
+    assert "Rebuilt 2 warehouse stock rows." in result.output
+    db.session.expire_all()
+    assert warehouse_stock(product_id, warehouse_id) == 9
+    assert warehouse_stock(product_id, other_id) == 5
+    assert {stock.last_order_id for stock in product_stock_by_warehouse(product_id)} == {last_id, last_id - 1}
+    assert rebuild_warehouse_stock() == 2
+    assert warehouse_stock(product_id, warehouse_id) == 9
+
+
+def test_create_partner_in_one_flush(app, contact, address):
+    with capture_statements(db.engine, selects_only=False) as statements:
+        partner = create_partner(
+            name="Test Partner",
+            contact_person="John Doe",
+            contact=contact,
+            address=address,
+            modified_by="test@gmail.com",
+        )
+
+    # Contact, address, partner and the partner search grams, with no read back in between,
+    # then, once they are committed, the dim_partner version bump.
+    *inserts, (bump, _) = statements
+    assert sorted(statement.split()[2] for statement, _ in inserts) == [
+        "dim_address",
+        "dim_contact",
+        "dim_partner",
+        "idx_search_gram",
+    ]
+    assert all(statement.startswith("INSERT") for statement, _ in inserts)
+    assert bump.startswith("UPDATE meta_table_version")
+    assert partner.contact.email == "contact@testpartner.com"
+    assert partner.address.city == "New York"
+
+
+def test_create_warehouse_in_one_flush(app, contact, address):
+    with capture_statements(db.engine, selects_only=False) as statements:
+        warehouse = create_warehouse(
+            name="Test Warehouse", contact=contact, address=address, modified_by="test@gmail.com"
+        )
+
+    assert len(statements) == 5
+    assert warehouse.contact_id == warehouse.contact.id
+    assert warehouse.address_id == warehouse.address.id
+
+
+def test_create_warehouse_is_atomic(app, contact, address):
+    with pytest.raises(IntegrityError):
+        create_warehouse(name=None, contact=contact, address=address, modified_by="test@gmail.com")
+    db.session.rollback()
+
+    assert Contact.query.count() == 0
+    assert Address.query.count() == 0
+    assert Warehouse.query.count() == 0